@@ -0,0 +1,115 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+from chat.models import ChatRoom
+from courses.models import Enrolment
+
+DEFAULT_ROOM_ACCESS_TIMEOUT = 300  # seconds
+
+
+def room_version_key(room_name):
+    return f"chat:room_access:version:{room_name}"
+
+
+def room_access_key(user_id, room_name, version):
+    return f"chat:room_access:{version}:{user_id}:{room_name}"
+
+
+def get_room_version(room_name):
+    """
+    Returns the current version of the access entries of a room.
+
+    Versions are random tokens, so a version evicted from the cache can never be
+    reissued while entries of the old version are still cached.
+
+    :param room_name: The name of the chat room.
+    :type room_name: str
+
+    :return: The version token of the room.
+    :rtype: str
+    """
+    return cache.get_or_set(room_version_key(room_name), uuid.uuid4().hex, None)
+
+
+def resolve_room_access(user, room_name):
+    """
+    Resolves whether the user may join the chat room, using the cache when possible.
+
+    On a cache miss the chat room, its course teacher and the enrolment of the user
+    are read with a single query.
+
+    :param user: The user joining the chat room.
+    :type user: User
+    :param room_name: The name of the chat room.
+    :type room_name: str
+
+    :return: A dict with the ``chat_room_id``, ``course_id`` and whether access is
+        ``allowed``, or None if the chat room does not exist.
+    :rtype: dict or None
+    """
+    key = room_access_key(user.id, room_name, get_room_version(room_name))
+    access = cache.get(key)
+
+    if access is None:
+        room = (
+            ChatRoom.objects.filter(chat_name=room_name)
+            .annotate(
+                is_enrolled=Exists(
+                    Enrolment.objects.filter(
+                        course_id=OuterRef("course_id"),
+                        student_id=user.id,
+                        is_banned=False,
+                    )
+                )
+            )
+            .values("id", "course_id", "course__teacher_id", "is_enrolled")
+            .first()
+        )
+
+        if room is None:
+            # Cache missing rooms too, creating the room bumps its version
+            access = {"chat_room_id": None, "course_id": None, "allowed": False}
+        else:
+            access = {
+                "chat_room_id": room["id"],
+                "course_id": room["course_id"],
+                "allowed": room["is_enrolled"]
+                or room["course__teacher_id"] == user.id,
+            }
+
+        cache.set(
+            key,
+            access,
+            getattr(
+                settings, "CHAT_ROOM_ACCESS_TIMEOUT", DEFAULT_ROOM_ACCESS_TIMEOUT
+            ),
+        )
+
+    if access["chat_room_id"] is None:
+        return None
+    return access
+
+
+def invalidate_user_room_access(user_id, room_name):
+    """
+    Removes the cached access of one user to a chat room.
+
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :param room_name: The name of the chat room.
+    :type room_name: str
+    """
+    cache.delete(room_access_key(user_id, room_name, get_room_version(room_name)))
+
+
+def invalidate_room_access(room_name):
+    """
+    Invalidates the cached access of every user to a chat room.
+
+    :param room_name: The name of the chat room.
+    :type room_name: str
+    """
+    cache.set(room_version_key(room_name), uuid.uuid4().hex, None)
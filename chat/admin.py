@@ -1,5 +1,11 @@
 from django.contrib import admin
-from chat.models import ChatMembership, ChatRoom, Message
+from chat.models import (
+    ChatMembership,
+    ChatRoom,
+    Message,
+    MessageArchiveSegment,
+    RetentionPolicy,
+)
 
 
 # Register the ChatRoom model with the Django admin
@@ -25,3 +31,16 @@ class ChatMembershipAdmin(admin.ModelAdmin):
     list_display = ("user", "chat_room", "last_viewed_message", "last_active_timestamp")
     list_filter = ("chat_room",)
     search_fields = ("user__username",)
+
+
+@admin.register(RetentionPolicy)
+class RetentionPolicyAdmin(admin.ModelAdmin):
+    list_display = ("course", "archive_after_days", "delete_attachments")
+    search_fields = ("course__name",)
+
+
+@admin.register(MessageArchiveSegment)
+class MessageArchiveSegmentAdmin(admin.ModelAdmin):
+    list_display = ("chat_room", "start_timestamp", "end_timestamp", "message_count")
+    list_filter = ("chat_room",)
+    ordering = ("chat_room", "-end_timestamp")
@@ -0,0 +1,303 @@
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from chat.models import ChatRoom, Message, MessageArchiveSegment
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHAT_RETENTION = {
+    # days after which messages of rooms without a RetentionPolicy are archived,
+    # None keeps them in the database
+    "ARCHIVE_AFTER_DAYS": None,
+    "SEGMENT_SIZE": 5000,  # messages per archive segment file
+    "ARCHIVE_ROOT": settings.BASE_DIR / "archive" / "chat",
+    "LOCK_TIMEOUT": 60 * 60,  # seconds, an archiving run never overlaps another
+}
+
+ARCHIVE_LOCK_KEY = "chat:archive:lock"
+
+
+def get_retention_config():
+    """
+    Returns the retention configuration merged over the defaults.
+
+    :return: The ``CHAT_RETENTION`` setting merged over the defaults.
+    :rtype: dict
+    """
+    return {**DEFAULT_CHAT_RETENTION, **getattr(settings, "CHAT_RETENTION", {})}
+
+
+def get_archive_root():
+    return Path(get_retention_config()["ARCHIVE_ROOT"])
+
+
+def archive_record(message):
+    """
+    Serializes a message, with its user loaded, into an archive record.
+
+    :rtype: dict
+    """
+    return {
+        "id": message.id,
+        "timestamp": message.timestamp.isoformat(),
+        "user_id": message.user_id,
+        "username": message.user.username,
+        "first_name": message.user.first_name,
+        "last_name": message.user.last_name,
+        "content": message.content,
+        "file": message.file.name if message.file else None,
+    }
+
+
+def message_from_record(chat_room, record):
+    """
+    Rebuilds an unsaved message from an archive record.
+
+    The message and its user carry the archived fields, so archived messages render
+    and serialize like the messages still in the database.
+
+    :param chat_room: The chat room of the archive segment.
+    :type chat_room: ChatRoom
+    :param record: The archive record.
+    :type record: dict
+
+    :return: The archived message.
+    :rtype: Message
+    """
+    user = User(
+        id=record["user_id"],
+        username=record["username"],
+        first_name=record["first_name"],
+        last_name=record["last_name"],
+    )
+    return Message(
+        id=record["id"],
+        chat_room=chat_room,
+        user=user,
+        content=record["content"],
+        file=record["file"],
+        timestamp=datetime.fromisoformat(record["timestamp"]),
+    )
+
+
+def read_segment(segment):
+    """
+    Reads the records of an archive segment in chronological order.
+
+    :param segment: The archive segment.
+    :type segment: MessageArchiveSegment
+
+    :return: The archive records.
+    :rtype: list[dict]
+    """
+    with gzip.open(get_archive_root() / segment.path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def write_segment(path, messages):
+    """
+    Writes messages to a compressed JSON Lines segment file.
+
+    The file is written under a temporary name and renamed once complete, so a
+    crashed run never leaves a truncated segment behind.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f"{path.name}.tmp")
+
+    with gzip.open(temporary_path, "wt", encoding="utf-8") as f:
+        for message in messages:
+            f.write(json.dumps(archive_record(message)) + "\n")
+    os.replace(temporary_path, path)
+
+
+def archive_room_messages(
+    chat_room, cutoff, segment_size=None, delete_attachments=False
+):
+    """
+    Moves the messages of a chat room sent before the cutoff into archive segments.
+
+    Messages are archived oldest first, one segment of at most ``segment_size``
+    messages at a time. Each segment is written to disk before its messages are
+    deleted from the database, in the transaction that indexes the segment.
+
+    :param chat_room: The chat room to archive.
+    :type chat_room: ChatRoom
+    :param cutoff: Messages sent before this time are archived.
+    :type cutoff: datetime
+    :param segment_size: The maximum number of messages per segment.
+    :type segment_size: int or None
+    :param delete_attachments: Delete the attachments of archived messages from storage.
+    :type delete_attachments: bool
+
+    :return: The number of archived messages.
+    :rtype: int
+    """
+    segment_size = segment_size or get_retention_config()["SEGMENT_SIZE"]
+    archive_root = get_archive_root()
+    archived = 0
+
+    while True:
+        messages = list(
+            Message.objects.filter(chat_room=chat_room, timestamp__lt=cutoff)
+            .select_related("user")
+            .order_by("timestamp", "id")[:segment_size]
+        )
+        if not messages:
+            return archived
+
+        first, last = messages[0], messages[-1]
+        relative_path = f"{chat_room.id}/{first.id}-{last.id}.jsonl.gz"
+        write_segment(archive_root / relative_path, messages)
+
+        try:
+            with transaction.atomic():
+                MessageArchiveSegment.objects.create(
+                    chat_room=chat_room,
+                    path=relative_path,
+                    start_timestamp=first.timestamp,
+                    start_message_id=first.id,
+                    end_timestamp=last.timestamp,
+                    end_message_id=last.id,
+                    message_count=len(messages),
+                )
+                Message.objects.filter(
+                    id__in=[message.id for message in messages]
+                ).delete()
+        except Exception:
+            (archive_root / relative_path).unlink(missing_ok=True)
+            raise
+
+        if delete_attachments:
+            for message in messages:
+                if message.file:
+                    message.file.delete(save=False)
+
+        archived += len(messages)
+        logger.info(
+            "Archived %d messages of %s to %s", len(messages), chat_room, relative_path
+        )
+
+
+def run_retention(now=None, chat_rooms=None, archive_after_days=None):
+    """
+    Archives the messages of every chat room past its retention threshold.
+
+    The threshold of a room is the ``RetentionPolicy`` of its course, or
+    ``CHAT_RETENTION["ARCHIVE_AFTER_DAYS"]`` for courses without a policy.
+
+    :param now: The reference time, defaults to the current time.
+    :type now: datetime or None
+    :param chat_rooms: The chat rooms to archive, defaults to every room.
+    :type chat_rooms: QuerySet or None
+    :param archive_after_days: Overrides the threshold of every room.
+    :type archive_after_days: int or None
+
+    :return: The number of archived messages per chat room name, or None if another
+        run is in progress.
+    :rtype: dict[str, int] or None
+    """
+    config = get_retention_config()
+    if not cache.add(ARCHIVE_LOCK_KEY, True, config["LOCK_TIMEOUT"]):
+        logger.warning("Chat message archiving is already running")
+        return None
+
+    try:
+        now = now or timezone.now()
+        chat_rooms = chat_rooms if chat_rooms is not None else ChatRoom.objects.all()
+        results = {}
+
+        for chat_room in chat_rooms.select_related("course__chat_retention_policy"):
+            policy = getattr(chat_room.course, "chat_retention_policy", None)
+            days = archive_after_days or (
+                policy.archive_after_days if policy else config["ARCHIVE_AFTER_DAYS"]
+            )
+            if not days:
+                continue
+
+            results[chat_room.chat_name] = archive_room_messages(
+                chat_room,
+                cutoff=now - timedelta(days=days),
+                segment_size=config["SEGMENT_SIZE"],
+                delete_attachments=bool(policy and policy.delete_attachments),
+            )
+        return results
+    finally:
+        cache.delete(ARCHIVE_LOCK_KEY)
+
+
+def get_archived_messages(chat_room, before=None, limit=50):
+    """
+    Reads the newest archived messages of a chat room older than a position.
+
+    :param chat_room: The chat room to read from.
+    :type chat_room: ChatRoom
+    :param before: A ``(timestamp, id)`` position, or None for the newest archived
+        messages.
+    :type before: tuple[datetime, int] or None
+    :param limit: The maximum number of messages to return.
+    :type limit: int
+
+    :return: The archived messages, newest first.
+    :rtype: list[Message]
+    """
+    segments = MessageArchiveSegment.objects.filter(chat_room=chat_room)
+    if before:
+        timestamp, message_id = before
+        segments = segments.filter(
+            Q(start_timestamp__lt=timestamp)
+            | Q(start_timestamp=timestamp, start_message_id__lt=message_id)
+        )
+
+    messages = []
+    for segment in segments.order_by("-end_timestamp", "-end_message_id").iterator():
+        for record in reversed(read_segment(segment)):
+            message = message_from_record(chat_room, record)
+            if before and (message.timestamp, message.id) >= before:
+                continue
+            messages.append(message)
+            if len(messages) == limit:
+                return messages
+    return messages
+
+
+def iter_archived_messages(chat_room, start=None, end=None):
+    """
+    Iterates over the archived messages of a chat room in chronological order.
+
+    Only the segments overlapping the time range are read, one at a time.
+
+    :param chat_room: The chat room to read from.
+    :type chat_room: ChatRoom
+    :param start: Only include messages sent at or after this time.
+    :type start: datetime or None
+    :param end: Only include messages sent before this time.
+    :type end: datetime or None
+
+    :return: An iterator over the archived messages.
+    :rtype: iterator of Message
+    """
+    segments = MessageArchiveSegment.objects.filter(chat_room=chat_room)
+    if start:
+        segments = segments.filter(end_timestamp__gte=start)
+    if end:
+        segments = segments.filter(start_timestamp__lt=end)
+
+    for segment in segments.order_by("start_timestamp", "start_message_id"):
+        for record in read_segment(segment):
+            message = message_from_record(chat_room, record)
+            if (start and message.timestamp < start) or (
+                end and message.timestamp >= end
+            ):
+                continue
+            yield message
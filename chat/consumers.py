@@ -1,19 +1,40 @@
 from django.utils import timezone
+import asyncio
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from chat.access import resolve_room_access
+from chat.frames import (
+    MSGPACK_SUBPROTOCOL,
+    build_frame_event,
+    encode_frame,
+    is_msgpack_enabled,
+)
+from chat.presence import get_presence_config, get_presence_registry
+from chat.ratelimit import (
+    COALESCED_ACTIONS,
+    ConnectionRateLimiter,
+    stats as rate_limit_stats,
+)
+from chat.roster import get_room_roster, invalidate_room_roster
 from chat.serializers import MessageSerializer
-from django.core.serializers import serialize
-from .models import ChatMembership, ChatRoom
-from courses.models import Enrolment
+from chat.unread import unread_count_expression
+from chat.writebehind import (
+    get_message_buffer,
+    is_provisional_id,
+    is_write_behind_enabled,
+)
+from django.core.exceptions import ValidationError as ModelValidationError
+from .models import ChatMembership, Message
 from django.contrib.auth.models import AnonymousUser
+from eLearningApp.metrics import InstrumentedConsumerMixin
 from rest_framework.exceptions import ValidationError
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class ChatConsumer(AsyncWebsocketConsumer):
+class ChatConsumer(InstrumentedConsumerMixin, AsyncWebsocketConsumer):
     """
     Handles WebSocket connections for the chat functionality.
 
@@ -21,8 +42,6 @@ class ChatConsumer(AsyncWebsocketConsumer):
     It performs authentication, authorization, and joins users to chat rooms.
     """
 
-    connected_users = {}  # maintain the connected clients without group_channels.
-
     # ===============================================
     # Socket Connection Functions
     # ===============================================
@@ -35,13 +54,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         :raises WebSocketClose:
             - If the user is not authenticated, the WebSocket connection is closed with error code 4003
-              and the reason "Anonymous Users are not allowed".
+              and logs "Anonymous Users are not allowed".
 
             - If the associated course is not found for the chat room, the WebSocket connection is closed
-              with error code 4004 and the reason "Course not found for room".
+              with error code 4004 and logs "Course not found for room".
 
             - If the user is not authorized to access the chat room, the WebSocket connection is closed
-              with error code 4001 and the reason "User not authorized".
+              with error code 4001 and logs "User not authorized".
         """
         logger.info("Reached the chatconsumer")
 
@@ -52,74 +71,80 @@ class ChatConsumer(AsyncWebsocketConsumer):
         # Ensure the user is authenticated
         if isinstance(self.scope["user"], AnonymousUser):
             logger.error("Anonymous Users are not allowed")
-            await self.close(code=4003, reason="Anonymous Users are not allowed")
+            await self.close(code=4003)
             return
 
-        # Check if the associated course exists
-        self.course = await self.get_course_for_room()
-        if not self.course:
+        # Resolve the room and the access of the user, cached across reconnects
+        access = await self.get_room_access()
+        if access is None:
             logger.error("Course not found for room")
-            await self.close(code=4004, reason="Course not found for room")
+            await self.close(code=4004)
             return
 
+        self.chat_room_id = access["chat_room_id"]
+        self.course_id = access["course_id"]
+
         # Check if the user is authorized to access the chat room
-        authorized = await self.is_user_authorized()
-        if not authorized:
+        if not access["allowed"]:
             logger.error("User not authorized")
-            await self.close(code=4001, reason="User not authorized")
+            await self.close(code=4001)
             return
 
-        # Store the user's connection to room_group_name
-        username = self.scope["user"].username
-        if username not in self.connected_users:
-            self.connected_users[username] = []
-        self.connected_users[username].append(self.room_group_name)
+        # Clients negotiating the msgpack subprotocol receive binary frames
+        self.binary_frames = (
+            MSGPACK_SUBPROTOCOL in self.scope.get("subprotocols", [])
+            and is_msgpack_enabled()
+        )
 
         # Accept the WebSocket connection and join the room group
-        await self.accept()
+        await self.accept(
+            subprotocol=MSGPACK_SUBPROTOCOL if self.binary_frames else None
+        )
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
 
-    @database_sync_to_async
-    def is_user_authorized(self):
-        """
-        Checks if the user is authorized to access the chat room.
+        # Limit the frames of this connection, alone and together with its room
+        self.rate_limiter = ConnectionRateLimiter(self.room_group_name)
+        self.coalesced_frames = {}
+        self.coalesce_task = None
 
-        This method checks whether the user associated with the WebSocket connection
-        is authorized to access the chat room. A user is considered authorized if
-        they are enrolled in the course associated with the chat room or if they are
-        the teacher of the course.
+        # Register the connection in the presence registry shared by all workers
+        self.presence = get_presence_registry()
+        await self.presence.join(
+            self.room_group_name, self.scope["user"].username, self.channel_name
+        )
+        self.heartbeat_task = asyncio.create_task(self.send_presence_heartbeats())
 
-        :return: True if the user is authorized, False otherwise.
-        :rtype: bool
+    async def send_presence_heartbeats(self):
         """
-        # Get the user associated with the WebSocket connection
-        user = self.scope["user"]
-
-        # Check if the user is enrolled in the course
-        is_enrolled = Enrolment.is_student_enrolled(user, self.course)
+        Periodically extends the presence of this connection until it is cancelled.
 
-        # Check if the user is the teacher of the course
-        is_teacher = self.course.teacher == user
-
-        # User is authorized if they are enrolled in the course or if they are the teacher
-        return is_enrolled or is_teacher
+        A connection that stops sending heartbeats, e.g. because its worker died,
+        expires from the presence registry after the configured TTL.
+        """
+        interval = get_presence_config()["HEARTBEAT_INTERVAL"]
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.presence.heartbeat(
+                    self.room_group_name, self.scope["user"].username, self.channel_name
+                )
+            except Exception as e:
+                logger.error("Failed to send presence heartbeat: %s", e)
 
     @database_sync_to_async
-    def get_course_for_room(self):
+    def get_room_access(self):
         """
-        Retrieves the course associated with the chat room.
+        Retrieves the chat room and whether the user is authorized to access it.
 
-        This method queries the database to find the course associated with the chat room.
+        A user is authorized if they are enrolled in the course associated with the
+        chat room and not banned, or if they are the teacher of the course. The result
+        is cached per user and room, so reconnects do not query the database; see
+        :func:`chat.access.resolve_room_access`.
 
-        :return: The course associated with the chat room, or None if the room doesn't exist.
-        :rtype: Course or None
+        :return: The access of the user, or None if the room doesn't exist.
+        :rtype: dict or None
         """
-        try:
-            # Example: Querying the Course model based on the room name
-            room = ChatRoom.objects.get(chat_name=self.room_name)
-            return room.course
-        except ChatRoom.DoesNotExist:
-            return None
+        return resolve_room_access(self.scope["user"], self.room_name)
 
     @database_sync_to_async
     def get_last_viewed_message(self, chat_room_id):
@@ -151,18 +176,27 @@ class ChatConsumer(AsyncWebsocketConsumer):
             logger.error("Error retrieving last viewed message: %s", e)
             return None
 
-    def get_connected_users(self):
+    @database_sync_to_async
+    def get_roster(self, online_usernames):
+        """
+        Retrieves the members of the chat room with their online state.
+
+        :param online_usernames: The usernames of the connected users.
+        :type online_usernames: list
+
+        :return: The members of the chat room, see :func:`chat.roster.get_room_roster`.
+        :rtype: list[dict]
         """
-        Retrieves the list of connected users.
+        return get_room_roster(self.chat_room_id, online_usernames)
 
-        :return: A list of connected users.
+    async def get_connected_users(self):
+        """
+        Retrieves the users connected to the chat room on any worker.
+
+        :return: A list of connected usernames.
         :rtype: list
         """
-        connected_users = []
-        for username, room_group_name in self.connected_users.items():
-            if self.room_group_name in room_group_name:
-                connected_users.append(username)
-        return connected_users
+        return await get_presence_registry().online_users(self.room_group_name)
 
     # ===============================================
     # Socket Disconnection Functions
@@ -181,15 +215,27 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         :raises WebSocketClose: If any error occurs during the disconnection process.
         """
+        # Connections closed during the connect checks never joined the room
+        if not hasattr(self, "presence"):
+            logger.info("Rejected WebSocket connection closed with code %s", close_code)
+            return
+
         try:
             # Log the disconnection reason code and reason text
             logger.info("Disconnecting WebSocket connection.")
 
-            # Notify other users about the disconnection
-            await self.notify_user_disconnected()
+            # Handle the frames still deferred by the rate limiter
+            await self.flush_coalesced_frames()
+            self.rate_limiter.close()
+
+            # Remove the connection from the presence registry
+            await self.leave_presence()
 
-            # Remove the user from connected_users
-            self.remove_user_from_connected_users()
+            # Notify other users, unless the user is still connected from elsewhere
+            if not await self.presence.is_online(
+                self.room_group_name, self.scope["user"].username
+            ):
+                await self.notify_user_disconnected()
 
             # Leave the room group
             await self.leave_room_group()
@@ -203,61 +249,42 @@ class ChatConsumer(AsyncWebsocketConsumer):
         Notifies other users in the chat room about the disconnection of the current user.
 
         This method sends a message to the chat room group indicating that a user has disconnected.
-        The message includes information about the disconnected user.
+        The message includes the username of the disconnected user.
 
         :raises WebSocketClose: If any error occurs while sending the disconnection message.
         """
-
-        user_data = await database_sync_to_async(ChatMembership.objects.filter)(
-            user_id=self.scope["user"].id, chat_room__chat_name=self.room_name
-        )
-
-        serialized_data = await database_sync_to_async(serialize)("json", user_data)
-
         try:
             await self.channel_layer.group_send(
                 self.room_group_name,
-                {
-                    "type": "chat.user_data",
-                    "action": "user_disconnected",
-                    "users": serialized_data,
-                },
+                build_frame_event(
+                    {
+                        "type": "chat.user_data",
+                        "action": "user_disconnected",
+                        "users": self.scope["user"].username,
+                    }
+                ),
             )
             logger.debug("User disconnected message sent successfully to room group")
         except Exception as e:
             logger.error("Failed to send user disconnected message: %s", e)
 
-    def remove_user_from_connected_users(self):
+    async def leave_presence(self):
         """
-        Removes the disconnected user from the connected_users dictionary.
-
-        This method removes the user from the dictionary tracking connected users.
-        It removes all occurrences of the room group name associated with the disconnected user.
+        Stops the presence heartbeats and removes the connection from the presence registry.
 
-        :raises KeyError: If the disconnected user's username is not found in the connected_users dictionary.
-        :raises ValueError: If an error occurs while removing the user from the connected_users dictionary.
+        Connections closed during the connect checks never joined the registry.
         """
-        try:
-            username = self.scope["user"].username
-            # Iterate over the list and remove all occurrences of self.room_group_name
-            while self.room_group_name in self.connected_users[username]:
-                self.connected_users[username].remove(self.room_group_name)
-                logger.debug("User removed from self.connected_users")
+        heartbeat_task = getattr(self, "heartbeat_task", None)
+        if heartbeat_task:
+            heartbeat_task.cancel()
 
-        except KeyError as e:
-            logger.error(
-                "Failed to remove user from self.connected_users: User '%s' not found.",
-                username,
-            )
-            raise KeyError(
-                f"User '{username}' not found in connected_users dictionary."
-            ) from e
+        if not hasattr(self, "presence"):
+            return
 
-        except ValueError as e:
-            logger.error("Failed to remove user from self.connected_users: %s", e)
-            raise ValueError(
-                "Error occurred while removing user from connected_users dictionary."
-            ) from e
+        await self.presence.leave(
+            self.room_group_name, self.scope["user"].username, self.channel_name
+        )
+        logger.debug("User removed from the presence registry")
 
     async def leave_room_group(self):
         """
@@ -298,22 +325,113 @@ class ChatConsumer(AsyncWebsocketConsumer):
             message_data = json.loads(text_data)
             logger.debug("Received message_data: %s", message_data)
 
-            # Check if the message is a request to retrieve user data or to close user connection
-            if "action" in message_data:
-                if message_data["action"] == "get_user_data":
-                    # Handle request to retrieve user data
-                    await self.handle_get_user_data(message_data)
-                elif message_data["action"] == "close_user_connection":
-                    # Handle request to update the last viewed message
-                    await self.handle_last_viewed_message(message_data)
-            else:
-                # Process the incoming message
-                await self.process_incoming_message(message_data)
+            # Over-limit frames never reach the database or the channel layer
+            if await self.admit_frame(message_data):
+                await self.dispatch_frame(message_data)
 
         except Exception as e:
             logger.error("Failed to process incoming message: %s", e)
             # Handle message processing failure
 
+    async def dispatch_frame(self, message_data):
+        """
+        Dispatches a parsed frame to the handler of its action.
+
+        :param message_data: The message data received from the WebSocket connection.
+        :type message_data: dict
+        """
+        # Check if the message is a request to retrieve user data or to close user connection
+        if "action" in message_data:
+            if message_data["action"] == "get_user_data":
+                # Handle request to retrieve user data
+                await self.handle_get_user_data(message_data)
+            elif message_data["action"] == "close_user_connection":
+                # Handle request to update the last viewed message
+                await self.handle_last_viewed_message(message_data)
+        else:
+            # Process the incoming message
+            await self.process_incoming_message(message_data)
+
+    async def admit_frame(self, message_data):
+        """
+        Checks a frame against the rate limits of the connection and its room.
+
+        Over-limit frames are never queued unboundedly. Requests superseded by the
+        latest one of the same action (see :data:`chat.ratelimit.COALESCED_ACTIONS`)
+        are coalesced into a single frame handled once tokens are available. Every
+        other frame is rejected with a ``chat.error`` frame telling the client when
+        to retry.
+
+        :param message_data: The message data received from the WebSocket connection.
+        :type message_data: dict
+
+        :return: True if the frame may be handled now, False otherwise.
+        :rtype: bool
+        """
+        exhausted, retry_after = self.rate_limiter.check()
+        if exhausted is None:
+            return True
+
+        action = message_data.get("action")
+        if action in COALESCED_ACTIONS:
+            rate_limit_stats.increment("coalesced")
+            self.coalesced_frames[action] = message_data
+            if self.coalesce_task is None or self.coalesce_task.done():
+                self.coalesce_task = asyncio.create_task(
+                    self.replay_coalesced_frames(retry_after)
+                )
+            return False
+
+        rate_limit_stats.increment(f"rejected_{exhausted}")
+        logger.warning(
+            "Rejected frame of %s in %s, %s rate limit exceeded",
+            self.scope["user"].username,
+            self.room_group_name,
+            exhausted,
+        )
+        await self.send_frame(
+            {
+                "type": "chat.error",
+                "action": "rate_limited",
+                "scope": exhausted,
+                "retry_after": round(retry_after, 3),
+            }
+        )
+        return False
+
+    async def replay_coalesced_frames(self, delay):
+        """
+        Handles the coalesced frames once the rate limits allow it.
+
+        :param delay: Seconds to wait before the first attempt.
+        :type delay: float
+        """
+        while self.coalesced_frames:
+            await asyncio.sleep(delay)
+            for action in list(self.coalesced_frames):
+                exhausted, delay = self.rate_limiter.check()
+                if exhausted is not None:
+                    break
+                try:
+                    await self.dispatch_frame(self.coalesced_frames.pop(action))
+                except Exception as e:
+                    logger.error("Failed to process coalesced frame: %s", e)
+
+    async def flush_coalesced_frames(self):
+        """
+        Stops deferring coalesced frames and saves the last viewed message, which the
+        client sends right before closing the connection.
+        """
+        coalesce_task = getattr(self, "coalesce_task", None)
+        if coalesce_task:
+            coalesce_task.cancel()
+
+        message_data = getattr(self, "coalesced_frames", {}).pop(
+            "close_user_connection", None
+        )
+        if message_data:
+            await self.handle_last_viewed_message(message_data)
+
     async def process_incoming_message(self, message_data):
         """
         Processes the incoming message from the WebSocket connection.
@@ -327,40 +445,38 @@ class ChatConsumer(AsyncWebsocketConsumer):
         :raises Exception: If an error occurs during message processing.
         """
         try:
-            # Save the validated message object to the database within a transaction
-            cleaned_message = await self.process_message_data(message_data)
+            if is_write_behind_enabled() and not message_data["message"].get("file"):
+                # Validate in-process and broadcast right away under a provisional ID,
+                # the message is persisted by the next batch of the write buffer
+                cleaned_message = self.build_buffered_message(message_data)
+                message_id = get_message_buffer().enqueue(
+                    cleaned_message, self.room_group_name
+                )
+            else:
+                # Save the validated message object to the database within a transaction
+                cleaned_message = await self.process_message_data(message_data)
+                message_id = cleaned_message.id
             logger.info("Processing incoming message")
 
-            # Retrieve username and full name
-            username = await database_sync_to_async(
-                lambda: cleaned_message.user.username
-            )()
-            full_name = await database_sync_to_async(
-                cleaned_message.user.get_full_name
-            )()
-
-            # Log the cleaned message with user data
-            logger.info(
-                "Cleaned message: %s, Username: %s, Full Name: %s",
-                cleaned_message.content,
-                username,
-                full_name,
-            )
+            # The sender is the connected user, already loaded by the auth middleware
+            user = self.scope["user"]
 
             # Prepare message to broadcast
             message = {
-                "id": cleaned_message.id,
+                "id": message_id,
                 "content": cleaned_message.content,
-                "username": username,
-                "full_name": full_name,
+                "username": user.username,
+                "full_name": user.get_full_name(),
                 "timestamp": cleaned_message.timestamp.isoformat(),
                 # Add any other fields you want to send
             }
 
-            # Send the message to the room group
+            # Encode the message once and send it to the room group
             await self.channel_layer.group_send(
                 self.room_group_name,
-                {"type": "chat.message", "action": "send_message", "message": message},
+                build_frame_event(
+                    {"type": "chat.message", "action": "send_message", "message": message}
+                ),
             )
             logger.info("Message sent to room group: %s", self.room_group_name)
 
@@ -398,30 +514,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 # Include any other fields as needed
             }
 
-            # Now serialize the message data using the MessageSerializer
-            message_serializer = await database_sync_to_async(MessageSerializer)(
-                data=message_payload
-            )
-
-            # Check if the serializer data is valid
-            is_valid = await database_sync_to_async(message_serializer.is_valid)()
-
-            if is_valid:
-                # Save the validated message object to the database
-                cleaned_message = await database_sync_to_async(
-                    message_serializer.save
-                )()
-                logger.info(
-                    "Message data is valid. Message created with ID: %s",
-                    cleaned_message.id,
-                )
-                return cleaned_message
-            else:
-                errors = await database_sync_to_async(message_serializer.errors.get)(
-                    "chat_room"
-                )
-                logger.error("Message data is invalid: %s", errors)
-                raise ValueError("Invalid message data")
+            # Serialize, validate and save the message in a single database hop
+            return await database_sync_to_async(self.save_message)(message_payload)
 
         except KeyError as e:
             logger.error("KeyError: %s", e)
@@ -433,6 +527,99 @@ class ChatConsumer(AsyncWebsocketConsumer):
             logger.error("An error occurred while processing the message: %s", e)
             raise ValueError("Invalid message data")
 
+    def save_message(self, message_payload):
+        """
+        Validates and saves a message with the MessageSerializer.
+
+        :param message_payload: The message data with chat room and user IDs.
+        :type message_payload: dict
+
+        :return: The saved message.
+        :rtype: Message
+
+        :raises ValueError: If the message data is invalid.
+        """
+        message_serializer = MessageSerializer(data=message_payload)
+
+        if message_serializer.is_valid():
+            # Save the validated message object to the database
+            cleaned_message = message_serializer.save()
+            logger.info(
+                "Message data is valid. Message created with ID: %s",
+                cleaned_message.id,
+            )
+            return cleaned_message
+
+        logger.error("Message data is invalid: %s", message_serializer.errors)
+        raise ValueError("Invalid message data")
+
+    def build_buffered_message(self, message_data):
+        """
+        Builds and validates an unsaved message for the write-behind buffer.
+
+        Validation happens in-process: the chat room must be the room of this
+        connection, whose access was checked on connect, and the content must pass
+        the field validators of the Message model.
+
+        :param message_data: The message data received from the WebSocket connection.
+        :type message_data: dict
+
+        :return: The unsaved, validated message.
+        :rtype: Message
+
+        :raises ValueError: If the message data is invalid.
+        """
+        try:
+            chat_room_id = int(message_data["message"]["chat_room"])
+            content = message_data["message"].get("content", None)
+
+            if chat_room_id != self.chat_room_id:
+                raise ValueError("Message sent to a different chat room")
+            if not content:
+                raise ValueError("Message has no content")
+
+            message = Message(
+                chat_room_id=chat_room_id,
+                user_id=self.scope["user"].id,
+                content=content,
+            )
+            message.clean_fields(exclude=["chat_room", "user", "file"])
+            return message
+
+        except (KeyError, TypeError, ValueError, ModelValidationError) as e:
+            logger.error("Invalid buffered message data: %s", e)
+            raise ValueError("Invalid message data")
+
+    async def send_frame(self, frame):
+        """
+        Encodes a frame for this connection and sends it to the client.
+
+        :param frame: The frame to send.
+        :type frame: dict
+        """
+        if self.binary_frames:
+            await self.send(bytes_data=encode_frame(frame, binary=True))
+        else:
+            await self.send(text_data=encode_frame(frame))
+
+    async def chat_frame(self, event):
+        """
+        Handles the 'chat.frame' event, a frame encoded once by the sender.
+
+        The encoded frame is forwarded verbatim: the msgpack ``bytes`` to clients that
+        negotiated binary frames, the JSON ``text`` to every other client.
+
+        :param event: A dictionary containing the encoded frame.
+        :type event: dict
+        """
+        try:
+            if self.binary_frames and event.get("bytes") is not None:
+                await self.send(bytes_data=event["bytes"])
+            else:
+                await self.send(text_data=event["text"])
+        except Exception as e:
+            logger.error("Error handling 'chat.frame' event: %s", e)
+
     async def chat_user_data(self, event):
         """
         Handles the 'chat.user_data' event.
@@ -454,7 +641,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             message_data = {"type": "chat.user_data", "action": action, "users": users}
 
             # Send the message data to the client
-            await self.send(text_data=json.dumps(message_data))
+            await self.send_frame(message_data)
 
         except KeyError as e:
             logger.error("KeyError while handling 'chat.user_data' event: %s", e)
@@ -488,7 +675,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             }
 
             # Send the message data to the client
-            await self.send(text_data=json.dumps(message_data))
+            await self.send_frame(message_data)
 
         except KeyError as e:
             logger.error("KeyError while handling 'chat.message' event: %s", e)
@@ -501,15 +688,34 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """
         Sends user data to the room group.
 
+        Besides the usernames, the payload carries the roster entries of the connected
+        members, read from the cached room roster.
+
         :param users: List of connected users.
         :type users: list
 
         :raises: Exception: If there is an error while sending user data to the room group.
         """
         try:
+            members = [
+                {
+                    **member,
+                    "last_active_timestamp": member["last_active_timestamp"]
+                    and member["last_active_timestamp"].isoformat(),
+                }
+                for member in await self.get_roster(users)
+                if member["is_online"]
+            ]
             await self.channel_layer.group_send(
                 self.room_group_name,
-                {"type": "chat.user_data", "action": "user_connected", "users": users},
+                build_frame_event(
+                    {
+                        "type": "chat.user_data",
+                        "action": "user_connected",
+                        "users": users,
+                        "members": members,
+                    }
+                ),
             )
             logger.info("User data sent successfully to room group")
         except Exception as e:
@@ -530,9 +736,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """
         try:
             logger.info("Received request to get user data")
-            logger.info("Connected users: %s", self.connected_users)
             # Retrieve list of connected users
-            users = self.get_connected_users()
+            users = await self.get_connected_users()
             chat_room_id = message_data["chat_room_id"]
 
             # Retrieve the last viewed message
@@ -544,14 +749,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
             logger.info("Sending user last viewed message...")
 
             # Send the last viewed message to the user
-            await self.send(
-                text_data=json.dumps(
-                    {
-                        "type": "chat.user_data",
-                        "action": "user_last_viewed_message",
-                        "last_viewed_message": last_viewed_message,
-                    }
-                )
+            await self.send_frame(
+                {
+                    "type": "chat.user_data",
+                    "action": "user_last_viewed_message",
+                    "last_viewed_message": last_viewed_message,
+                }
             )
             logger.info("Sent user last viewed message...")
 
@@ -579,8 +782,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
             logger.info("message_data: %s", message_data)
             logger.info("last_viewed_message: %s", message_data["last_viewed_message"])
             logger.info("chat_room_id: %s", message_data["chat_room_id"])
+            last_viewed_message = message_data["last_viewed_message"]
+            if is_provisional_id(last_viewed_message):
+                # The message may still be waiting in the write buffer
+                message_buffer = get_message_buffer()
+                if message_buffer.resolve(last_viewed_message) is None:
+                    await message_buffer.flush()
+                last_viewed_message = message_buffer.resolve(last_viewed_message)
+
             await self.update_last_viewed_message_id(
-                message_data["chat_room_id"], message_data["last_viewed_message"]
+                message_data["chat_room_id"], last_viewed_message
             )
 
             logger.info(
@@ -619,13 +830,18 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
             logger.info("Retrieved ChatMembership instance: %s", chat_membership)
 
-            # Update the last_viewed_message field with the message_id
-            chat_membership.last_viewed_message_id = message_id
-            chat_membership.last_active_timestamp = timezone.now()
-
-            logger.info("ChatMembership instance before saving: %s", chat_membership)
-
-            chat_membership.save()
+            # Update the last_viewed_message field with the message_id and reset the
+            # unread counter to the messages persisted after it, in a single UPDATE
+            # so increments from concurrent messages are not overwritten
+            ChatMembership.objects.filter(pk=chat_membership.pk).update(
+                last_viewed_message_id=message_id,
+                last_active_timestamp=timezone.now(),
+                unread_count=unread_count_expression(
+                    self.scope["user"].id, chat_room_id, message_id
+                ),
+            )
+            # The last active time of the user changed, update() sends no signals
+            invalidate_room_roster(chat_room_id)
             logger.info(
                 "Saved data to the database for %s", self.scope["user"].username
             )
@@ -0,0 +1,62 @@
+import json
+
+from django.conf import settings
+
+try:
+    import msgpack
+except ImportError:  # msgpack is installed with channels_redis
+    msgpack = None
+
+# WebSocket subprotocol negotiated by clients that want binary msgpack frames
+MSGPACK_SUBPROTOCOL = "chat.msgpack"
+
+# Channel layer event type of pre-serialized frames, handled by ChatConsumer.chat_frame
+FRAME_EVENT_TYPE = "chat.frame"
+
+
+def is_msgpack_enabled():
+    """
+    Checks if broadcast frames should also be encoded as msgpack.
+
+    :return: True if ``CHAT_MSGPACK_FRAMES`` is enabled and msgpack is installed.
+    :rtype: bool
+    """
+    return msgpack is not None and getattr(settings, "CHAT_MSGPACK_FRAMES", False)
+
+
+def encode_frame(frame, binary=False):
+    """
+    Encodes a frame for the WebSocket.
+
+    :param frame: The frame to encode, e.g. ``{"type": "chat.message", ...}``.
+    :type frame: dict
+    :param binary: Encode as msgpack instead of JSON.
+    :type binary: bool
+
+    :return: The msgpack bytes if ``binary`` is set, otherwise the JSON text.
+    :rtype: bytes or str
+    """
+    if binary:
+        return msgpack.packb(frame, use_bin_type=True)
+    return json.dumps(frame)
+
+
+def build_frame_event(frame):
+    """
+    Builds a channel layer event carrying a frame encoded once for every receiver.
+
+    Each receiving consumer forwards the encoded frame verbatim instead of encoding
+    the same payload again, so a message to a room of N members is encoded once
+    rather than N times.
+
+    :param frame: The frame to broadcast.
+    :type frame: dict
+
+    :return: The ``chat.frame`` event with the JSON ``text`` and, when enabled, the
+        msgpack ``bytes`` of the frame.
+    :rtype: dict
+    """
+    event = {"type": FRAME_EVENT_TYPE, "text": encode_frame(frame)}
+    if is_msgpack_enabled():
+        event["bytes"] = encode_frame(frame, binary=True)
+    return event
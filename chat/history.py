@@ -0,0 +1,161 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from chat.archive import get_archived_messages
+from chat.models import Message
+
+DEFAULT_HISTORY_PAGE_SIZE = 50
+
+
+def get_history_page_size():
+    """
+    Returns the number of messages loaded per history page.
+
+    :return: The configured ``CHAT_HISTORY_PAGE_SIZE`` or the default page size.
+    :rtype: int
+    """
+    return getattr(settings, "CHAT_HISTORY_PAGE_SIZE", DEFAULT_HISTORY_PAGE_SIZE)
+
+
+def encode_cursor(message):
+    """
+    Encodes the keyset position of a message into an opaque, URL-safe cursor.
+
+    :param message: The message marking the position in the history.
+    :type message: Message
+
+    :return: The encoded cursor.
+    :rtype: str
+    """
+    raw = f"{message.timestamp.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor produced by :func:`encode_cursor`.
+
+    :param cursor: The encoded cursor.
+    :type cursor: str
+
+    :return: A ``(timestamp, id)`` tuple.
+    :rtype: tuple[datetime, int]
+
+    :raises ValueError: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, message_id = raw.rsplit("|", 1)
+        timestamp = datetime.fromisoformat(timestamp)
+        message_id = int(message_id)
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError(f"Invalid history cursor: {cursor}") from e
+
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp, message_id
+
+
+def get_message_page(chat_room, before=None, limit=None):
+    """
+    Retrieves one page of messages older than the given cursor.
+
+    Messages are read newest first along the ``(chat_room, timestamp, id)`` index,
+    so every page is a bounded range scan regardless of the size of the room history.
+    Once the messages in the database are exhausted, the page continues with the
+    archived messages of the room, so cursors page through archive segments alike.
+
+    :param chat_room: The chat room to read from.
+    :type chat_room: ChatRoom
+    :param before: The cursor of the oldest message already shown, or None for the newest page.
+    :type before: str or None
+    :param limit: The maximum number of messages to return.
+    :type limit: int or None
+
+    :return: The messages in chronological order and the cursor for the next (older) page,
+        or None if there are no older messages.
+    :rtype: tuple[list[Message], str or None]
+
+    :raises ValueError: If the cursor is malformed.
+    """
+    limit = limit or get_history_page_size()
+
+    queryset = Message.objects.filter(chat_room=chat_room).select_related("user")
+
+    position = None
+    if before:
+        timestamp, message_id = decode_cursor(before)
+        position = (timestamp, message_id)
+        queryset = queryset.filter(
+            Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=message_id),
+            timestamp__lte=timestamp,
+        )
+
+    # fetch one extra row to know if an older page exists
+    messages = list(queryset.order_by("-timestamp", "-id")[: limit + 1])
+    if len(messages) <= limit:
+        # archived messages are all older than the messages left in the database
+        if messages:
+            position = (messages[-1].timestamp, messages[-1].id)
+        messages += get_archived_messages(
+            chat_room, before=position, limit=limit + 1 - len(messages)
+        )
+
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    messages.reverse()
+
+    next_cursor = encode_cursor(messages[0]) if has_more else None
+    return messages, next_cursor
+
+
+def group_messages_by_date(messages):
+    """
+    Groups chronologically ordered messages into blocks by their local date.
+
+    :param messages: The messages to group.
+    :type messages: list[Message]
+
+    :return: A list of ``{"date": date, "messages": [...]}`` blocks.
+    :rtype: list[dict]
+    """
+    message_blocks = {}
+
+    for message in messages:
+        # Localize the timestamp to the current timezone
+        message_date = timezone.localtime(message.timestamp).date()
+
+        if message_date in message_blocks:
+            message_blocks[message_date]["messages"].append(message)
+        else:
+            # Create a new message block for the current date
+            message_blocks[message_date] = {
+                "date": message_date,
+                "messages": [message],
+            }
+
+    return list(message_blocks.values())
+
+
+def serialize_message(message):
+    """
+    Serializes a message into the payload shape broadcast by the chat consumer.
+
+    :param message: The message to serialize.
+    :type message: Message
+
+    :return: The serialized message.
+    :rtype: dict
+    """
+    return {
+        "id": message.id,
+        "content": message.content,
+        "username": message.user.username,
+        "full_name": message.user.get_full_name(),
+        "timestamp": message.timestamp.isoformat(),
+    }
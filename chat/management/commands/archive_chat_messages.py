@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.archive import run_retention
+from chat.models import ChatRoom
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves chat messages past the retention threshold of their course into "
+        "compressed archive segments."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--room",
+            action="append",
+            dest="rooms",
+            help="Only archive the chat room with this name. Can be repeated.",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Archive messages older than this many days, whatever the policy.",
+        )
+
+    def handle(self, *args, rooms=None, days=None, **options):
+        if days is not None and days < 1:
+            raise CommandError("--days must be at least 1.")
+
+        chat_rooms = ChatRoom.objects.all()
+        if rooms:
+            chat_rooms = chat_rooms.filter(chat_name__in=rooms)
+            missing = set(rooms) - set(chat_rooms.values_list("chat_name", flat=True))
+            if missing:
+                raise CommandError(f"Unknown chat rooms: {', '.join(sorted(missing))}")
+
+        results = run_retention(chat_rooms=chat_rooms, archive_after_days=days)
+        if results is None:
+            raise CommandError("Chat message archiving is already running.")
+
+        for room_name, archived in results.items():
+            self.stdout.write(f"{room_name}: {archived} messages archived")
+        self.stdout.write(
+            self.style.SUCCESS(f"Archived {sum(results.values())} messages.")
+        )
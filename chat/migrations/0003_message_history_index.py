@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-18 16:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat_room', 'timestamp', 'id'], name='chat_message_room_ts_id_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0 on 2026-10-18 17:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_counts(apps, schema_editor):
+    ChatMembership = apps.get_model("chat", "ChatMembership")
+    Message = apps.get_model("chat", "Message")
+
+    unread_messages = (
+        Message.objects.filter(
+            chat_room_id=OuterRef("chat_room_id"),
+            id__gt=Coalesce(OuterRef("last_viewed_message_id"), Value(0)),
+        )
+        .exclude(user_id=OuterRef("user_id"))
+        .order_by()
+        .values("chat_room_id")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    ChatMembership.objects.update(
+        unread_count=Coalesce(Subquery(unread_messages), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0004_message_timestamp_default"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatmembership",
+            name="unread_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="The number of messages of other users after the last viewed message.",
+            ),
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
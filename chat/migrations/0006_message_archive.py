@@ -0,0 +1,139 @@
+# Generated by Django 5.0 on 2026-10-18 17:26
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0005_chatmembership_unread_count"),
+        ("courses", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="chatmembership",
+            name="last_viewed_message",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="chat.message",
+            ),
+        ),
+        migrations.CreateModel(
+            name="RetentionPolicy",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "archive_after_days",
+                    models.PositiveIntegerField(
+                        help_text="Messages older than this many days are moved to archive segments.",
+                        validators=[django.core.validators.MinValueValidator(1)],
+                    ),
+                ),
+                (
+                    "delete_attachments",
+                    models.BooleanField(
+                        default=False,
+                        help_text="Delete the file attachments of archived messages from storage.",
+                    ),
+                ),
+                (
+                    "course",
+                    models.OneToOneField(
+                        help_text="The course whose chat room this policy applies to.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chat_retention_policy",
+                        to="courses.course",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="MessageArchiveSegment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "path",
+                    models.CharField(
+                        help_text="The path of the segment file, relative to the archive root.",
+                        max_length=255,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "start_timestamp",
+                    models.DateTimeField(
+                        help_text="The timestamp of the oldest message in the segment."
+                    ),
+                ),
+                (
+                    "start_message_id",
+                    models.PositiveIntegerField(
+                        help_text="The ID of the oldest message in the segment."
+                    ),
+                ),
+                (
+                    "end_timestamp",
+                    models.DateTimeField(
+                        help_text="The timestamp of the newest message in the segment."
+                    ),
+                ),
+                (
+                    "end_message_id",
+                    models.PositiveIntegerField(
+                        help_text="The ID of the newest message in the segment."
+                    ),
+                ),
+                (
+                    "message_count",
+                    models.PositiveIntegerField(
+                        help_text="The number of messages in the segment."
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="The timestamp when the segment was written.",
+                    ),
+                ),
+                (
+                    "chat_room",
+                    models.ForeignKey(
+                        help_text="The chat room the archived messages belong to.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archive_segments",
+                        to="chat.chatroom",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["chat_room", "end_timestamp", "end_message_id"],
+                        name="chat_archive_room_end_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,6 +1,15 @@
+from django.core.validators import MinValueValidator
 from django.db import models
-from courses.models import Course, User
+from courses.models import Course, Enrolment, User
 from django.utils import timezone
+from django.db.models.signals import post_delete, post_save, pre_save
+from chat.signals import (
+    invalidate_chat_room_caches,
+    invalidate_course_chat_caches,
+    invalidate_enrolment_chat_caches,
+    invalidate_membership_roster,
+    remember_previous_chat_name,
+)
 
 
 class ChatRoom(models.Model):
@@ -62,10 +71,23 @@ class Message(models.Model):
         help_text="Optional file attachment.",
     )
 
+    # set on instantiation rather than on insert, so messages persisted in batches
+    # by the write-behind buffer keep the timestamp they were broadcast with
     timestamp = models.DateTimeField(
-        auto_now_add=True, help_text="The timestamp when the message was created."
+        default=timezone.now,
+        editable=False,
+        help_text="The timestamp when the message was created.",
     )
 
+    class Meta:
+        indexes = [
+            # keyset pagination of the room history reads along this index
+            models.Index(
+                fields=["chat_room", "timestamp", "id"],
+                name="chat_message_room_ts_id_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Message from {self.user} in {self.chat_room} at {self.timestamp}"
 
@@ -77,9 +99,100 @@ class ChatMembership(models.Model):
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     chat_room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE)
+    # archived messages are removed from the table, keep the membership when they go
     last_viewed_message = models.ForeignKey(
-        Message, on_delete=models.CASCADE, null=True, blank=True
+        Message, on_delete=models.SET_NULL, null=True, blank=True
     )
     last_active_timestamp = models.DateTimeField(
         default=timezone.now, help_text="The timestamp when the user disconnects"
     )
+    unread_count = models.PositiveIntegerField(
+        default=0,
+        help_text="The number of messages of other users after the last viewed message.",
+    )
+
+
+class RetentionPolicy(models.Model):
+    """
+    Model to store how long the messages of a course chat room stay in the database.
+    """
+
+    course = models.OneToOneField(
+        Course,
+        on_delete=models.CASCADE,
+        related_name="chat_retention_policy",
+        help_text="The course whose chat room this policy applies to.",
+    )
+    archive_after_days = models.PositiveIntegerField(
+        validators=[MinValueValidator(1)],
+        help_text="Messages older than this many days are moved to archive segments.",
+    )
+    delete_attachments = models.BooleanField(
+        default=False,
+        help_text="Delete the file attachments of archived messages from storage.",
+    )
+
+    def __str__(self):
+        return f"Retention policy for {self.course}"
+
+
+class MessageArchiveSegment(models.Model):
+    """
+    Model to index a compressed file of archived messages of a chat room.
+
+    A segment holds the messages between its start and end positions in the
+    ``(timestamp, id)`` order of the room history.
+    """
+
+    chat_room = models.ForeignKey(
+        ChatRoom,
+        on_delete=models.CASCADE,
+        related_name="archive_segments",
+        help_text="The chat room the archived messages belong to.",
+    )
+    path = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text="The path of the segment file, relative to the archive root.",
+    )
+    start_timestamp = models.DateTimeField(
+        help_text="The timestamp of the oldest message in the segment."
+    )
+    start_message_id = models.PositiveIntegerField(
+        help_text="The ID of the oldest message in the segment."
+    )
+    end_timestamp = models.DateTimeField(
+        help_text="The timestamp of the newest message in the segment."
+    )
+    end_message_id = models.PositiveIntegerField(
+        help_text="The ID of the newest message in the segment."
+    )
+    message_count = models.PositiveIntegerField(
+        help_text="The number of messages in the segment."
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True, help_text="The timestamp when the segment was written."
+    )
+
+    class Meta:
+        indexes = [
+            # the history reads segments newest first from a cursor position
+            models.Index(
+                fields=["chat_room", "end_timestamp", "end_message_id"],
+                name="chat_archive_room_end_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.message_count} archived messages of {self.chat_room}"
+
+
+# Keep the cached chat room access of ChatConsumer.connect and the room rosters in sync
+post_save.connect(invalidate_enrolment_chat_caches, sender=Enrolment)
+post_delete.connect(invalidate_enrolment_chat_caches, sender=Enrolment)
+pre_save.connect(remember_previous_chat_name, sender=ChatRoom)
+post_save.connect(invalidate_chat_room_caches, sender=ChatRoom)
+post_delete.connect(invalidate_chat_room_caches, sender=ChatRoom)
+post_save.connect(invalidate_course_chat_caches, sender=Course)
+post_save.connect(invalidate_membership_roster, sender=ChatMembership)
+post_delete.connect(invalidate_membership_roster, sender=ChatMembership)
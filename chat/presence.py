@@ -0,0 +1,225 @@
+import asyncio
+import time
+import weakref
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+DEFAULT_PRESENCE = {
+    # None selects the registry matching the backend of the default channel layer
+    "BACKEND": None,
+    "TTL": 60,  # seconds a connection stays online without a heartbeat
+    "HEARTBEAT_INTERVAL": 20,  # seconds between heartbeats of a connection
+    "KEY_PREFIX": "presence:",
+}
+
+# Channel layer backends and the presence registry sharing their storage
+CHANNEL_LAYER_REGISTRIES = {
+    "channels_redis.core.RedisChannelLayer": "chat.presence.RedisPresenceRegistry",
+    "channels_redis.pubsub.RedisPubSubChannelLayer": "chat.presence.RedisPresenceRegistry",
+    "channels.layers.InMemoryChannelLayer": "chat.presence.InMemoryPresenceRegistry",
+}
+
+
+def get_presence_config():
+    """
+    Returns the presence configuration merged over the defaults.
+
+    :return: The ``CHAT_PRESENCE`` setting merged over :data:`DEFAULT_PRESENCE`.
+    :rtype: dict
+    """
+    return {**DEFAULT_PRESENCE, **getattr(settings, "CHAT_PRESENCE", {})}
+
+
+class PresenceRegistry:
+    """
+    Tracks which users have an open connection to each room.
+
+    Every connection is a ``(username, channel_name)`` member of the membership set of
+    its room, with an expiry refreshed by heartbeats. Members whose worker died without
+    leaving the room expire after ``ttl`` seconds, so the sets stay correct across any
+    number of ASGI workers and never grow without bound.
+    """
+
+    def __init__(self, ttl, key_prefix="presence:"):
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+
+    @staticmethod
+    def member(username, channel_name):
+        # '|' is not a valid character in usernames
+        return f"{username}|{channel_name}"
+
+    @staticmethod
+    def username(member):
+        return member.split("|", 1)[0]
+
+    def key(self, room):
+        return f"{self.key_prefix}{room}"
+
+    async def join(self, room, username, channel_name):
+        """
+        Marks a connection of the user as online in the room.
+
+        :param room: The room the connection joined.
+        :type room: str
+        :param username: The username of the connected user.
+        :type username: str
+        :param channel_name: The channel name of the connection.
+        :type channel_name: str
+        """
+        raise NotImplementedError
+
+    async def heartbeat(self, room, username, channel_name):
+        """
+        Extends the expiry of a connection in the room.
+        """
+        await self.join(room, username, channel_name)
+
+    async def leave(self, room, username, channel_name):
+        """
+        Removes a connection of the user from the room.
+        """
+        raise NotImplementedError
+
+    async def online_users(self, room):
+        """
+        Retrieves the users with at least one live connection to the room.
+
+        :param room: The room to inspect.
+        :type room: str
+
+        :return: The sorted usernames of the online users.
+        :rtype: list[str]
+        """
+        raise NotImplementedError
+
+    async def is_online(self, room, username):
+        """
+        Checks if the user still has a live connection to the room.
+        """
+        return username in await self.online_users(room)
+
+
+class InMemoryPresenceRegistry(PresenceRegistry):
+    """
+    Process-local presence registry, the stand-in for tests and the in-memory channel layer.
+    """
+
+    def __init__(self, ttl, key_prefix="presence:"):
+        super().__init__(ttl, key_prefix)
+        self._rooms = {}  # room key -> {member: expires_at}
+
+    async def join(self, room, username, channel_name):
+        members = self._rooms.setdefault(self.key(room), {})
+        members[self.member(username, channel_name)] = time.time() + self.ttl
+
+    async def leave(self, room, username, channel_name):
+        members = self._rooms.get(self.key(room), {})
+        members.pop(self.member(username, channel_name), None)
+        if not members:
+            self._rooms.pop(self.key(room), None)
+
+    async def online_users(self, room):
+        now = time.time()
+        members = self._rooms.get(self.key(room), {})
+
+        for member, expires_at in list(members.items()):
+            if expires_at <= now:
+                del members[member]
+
+        return sorted({self.username(member) for member in members})
+
+
+class RedisPresenceRegistry(PresenceRegistry):
+    """
+    Presence registry stored in the Redis server of the channel layer.
+
+    Each room is a sorted set scored by the expiry of its members, so expired
+    connections are dropped with one ``ZREMRANGEBYSCORE`` and reading the room costs
+    O(room size).
+    """
+
+    def __init__(self, ttl, key_prefix="presence:", hosts=None):
+        super().__init__(ttl, key_prefix)
+        self.hosts = hosts or self.channel_layer_hosts()
+        # redis.asyncio connections are bound to the event loop that created them
+        self._clients = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def channel_layer_hosts():
+        config = settings.CHANNEL_LAYERS["default"].get("CONFIG", {})
+        return config.get("hosts", [("localhost", 6379)])
+
+    def client(self):
+        import redis.asyncio as redis
+
+        loop = asyncio.get_running_loop()
+        if loop not in self._clients:
+            host = self.hosts[0]
+            if isinstance(host, str):
+                self._clients[loop] = redis.Redis.from_url(host, decode_responses=True)
+            elif isinstance(host, dict):
+                self._clients[loop] = redis.Redis.from_url(
+                    host["address"], decode_responses=True
+                )
+            else:
+                self._clients[loop] = redis.Redis(
+                    host=host[0], port=host[1], decode_responses=True
+                )
+        return self._clients[loop]
+
+    async def join(self, room, username, channel_name):
+        key = self.key(room)
+        async with self.client().pipeline(transaction=True) as pipe:
+            pipe.zadd(key, {self.member(username, channel_name): time.time() + self.ttl})
+            # drop the whole set once every connection of the room has expired
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def leave(self, room, username, channel_name):
+        await self.client().zrem(self.key(room), self.member(username, channel_name))
+
+    async def online_users(self, room):
+        key = self.key(room)
+        async with self.client().pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(key, "-inf", time.time())
+            pipe.zrange(key, 0, -1)
+            _, members = await pipe.execute()
+
+        return sorted({self.username(member) for member in members})
+
+
+_registry = None
+
+
+def get_presence_registry():
+    """
+    Returns the presence registry of this process, creating it on first use.
+
+    The backend is ``CHAT_PRESENCE["BACKEND"]``, or the registry sharing the storage
+    of the default channel layer when it is not set.
+
+    :return: The presence registry.
+    :rtype: PresenceRegistry
+    """
+    global _registry
+    if _registry is None:
+        config = get_presence_config()
+        backend = config["BACKEND"] or CHANNEL_LAYER_REGISTRIES.get(
+            settings.CHANNEL_LAYERS["default"]["BACKEND"],
+            "chat.presence.InMemoryPresenceRegistry",
+        )
+        _registry = import_string(backend)(
+            ttl=config["TTL"], key_prefix=config["KEY_PREFIX"]
+        )
+    return _registry
+
+
+@receiver(setting_changed)
+def reset_presence_registry(setting, **kwargs):
+    global _registry
+    if setting in ("CHAT_PRESENCE", "CHANNEL_LAYERS"):
+        _registry = None
@@ -0,0 +1,249 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULT_RATE_LIMIT = {
+    "ENABLED": True,
+    "CONNECTION_RATE": 5,  # frames per second of a single connection
+    "CONNECTION_BURST": 10,  # frames a connection may send at once
+    "ROOM_RATE": 50,  # frames per second of all connections to a room in a worker
+    "ROOM_BURST": 100,  # frames a room may receive at once in a worker
+}
+
+# Frames whose latest request supersedes earlier ones, so over-limit frames of
+# these actions are coalesced into one deferred frame instead of being rejected
+COALESCED_ACTIONS = ("get_user_data", "close_user_connection")
+
+
+def get_rate_limit_config():
+    """
+    Returns the rate limit configuration merged over the defaults.
+
+    :return: The ``CHAT_RATE_LIMIT`` setting merged over :data:`DEFAULT_RATE_LIMIT`.
+    :rtype: dict
+    """
+    return {**DEFAULT_RATE_LIMIT, **getattr(settings, "CHAT_RATE_LIMIT", {})}
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at ``rate`` tokens per second, up to ``capacity``.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def is_full(self):
+        """
+        Checks if the bucket is refilled up to its capacity.
+
+        :rtype: bool
+        """
+        self.refill()
+        return self.tokens >= self.capacity
+
+    def retry_after(self, tokens=1):
+        """
+        Returns the seconds until ``tokens`` tokens are available.
+
+        :rtype: float
+        """
+        self.refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+
+def acquire(*buckets, tokens=1):
+    """
+    Takes ``tokens`` from every bucket, or from none of them if any is short.
+
+    :param buckets: The buckets to take the tokens from.
+    :type buckets: TokenBucket
+
+    :return: The bucket that is short of tokens, or None if the tokens were taken.
+    :rtype: TokenBucket or None
+    """
+    for bucket in buckets:
+        bucket.refill()
+        if bucket.tokens < tokens:
+            return bucket
+
+    for bucket in buckets:
+        bucket.tokens -= tokens
+    return None
+
+
+class RateLimitStats:
+    """
+    Process-wide counters of the frames handled by the chat rate limiters.
+    """
+
+    def __init__(self):
+        self._counters = Counter()
+        self._lock = threading.Lock()
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def snapshot(self):
+        """
+        Returns the current value of every counter.
+
+        :return: The ``allowed``, ``coalesced``, ``rejected_connection`` and
+            ``rejected_room`` frame counts.
+        :rtype: dict[str, int]
+        """
+        with self._lock:
+            return {
+                "allowed": self._counters["allowed"],
+                "coalesced": self._counters["coalesced"],
+                "rejected_connection": self._counters["rejected_connection"],
+                "rejected_room": self._counters["rejected_room"],
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+stats = RateLimitStats()
+
+_room_buckets = {}
+_room_connections = Counter()  # connections of this worker to each room
+_idle_rooms = set()  # rooms whose bucket has no connections
+
+
+def get_room_bucket(room_group_name, config):
+    """
+    Returns the bucket shared by the connections of this worker to a room.
+
+    The connection counts towards the bucket until :func:`release_room_bucket`.
+
+    :param room_group_name: The group name of the room.
+    :type room_group_name: str
+    :param config: The rate limit configuration.
+    :type config: dict
+
+    :return: The token bucket of the room.
+    :rtype: TokenBucket
+    """
+    bucket = _room_buckets.get(room_group_name)
+    if bucket is None:
+        evict_idle_room_buckets()
+        bucket = _room_buckets[room_group_name] = TokenBucket(
+            config["ROOM_RATE"], config["ROOM_BURST"]
+        )
+    _room_connections[room_group_name] += 1
+    _idle_rooms.discard(room_group_name)
+    return bucket
+
+
+def release_room_bucket(room_group_name):
+    """
+    Stops counting a closed connection towards the bucket of its room.
+
+    :param room_group_name: The group name of the room.
+    :type room_group_name: str
+    """
+    _room_connections[room_group_name] -= 1
+    if _room_connections[room_group_name] <= 0:
+        del _room_connections[room_group_name]
+        if room_group_name in _room_buckets:
+            _idle_rooms.add(room_group_name)
+    evict_idle_room_buckets()
+
+
+def evict_idle_room_buckets():
+    """
+    Evicts the buckets of the rooms without connections in this worker once they are
+    full, when a new bucket of the room would be the same. A drained bucket is kept
+    until then, so reconnecting does not reset the limit of the room.
+
+    :return: The number of evicted buckets.
+    :rtype: int
+    """
+    evicted = [name for name in _idle_rooms if _room_buckets[name].is_full()]
+    for name in evicted:
+        _idle_rooms.discard(name)
+        del _room_buckets[name]
+    return len(evicted)
+
+
+class ConnectionRateLimiter:
+    """
+    Limits the frames a connection sends, by its own bucket and the bucket of its room.
+
+    The room bucket is shared by the connections to the room handled by the same
+    worker, so a busy room cannot saturate the database or the channel layer even
+    when each of its clients stays under the per-connection limit.
+    """
+
+    def __init__(self, room_group_name, config=None):
+        config = config or get_rate_limit_config()
+        self.enabled = config["ENABLED"]
+        self.room_group_name = room_group_name
+        self.connection_bucket = TokenBucket(
+            config["CONNECTION_RATE"], config["CONNECTION_BURST"]
+        )
+        self.room_bucket = get_room_bucket(room_group_name, config)
+        self.closed = False
+
+    def close(self):
+        """
+        Releases the room bucket once the connection is closed.
+        """
+        if not self.closed:
+            self.closed = True
+            release_room_bucket(self.room_group_name)
+
+    def check(self):
+        """
+        Takes a token for a frame from the connection and room buckets.
+
+        :return: A tuple of the exhausted scope (``"connection"`` or ``"room"``, None
+            if the frame is allowed) and the seconds to wait before retrying.
+        :rtype: tuple[str or None, float]
+        """
+        if not self.enabled:
+            return None, 0.0
+
+        short = acquire(self.connection_bucket, self.room_bucket)
+        if short is None:
+            stats.increment("allowed")
+            return None, 0.0
+
+        scope = "connection" if short is self.connection_bucket else "room"
+        return scope, short.retry_after()
+
+
+def get_rate_limit_stats():
+    """
+    Returns the counters of the chat rate limiters of this process.
+
+    :return: See :meth:`RateLimitStats.snapshot`.
+    :rtype: dict[str, int]
+    """
+    return stats.snapshot()
+
+
+@receiver(setting_changed)
+def reset_room_buckets(setting, **kwargs):
+    if setting == "CHAT_RATE_LIMIT":
+        _room_buckets.clear()
+        _room_connections.clear()
+        _idle_rooms.clear()
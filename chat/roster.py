@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, FilteredRelation, Q
+from django.db.models.functions import Coalesce
+
+from chat.models import ChatRoom
+from courses.models import Enrolment
+from users.models import User
+
+DEFAULT_ROSTER_TIMEOUT = 300  # seconds
+
+
+def roster_key(chat_room_id):
+    return f"chat:roster:{chat_room_id}"
+
+
+def load_room_roster(chat_room_id):
+    """
+    Loads the members of a chat room with a single query.
+
+    Members are the students enrolled in the course of the room and its teacher.
+    Their chat membership in the room is LEFT JOINed to read the time they were
+    last active in it, falling back to their last login.
+
+    :param chat_room_id: The ID of the chat room.
+    :type chat_room_id: int
+
+    :return: The members of the chat room, see :func:`get_room_roster`.
+    :rtype: list[dict]
+    """
+    photo_storage = User._meta.get_field("photo").storage
+
+    members = (
+        User.objects.filter(
+            Q(
+                id__in=Enrolment.objects.filter(
+                    course__chat_room__id=chat_room_id
+                ).values("student_id")
+            )
+            | Q(
+                id__in=ChatRoom.objects.filter(id=chat_room_id).values(
+                    "course__teacher_id"
+                )
+            )
+        )
+        .annotate(
+            room_membership=FilteredRelation(
+                "chatmembership",
+                condition=Q(chatmembership__chat_room_id=chat_room_id),
+            ),
+            last_active_timestamp=Coalesce(
+                F("room_membership__last_active_timestamp"), F("last_login")
+            ),
+        )
+        .values(
+            "id",
+            "username",
+            "first_name",
+            "last_name",
+            "user_type",
+            "photo",
+            "last_active_timestamp",
+        )
+        .order_by("first_name", "last_name", "username")
+    )
+
+    return [
+        {
+            "id": member["id"],
+            "username": member["username"],
+            "full_name": f"{member['first_name']} {member['last_name']}",
+            "user_type": member["user_type"],
+            "photo_url": photo_storage.url(member["photo"]) if member["photo"] else "",
+            "last_active_timestamp": member["last_active_timestamp"],
+        }
+        for member in members
+    ]
+
+
+def get_room_roster(chat_room_id, online_usernames=None):
+    """
+    Retrieves the members of a chat room, from the cache when possible.
+
+    The roster is cached per room and invalidated when enrolments, chat memberships
+    or the course of the room change. Online state is not cached, pass the online
+    usernames from the presence registry to merge it in.
+
+    :param chat_room_id: The ID of the chat room.
+    :type chat_room_id: int
+    :param online_usernames: The usernames of the members currently online.
+    :type online_usernames: iterable of str or None
+
+    :return: The members, each a dict with the ``id``, ``username``, ``full_name``,
+        ``user_type``, ``photo_url``, ``last_active_timestamp`` and ``is_online``
+        of the user.
+    :rtype: list[dict]
+    """
+    key = roster_key(chat_room_id)
+    roster = cache.get(key)
+
+    if roster is None:
+        roster = load_room_roster(chat_room_id)
+        cache.set(
+            key,
+            roster,
+            getattr(settings, "CHAT_ROSTER_TIMEOUT", DEFAULT_ROSTER_TIMEOUT),
+        )
+
+    online_usernames = set(online_usernames or ())
+    return [
+        {**member, "is_online": member["username"] in online_usernames}
+        for member in roster
+    ]
+
+
+def invalidate_room_roster(chat_room_id):
+    """
+    Removes the cached roster of a chat room.
+
+    :param chat_room_id: The ID of the chat room.
+    :type chat_room_id: int
+    """
+    cache.delete(roster_key(chat_room_id))
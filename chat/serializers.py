@@ -1,5 +1,7 @@
+from django.db import transaction
 from rest_framework import serializers
 from chat.models import ChatRoom, Message, ChatMembership
+from chat.unread import count_new_messages, increment_unread_counts
 from courses.serializers import CourseSerializer, UserSerializer
 import logging
 
@@ -31,10 +33,13 @@ class MessageSerializer(serializers.ModelSerializer):
             "validated chat_room_id %d and validated user_id %d", chat_room_id, user_id
         )
 
-        # Create the Message instance with the extracted IDs and other validated data
-        message = Message.objects.create(
-            chat_room_id=chat_room_id, user_id=user_id, **validated_data
-        )
+        # Create the Message instance with the extracted IDs and other validated data,
+        # counting it as unread for the other members of the chat room
+        with transaction.atomic():
+            message = Message.objects.create(
+                chat_room_id=chat_room_id, user_id=user_id, **validated_data
+            )
+            increment_unread_counts(count_new_messages([message]))
         return message
 
 
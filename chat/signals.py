@@ -0,0 +1,73 @@
+def invalidate_enrolment_chat_caches(sender, instance, **kwargs):
+    """
+    Drops the cached chat room access of a student whose enrolment was saved or
+    deleted, including ban toggles, and the roster of the chat room.
+    """
+    from chat.access import invalidate_user_room_access
+    from chat.models import ChatRoom
+    from chat.roster import invalidate_room_roster
+
+    chat_rooms = ChatRoom.objects.filter(course_id=instance.course_id).values_list(
+        "id", "chat_name"
+    )
+    for chat_room_id, room_name in chat_rooms:
+        invalidate_user_room_access(instance.student_id, room_name)
+        invalidate_room_roster(chat_room_id)
+
+
+def remember_previous_chat_name(sender, instance, **kwargs):
+    """
+    Keeps the stored name of a chat room about to be saved, so the cached access
+    to its previous name can be invalidated when it is renamed.
+    """
+    from chat.models import ChatRoom
+
+    instance._previous_chat_name = (
+        ChatRoom.objects.filter(pk=instance.pk)
+        .values_list("chat_name", flat=True)
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+def invalidate_chat_room_caches(sender, instance, **kwargs):
+    """
+    Invalidates the cached access of every user and the roster of a chat room that
+    was created, changed or deleted.
+    """
+    from chat.access import invalidate_room_access
+    from chat.roster import invalidate_room_roster
+
+    invalidate_room_access(instance.chat_name)
+    invalidate_room_roster(instance.id)
+
+    previous_chat_name = getattr(instance, "_previous_chat_name", None)
+    if previous_chat_name and previous_chat_name != instance.chat_name:
+        invalidate_room_access(previous_chat_name)
+
+
+def invalidate_course_chat_caches(sender, instance, **kwargs):
+    """
+    Invalidates the cached access to the chat room of a saved course, whose teacher
+    may have changed, and the roster of the chat room.
+    """
+    from chat.access import invalidate_room_access
+    from chat.models import ChatRoom
+    from chat.roster import invalidate_room_roster
+
+    chat_rooms = ChatRoom.objects.filter(course_id=instance.id).values_list(
+        "id", "chat_name"
+    )
+    for chat_room_id, room_name in chat_rooms:
+        invalidate_room_access(room_name)
+        invalidate_room_roster(chat_room_id)
+
+
+def invalidate_membership_roster(sender, instance, **kwargs):
+    """
+    Drops the cached roster of the chat room of a saved or deleted chat membership.
+    """
+    from chat.roster import invalidate_room_roster
+
+    invalidate_room_roster(instance.chat_room_id)
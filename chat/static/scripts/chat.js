@@ -43,6 +43,9 @@ chatSocket.onmessage = function (event) {
         case 'chat.message':
             handleMessage(data);
             break;
+        case 'chat.error':
+            handleErrorMessage(data);
+            break;
         default:
             console.error('Unknown message type:', data.type);
     }
@@ -127,6 +130,20 @@ function updateUserStatus(user, isActive) {
     }
 }
 
+/**
+ * Handle an error frame sent by the server.
+ * @param {Object} data - The error frame.
+ * @param {string} data.action - The error, e.g. "rate_limited".
+ * @param {number} data.retry_after - Seconds to wait before sending again.
+ */
+function handleErrorMessage(data) {
+    if (data.action === "rate_limited") {
+        console.warn(`Sending too fast, your message was not sent. Retry in ${data.retry_after}s.`);
+    } else {
+        console.error('Unknown action in error message:', data.action);
+    }
+}
+
 // Function to handle message data messages
 function handleMessage(data) {
     // Handle other types of messages
@@ -134,11 +151,29 @@ function handleMessage(data) {
         appendMessage(data.message);
         
         last_viewed_message = data.message.id
+    } else if (data.action === "message_persisted") {
+        replaceProvisionalIds(data.message.ids);
     } else {
         console.error('Unknown action in message data:', data.action);
     }
 }
 
+/**
+ * Replace the provisional IDs of buffered messages with their database IDs.
+ * @param {Object} ids - Mapping of provisional message IDs to database IDs.
+ */
+function replaceProvisionalIds(ids) {
+    Object.entries(ids).forEach(([provisionalId, messageId]) => {
+        const messageDiv = document.querySelector(`div[data-message-id="${provisionalId}"]`);
+        if (messageDiv) {
+            messageDiv.dataset.messageId = messageId;
+        }
+        if (last_viewed_message === provisionalId) {
+            last_viewed_message = messageId;
+        }
+    });
+}
+
 /**
  * Append a new message to the chat log.
  * @param {Object} message - The message object containing details of the message.
@@ -312,11 +347,20 @@ messageInput.addEventListener('keydown', (event) => {
 });
 
 // format dates with dayjs
-document.querySelectorAll('div[data-timestamp]').forEach((timestamp) => {
-    const ISOtimestamp = timestamp.dataset.timestamp;
-    const localTime = formatDateToHourMin(ISOtimestamp);
+function formatMessageTimestamps(root) {
+    root.querySelectorAll('div[data-timestamp]').forEach((timestamp) => {
+        const ISOtimestamp = timestamp.dataset.timestamp;
+        const localTime = formatDateToHourMin(ISOtimestamp);
+
+        timestamp.querySelector('span').textContent = localTime;
+    });
+}
+
+formatMessageTimestamps(document);
 
-    timestamp.querySelector('span').textContent = localTime;
+// older pages of the history are swapped in by htmx when the loader is revealed
+document.body.addEventListener('htmx:load', function (event) {
+    formatMessageTimestamps(event.detail.elt);
 });
 
 function formatDateToHourMin(timestamp) {
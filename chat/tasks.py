@@ -0,0 +1,23 @@
+import logging
+
+from celery import shared_task
+
+from chat.archive import run_retention
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def archive_chat_messages():
+    """
+    Moves the chat messages past the retention threshold of their course into
+    archive segments. Scheduled by ``CELERY_BEAT_SCHEDULE``.
+
+    :return: The number of archived messages per chat room name, or None if another
+        run is in progress.
+    :rtype: dict[str, int] or None
+    """
+    results = run_retention()
+    if results:
+        logger.info("Archived %d chat messages", sum(results.values()))
+    return results
@@ -6,3 +6,10 @@ from chat.tests.factories import ChatRoomFactory
 @pytest.fixture
 def chatRoom(official_course):
     return ChatRoomFactory(course=official_course, chat_name="chat-name-test")
+
+
+@pytest.fixture
+def in_memory_channel_layer(settings):
+    settings.CHANNEL_LAYERS = {
+        "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+    }
@@ -0,0 +1,144 @@
+import pytest
+from channels.testing import WebsocketCommunicator
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from chat.access import resolve_room_access
+from chat.consumers import ChatConsumer
+from chat.tests.fixtures import chatRoom, in_memory_channel_layer
+from courses.models import Enrolment
+from courses.tests.fixtures import (
+    enrol,
+    enrolled_student_user,
+    not_enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+
+
+@pytest.mark.django_db
+class TestRoomAccessCache:
+    @pytest.fixture(autouse=True)
+    def setup(
+        self,
+        enrol,
+        enrolled_student_user,
+        not_enrolled_student_user,
+        teacher_user,
+        chatRoom,
+    ):
+        self.enrolment = enrol
+        self.student = enrolled_student_user
+        self.not_enrolled_student = not_enrolled_student_user
+        self.teacher = teacher_user
+        self.chatRoom = chatRoom
+
+    def test_miss_queries_once_and_hit_does_not_query(
+        self, django_assert_num_queries
+    ):
+        with django_assert_num_queries(1):
+            access = resolve_room_access(self.student, self.chatRoom.chat_name)
+
+        assert access == {
+            "chat_room_id": self.chatRoom.id,
+            "course_id": self.chatRoom.course_id,
+            "allowed": True,
+        }
+
+        with django_assert_num_queries(0):
+            assert resolve_room_access(self.student, self.chatRoom.chat_name) == access
+
+    def test_teacher_and_not_enrolled_student(self):
+        assert resolve_room_access(self.teacher, self.chatRoom.chat_name)["allowed"]
+        assert not resolve_room_access(
+            self.not_enrolled_student, self.chatRoom.chat_name
+        )["allowed"]
+
+    def test_unknown_room(self):
+        assert resolve_room_access(self.student, "no-such-room") is None
+
+    def test_ban_toggle_invalidates_access(self):
+        client = APIClient()
+        client.force_login(self.teacher)
+        assert resolve_room_access(self.student, self.chatRoom.chat_name)["allowed"]
+
+        client.patch(
+            reverse(
+                "update-ban-status",
+                kwargs={
+                    "course_id": self.chatRoom.course_id,
+                    "student_id": self.student.id,
+                },
+            )
+        )
+
+        assert Enrolment.objects.get(pk=self.enrolment.pk).is_banned
+        assert not resolve_room_access(self.student, self.chatRoom.chat_name)[
+            "allowed"
+        ]
+
+    def test_enrolment_invalidates_access(self):
+        assert not resolve_room_access(
+            self.not_enrolled_student, self.chatRoom.chat_name
+        )["allowed"]
+
+        enrolment = Enrolment.objects.create(
+            student=self.not_enrolled_student, course=self.chatRoom.course
+        )
+        assert resolve_room_access(self.not_enrolled_student, self.chatRoom.chat_name)[
+            "allowed"
+        ]
+
+        enrolment.delete()
+        assert not resolve_room_access(
+            self.not_enrolled_student, self.chatRoom.chat_name
+        )["allowed"]
+
+    def test_chat_room_rename_invalidates_access(self):
+        previous_name = self.chatRoom.chat_name
+        assert resolve_room_access(self.student, previous_name) is not None
+
+        self.chatRoom.chat_name = "renamed-chat"
+        self.chatRoom.save()
+
+        assert resolve_room_access(self.student, previous_name) is None
+        assert resolve_room_access(self.student, "renamed-chat")["allowed"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+class TestChatConsumerAccess:
+    @pytest.fixture(autouse=True)
+    def setup(
+        self,
+        enrol,
+        enrolled_student_user,
+        not_enrolled_student_user,
+        chatRoom,
+        in_memory_channel_layer,
+    ):
+        self.chatRoom = chatRoom
+        self.student = enrolled_student_user
+        self.not_enrolled_student = not_enrolled_student_user
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chat/{self.chatRoom.chat_name}/"
+        )
+        communicator.scope["user"] = user
+        communicator.scope["url_route"] = {
+            "kwargs": {"room_name": self.chatRoom.chat_name}
+        }
+        return communicator, await communicator.connect()
+
+    async def test_enrolled_student_connects(self):
+        communicator, (connected, _) = await self.connect(self.student)
+
+        assert connected
+        await communicator.disconnect()
+
+    async def test_not_enrolled_student_is_rejected(self):
+        communicator, (connected, code) = await self.connect(self.not_enrolled_student)
+
+        assert not connected
+        assert code == 4001
@@ -0,0 +1,123 @@
+import json
+from datetime import timedelta
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from chat.archive import get_archived_messages, read_segment, run_retention
+from chat.history import get_message_page
+from chat.models import ChatMembership, Message, MessageArchiveSegment, RetentionPolicy
+from chat.tests.fixtures import chatRoom
+from chat.tests.test_chat_history import create_messages
+from courses.tests.fixtures import (
+    enrol,
+    enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+
+
+@pytest.mark.django_db
+class TestMessageArchive:
+    @pytest.fixture(autouse=True)
+    def setup(self, chatRoom, enrolled_student_user, settings, tmp_path):
+        settings.CHAT_RETENTION = {"SEGMENT_SIZE": 4, "ARCHIVE_ROOT": tmp_path}
+        self.chatRoom = chatRoom
+        self.user = enrolled_student_user
+        self.archive_root = tmp_path
+
+        # 10 messages 40 days old, then 3 recent ones
+        self.old_ids = create_messages(
+            chatRoom,
+            enrolled_student_user,
+            10,
+            start=timezone.now() - timedelta(days=40),
+        )
+        self.recent_ids = create_messages(chatRoom, enrolled_student_user, 3)
+        RetentionPolicy.objects.create(course=chatRoom.course, archive_after_days=30)
+
+    def test_old_messages_are_moved_to_segments(self):
+        ChatMembership.objects.create(
+            user=self.user,
+            chat_room=self.chatRoom,
+            last_viewed_message_id=self.old_ids[-1],
+        )
+
+        results = run_retention()
+
+        assert results == {self.chatRoom.chat_name: 10}
+        assert list(
+            Message.objects.order_by("id").values_list("id", flat=True)
+        ) == self.recent_ids
+
+        segments = list(MessageArchiveSegment.objects.order_by("start_message_id"))
+        assert [segment.message_count for segment in segments] == [4, 4, 2]
+        assert segments[0].path.endswith(".jsonl.gz")
+        assert [record["id"] for record in read_segment(segments[0])] == (
+            self.old_ids[:4]
+        )
+        # the membership survives the deletion of its last viewed message
+        assert ChatMembership.objects.get(user=self.user).last_viewed_message is None
+
+        # a second run has nothing left to archive
+        assert run_retention() == {self.chatRoom.chat_name: 0}
+
+    def test_rooms_without_policy_are_kept(self):
+        RetentionPolicy.objects.all().delete()
+
+        assert run_retention() == {}
+        assert Message.objects.count() == 13
+
+    def test_history_pages_through_archived_messages(self):
+        run_retention()
+
+        messages, cursor = get_message_page(self.chatRoom, limit=5)
+        seen = [message.id for message in messages]
+        while cursor:
+            messages, cursor = get_message_page(self.chatRoom, before=cursor, limit=5)
+            seen = [message.id for message in messages] + seen
+
+        assert seen == self.old_ids + self.recent_ids
+        assert messages[0].user.username == self.user.username
+        assert messages[0].content == "message 0"
+
+    def test_archived_messages_before_position(self):
+        run_retention()
+        archived = get_archived_messages(self.chatRoom, limit=10)
+        assert [message.id for message in archived] == self.old_ids[::-1]
+
+        # the position falls inside the second segment
+        pivot = archived[4]
+        older = get_archived_messages(
+            self.chatRoom, before=(pivot.timestamp, pivot.id), limit=3
+        )
+
+        assert [message.id for message in older] == self.old_ids[4:1:-1]
+
+    def test_transcript_includes_archived_messages(self, teacher_user):
+        run_retention()
+        client = APIClient()
+        client.force_login(teacher_user)
+
+        response = client.get(
+            reverse("room_transcript", kwargs={"room_name": self.chatRoom.chat_name})
+        )
+
+        rows = b"".join(response.streaming_content).decode().splitlines()
+        assert [json.loads(row)["id"] for row in rows] == (
+            self.old_ids + self.recent_ids
+        )
+
+    def test_management_command(self):
+        RetentionPolicy.objects.all().delete()
+
+        call_command("archive_chat_messages", room=[self.chatRoom.chat_name], days=2)
+
+        assert Message.objects.count() == 3
+        assert not list(self.archive_root.glob("**/*.tmp"))
+
+        with pytest.raises(CommandError):
+            call_command("archive_chat_messages", room=["missing"])
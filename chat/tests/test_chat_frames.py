@@ -0,0 +1,102 @@
+import json
+
+import msgpack
+import pytest
+from channels.testing import WebsocketCommunicator
+
+from chat import frames
+from chat.consumers import ChatConsumer
+from chat.frames import MSGPACK_SUBPROTOCOL, build_frame_event
+from chat.tests.fixtures import chatRoom, in_memory_channel_layer
+from courses.tests.fixtures import (
+    enrol,
+    enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+
+
+def test_frame_event_encodes_once(settings):
+    frame = {"type": "chat.message", "action": "send_message", "message": {"id": 1}}
+
+    event = build_frame_event(frame)
+
+    assert event["type"] == "chat.frame"
+    assert json.loads(event["text"]) == frame
+    # frames are only encoded as msgpack when enabled
+    assert "bytes" not in event
+
+    settings.CHAT_MSGPACK_FRAMES = True
+    assert msgpack.unpackb(build_frame_event(frame)["bytes"]) == frame
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+class TestChatConsumerFrames:
+    @pytest.fixture(autouse=True)
+    def setup(
+        self,
+        enrol,
+        enrolled_student_user,
+        teacher_user,
+        chatRoom,
+        in_memory_channel_layer,
+    ):
+        self.chatRoom = chatRoom
+        self.student = enrolled_student_user
+        self.teacher = teacher_user
+
+    async def connect(self, user, subprotocols=None):
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(),
+            f"/ws/chat/{self.chatRoom.chat_name}/",
+            subprotocols=subprotocols,
+        )
+        communicator.scope["user"] = user
+        communicator.scope["url_route"] = {
+            "kwargs": {"room_name": self.chatRoom.chat_name}
+        }
+        connected, subprotocol = await communicator.connect()
+        assert connected
+        return communicator, subprotocol
+
+    async def test_broadcast_to_json_and_msgpack_clients(self, monkeypatch, settings):
+        settings.CHAT_MSGPACK_FRAMES = True
+        json_client, json_subprotocol = await self.connect(self.student)
+        msgpack_client, msgpack_subprotocol = await self.connect(
+            self.teacher, subprotocols=[MSGPACK_SUBPROTOCOL]
+        )
+        assert json_subprotocol is None
+        assert msgpack_subprotocol == MSGPACK_SUBPROTOCOL
+
+        encoded = []
+        encode_frame = frames.encode_frame
+        monkeypatch.setattr(
+            frames,
+            "encode_frame",
+            lambda frame, binary=False: encoded.append(binary)
+            or encode_frame(frame, binary),
+        )
+
+        await json_client.send_json_to(
+            {"message": {"chat_room": self.chatRoom.id, "content": "hello"}}
+        )
+
+        text_frame = await json_client.receive_json_from()
+        binary_frame = msgpack.unpackb(await msgpack_client.receive_from())
+
+        assert text_frame["message"]["content"] == "hello"
+        assert binary_frame == text_frame
+        # encoded once per format by the sender, not once per receiver
+        assert sorted(encoded) == [False, True]
+
+        await json_client.disconnect()
+        await msgpack_client.disconnect()
+
+    async def test_msgpack_not_negotiated_by_default(self):
+        communicator, subprotocol = await self.connect(
+            self.student, subprotocols=[MSGPACK_SUBPROTOCOL]
+        )
+
+        assert subprotocol is None
+        await communicator.disconnect()
@@ -0,0 +1,175 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from chat.history import (
+    decode_cursor,
+    encode_cursor,
+    get_message_page,
+    group_messages_by_date,
+)
+from chat.models import Message
+from chat.tests.fixtures import chatRoom
+from courses.tests.fixtures import (
+    enrol,
+    enrolled_student_user,
+    not_enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+
+
+def create_messages(chat_room, user, count, start=None):
+    """
+    Create ``count`` messages one minute apart, oldest first.
+    """
+    start = start or timezone.now() - timedelta(days=1)
+    messages = []
+    for i in range(count):
+        message = Message.objects.create(
+            chat_room=chat_room, user=user, content=f"message {i}"
+        )
+        # auto_now_add ignores explicit values, so set the timestamp afterwards
+        Message.objects.filter(pk=message.pk).update(
+            timestamp=start + timedelta(minutes=i)
+        )
+        messages.append(message.pk)
+    return messages
+
+
+@pytest.mark.django_db
+class TestMessagePagination:
+    @pytest.fixture(autouse=True)
+    def setup(self, chatRoom, enrolled_student_user, settings):
+        settings.CHAT_HISTORY_PAGE_SIZE = 5
+        self.chatRoom = chatRoom
+        self.user = enrolled_student_user
+        self.message_ids = create_messages(chatRoom, enrolled_student_user, 12)
+
+    def test_first_page_returns_newest_messages(self):
+        messages, cursor = get_message_page(self.chatRoom)
+
+        assert [message.id for message in messages] == self.message_ids[-5:]
+        assert cursor is not None
+
+    def test_pages_walk_back_without_gaps(self):
+        seen = []
+        cursor = None
+        while True:
+            messages, cursor = get_message_page(self.chatRoom, before=cursor)
+            seen = [message.id for message in messages] + seen
+            if cursor is None:
+                break
+
+        assert seen == self.message_ids
+
+    def test_messages_with_equal_timestamps_are_not_skipped(self):
+        Message.objects.filter(chat_room=self.chatRoom).update(
+            timestamp=timezone.now()
+        )
+
+        first_page, cursor = get_message_page(self.chatRoom, limit=4)
+        second_page, _ = get_message_page(self.chatRoom, before=cursor, limit=4)
+
+        first_ids = {message.id for message in first_page}
+        second_ids = {message.id for message in second_page}
+        assert not first_ids & second_ids
+        assert max(second_ids) < min(first_ids)
+
+    def test_cursor_round_trip(self):
+        message = Message.objects.get(pk=self.message_ids[3])
+
+        timestamp, message_id = decode_cursor(encode_cursor(message))
+
+        assert timestamp == message.timestamp
+        assert message_id == message.id
+
+    def test_invalid_cursor(self):
+        with pytest.raises(ValueError):
+            get_message_page(self.chatRoom, before="not-a-cursor")
+
+    def test_group_messages_by_date(self):
+        messages, _ = get_message_page(self.chatRoom, limit=12)
+
+        blocks = group_messages_by_date(messages)
+
+        assert sum(len(block["messages"]) for block in blocks) == 12
+        assert [block["date"] for block in blocks] == sorted(
+            block["date"] for block in blocks
+        )
+
+
+@pytest.mark.django_db
+class TestRoomHistoryView:
+    @pytest.fixture(autouse=True)
+    def setup(
+        self,
+        enrol,
+        enrolled_student_user,
+        not_enrolled_student_user,
+        chatRoom,
+        settings,
+    ):
+        settings.CHAT_HISTORY_PAGE_SIZE = 5
+        self.client = APIClient()
+        self.chatRoom = chatRoom
+        self.user = enrolled_student_user
+        self.not_enrolled_user = not_enrolled_student_user
+        self.message_ids = create_messages(chatRoom, enrolled_student_user, 8)
+        self.url = reverse("room_history", kwargs={"room_name": chatRoom.chat_name})
+
+    def test_room_renders_latest_page_only(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(
+            reverse("room", kwargs={"room_name": self.chatRoom.chat_name})
+        )
+
+        assert response.status_code == 200
+        rendered_ids = [
+            message.id
+            for block in response.context["message_blocks"]
+            for message in block["messages"]
+        ]
+        assert rendered_ids == self.message_ids[-5:]
+        assert response.context["history_cursor"] is not None
+
+    def test_history_json(self):
+        self.client.force_login(self.user)
+        _, cursor = get_message_page(self.chatRoom)
+
+        response = self.client.get(self.url, {"before": cursor, "format": "json"})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [message["id"] for message in data["messages"]] == self.message_ids[:3]
+        assert data["next_cursor"] is None
+
+    def test_history_fragment(self):
+        self.client.force_login(self.user)
+        _, cursor = get_message_page(self.chatRoom)
+
+        response = self.client.get(self.url, {"before": cursor})
+
+        assert response.status_code == 200
+        assert "chat/partials/message_history.html" in [
+            template.name for template in response.templates
+        ]
+        assert 'id="historyLoader"' not in response.content.decode("utf-8")
+
+    def test_history_invalid_cursor(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(self.url, {"before": "???"})
+
+        assert response.status_code == 400
+
+    def test_history_not_authorized(self):
+        self.client.force_login(self.not_enrolled_user)
+
+        response = self.client.get(self.url)
+
+        assert response.status_code == 403
@@ -0,0 +1,145 @@
+import logging
+import time
+
+import pytest
+from channels.testing import WebsocketCommunicator
+
+from chat.consumers import ChatConsumer
+from chat.presence import (
+    InMemoryPresenceRegistry,
+    RedisPresenceRegistry,
+    get_presence_registry,
+)
+from chat.tests.fixtures import chatRoom, in_memory_channel_layer
+from courses.tests.fixtures import (
+    enrol,
+    enrolled_student_user,
+    not_enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+
+
+@pytest.mark.asyncio
+class TestInMemoryPresenceRegistry:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.registry = InMemoryPresenceRegistry(ttl=60)
+
+    async def test_online_users_per_room(self):
+        await self.registry.join("chat_a", "alice", "channel-1")
+        await self.registry.join("chat_a", "bob", "channel-2")
+        await self.registry.join("chat_b", "carol", "channel-3")
+
+        assert await self.registry.online_users("chat_a") == ["alice", "bob"]
+        assert await self.registry.online_users("chat_b") == ["carol"]
+
+    async def test_user_online_until_last_connection_leaves(self):
+        await self.registry.join("chat_a", "alice", "channel-1")
+        await self.registry.join("chat_a", "alice", "channel-2")
+
+        await self.registry.leave("chat_a", "alice", "channel-1")
+        assert await self.registry.is_online("chat_a", "alice")
+
+        await self.registry.leave("chat_a", "alice", "channel-2")
+        assert not await self.registry.is_online("chat_a", "alice")
+
+    async def test_connections_expire_without_heartbeat(self, monkeypatch):
+        await self.registry.join("chat_a", "alice", "channel-1")
+        await self.registry.join("chat_a", "bob", "channel-2")
+
+        now = time.time()
+        monkeypatch.setattr("chat.presence.time.time", lambda: now + 45)
+        await self.registry.heartbeat("chat_a", "bob", "channel-2")
+
+        monkeypatch.setattr("chat.presence.time.time", lambda: now + 90)
+        assert await self.registry.online_users("chat_a") == ["bob"]
+
+
+def test_registry_follows_channel_layer(settings):
+    settings.CHANNEL_LAYERS = {
+        "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+    }
+    assert isinstance(get_presence_registry(), InMemoryPresenceRegistry)
+
+    settings.CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [("redis", 6379)]},
+        }
+    }
+    registry = get_presence_registry()
+    assert isinstance(registry, RedisPresenceRegistry)
+    assert registry.hosts == [("redis", 6379)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+class TestChatConsumerPresence:
+    @pytest.fixture(autouse=True)
+    def setup(
+        self,
+        enrol,
+        enrolled_student_user,
+        teacher_user,
+        chatRoom,
+        in_memory_channel_layer,
+    ):
+        self.chatRoom = chatRoom
+        self.student = enrolled_student_user
+        self.teacher = teacher_user
+
+    def communicator(self, user):
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chat/{self.chatRoom.chat_name}/"
+        )
+        communicator.scope["user"] = user
+        communicator.scope["url_route"] = {
+            "kwargs": {"room_name": self.chatRoom.chat_name}
+        }
+        return communicator
+
+    async def connect(self, user):
+        communicator = self.communicator(user)
+        connected, _ = await communicator.connect()
+        assert connected
+        return communicator
+
+    async def test_connected_users_and_disconnect(self):
+        student = await self.connect(self.student)
+        teacher = await self.connect(self.teacher)
+
+        await teacher.send_json_to(
+            {"action": "get_user_data", "chat_room_id": self.chatRoom.id}
+        )
+        user_data = await student.receive_json_from()
+        assert user_data["action"] == "user_connected"
+        assert user_data["users"] == sorted(
+            [self.student.username, self.teacher.username]
+        )
+
+        await teacher.disconnect()
+        disconnected = await student.receive_json_from()
+        assert disconnected["action"] == "user_disconnected"
+        assert disconnected["users"] == self.teacher.username
+
+        room = f"chat_{self.chatRoom.chat_name}"
+        assert await get_presence_registry().online_users(room) == [
+            self.student.username
+        ]
+
+        await student.disconnect()
+
+    async def test_rejected_connection_leaves_the_room_untouched(
+        self, not_enrolled_student_user, caplog
+    ):
+        student = await self.connect(self.student)
+        rejected = self.communicator(not_enrolled_student_user)
+        assert await rejected.connect() == (False, 4001)
+
+        with caplog.at_level(logging.ERROR, logger="chat.consumers"):
+            await rejected.disconnect()
+
+        assert "Failed to disconnect" not in caplog.text
+        assert await student.receive_nothing()
+        await student.disconnect()
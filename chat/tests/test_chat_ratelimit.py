@@ -0,0 +1,210 @@
+import pytest
+from channels.testing import WebsocketCommunicator
+
+from chat.consumers import ChatConsumer
+from chat import ratelimit
+from chat.ratelimit import (
+    ConnectionRateLimiter,
+    TokenBucket,
+    acquire,
+    get_rate_limit_stats,
+    stats,
+)
+from chat.tests.fixtures import chatRoom, in_memory_channel_layer
+from courses.tests.fixtures import (
+    enrol,
+    enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    def test_bucket_refills_at_rate_up_to_capacity(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+
+        assert [acquire(bucket) for _ in range(4)] == [None, None, None, bucket]
+        assert bucket.retry_after() == pytest.approx(0.5)
+
+        clock.now = 10
+        bucket.refill()
+        assert bucket.tokens == 3
+
+    def test_acquire_takes_from_all_buckets_or_none(self):
+        clock = FakeClock()
+        connection = TokenBucket(rate=1, capacity=5, clock=clock)
+        room = TokenBucket(rate=1, capacity=1, clock=clock)
+
+        assert acquire(connection, room) is None
+        assert acquire(connection, room) is room
+        assert connection.tokens == 4
+
+
+class TestRoomBuckets:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings):
+        # Changing the setting also resets the room buckets
+        settings.CHAT_RATE_LIMIT = {"ROOM_RATE": 1, "ROOM_BURST": 2}
+
+    def test_bucket_is_evicted_when_the_last_connection_closes(self):
+        first = ConnectionRateLimiter("chat_room")
+        second = ConnectionRateLimiter("chat_room")
+        assert first.room_bucket is second.room_bucket
+
+        first.close()
+        first.close()
+        assert "chat_room" in ratelimit._room_buckets
+
+        second.close()
+        assert "chat_room" not in ratelimit._room_buckets
+
+    def test_drained_bucket_is_kept_until_full(self):
+        clock = FakeClock()
+        limiter = ConnectionRateLimiter("chat_room")
+        bucket = limiter.room_bucket
+        bucket.clock, bucket.updated_at = clock, 0.0
+        assert acquire(bucket, tokens=2) is None
+
+        limiter.close()
+
+        # Reconnecting does not reset the limit of the room
+        limiter = ConnectionRateLimiter("chat_room")
+        assert limiter.room_bucket is bucket
+        limiter.close()
+
+        # Evicted once refilled, when a bucket of another room is created
+        clock.now = 2.0
+        ConnectionRateLimiter("chat_other").close()
+        assert ratelimit._room_buckets == {}
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+class TestChatConsumerRateLimit:
+    @pytest.fixture(autouse=True)
+    def setup(
+        self,
+        enrol,
+        enrolled_student_user,
+        chatRoom,
+        in_memory_channel_layer,
+        settings,
+    ):
+        settings.CHAT_RATE_LIMIT = {
+            "CONNECTION_RATE": 0.01,
+            "CONNECTION_BURST": 2,
+            "ROOM_RATE": 100,
+            "ROOM_BURST": 100,
+        }
+        stats.reset()
+        self.chatRoom = chatRoom
+        self.user = enrolled_student_user
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chat/{self.chatRoom.chat_name}/"
+        )
+        communicator.scope["user"] = self.user
+        communicator.scope["url_route"] = {
+            "kwargs": {"room_name": self.chatRoom.chat_name}
+        }
+        connected, _ = await communicator.connect()
+        assert connected
+        return communicator
+
+    async def send_message(self, communicator, content):
+        await communicator.send_json_to(
+            {"message": {"chat_room": self.chatRoom.id, "content": content}}
+        )
+
+    async def test_over_limit_message_is_rejected(self):
+        communicator = await self.connect()
+
+        for content in ("first", "second", "third"):
+            await self.send_message(communicator, content)
+
+        # the error frame is sent directly and may overtake the broadcasts
+        frames = [await communicator.receive_json_from() for _ in range(3)]
+        errors = [frame for frame in frames if frame["type"] == "chat.error"]
+        broadcasts = [frame for frame in frames if frame["type"] == "chat.message"]
+
+        assert [frame["message"]["content"] for frame in broadcasts] == [
+            "first",
+            "second",
+        ]
+        assert len(errors) == 1
+        error = errors[0]
+        assert error["type"] == "chat.error"
+        assert error["action"] == "rate_limited"
+        assert error["scope"] == "connection"
+        assert error["retry_after"] > 0
+        assert get_rate_limit_stats() == {
+            "allowed": 2,
+            "coalesced": 0,
+            "rejected_connection": 1,
+            "rejected_room": 0,
+        }
+
+        await communicator.disconnect()
+
+    async def test_room_limit_is_shared_by_connections(self, settings):
+        settings.CHAT_RATE_LIMIT = {
+            "CONNECTION_BURST": 10,
+            "ROOM_RATE": 0.01,
+            "ROOM_BURST": 1,
+        }
+        first = await self.connect()
+        second = await self.connect()
+
+        await self.send_message(first, "hello")
+        await first.receive_json_from()
+        await second.receive_json_from()
+
+        await self.send_message(second, "hello again")
+        error = await second.receive_json_from()
+
+        assert error["type"] == "chat.error"
+        assert error["scope"] == "room"
+        assert await first.receive_nothing()
+
+        await first.disconnect()
+        await second.disconnect()
+
+    async def test_room_bucket_is_evicted_after_disconnect(self):
+        first = await self.connect()
+        second = await self.connect()
+        room_group_name = f"chat_{self.chatRoom.chat_name}"
+
+        await first.disconnect()
+        assert room_group_name in ratelimit._room_buckets
+
+        await second.disconnect()
+        assert room_group_name not in ratelimit._room_buckets
+
+    async def test_over_limit_requests_are_coalesced(self, settings):
+        settings.CHAT_RATE_LIMIT = {"CONNECTION_RATE": 20, "CONNECTION_BURST": 1}
+        communicator = await self.connect()
+
+        for _ in range(3):
+            await communicator.send_json_to(
+                {"action": "get_user_data", "chat_room_id": self.chatRoom.id}
+            )
+
+        frames = []
+        while not await communicator.receive_nothing(timeout=0.5):
+            frames.append(await communicator.receive_json_from())
+
+        # the first request and one coalesced replay, each answered with two frames
+        assert [frame["action"] for frame in frames].count("user_connected") == 2
+        assert get_rate_limit_stats()["coalesced"] == 2
+
+        await communicator.disconnect()
@@ -0,0 +1,127 @@
+from datetime import timedelta
+
+import pytest
+from channels.testing import WebsocketCommunicator
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from chat.consumers import ChatConsumer
+from chat.models import ChatMembership
+from chat.roster import get_room_roster
+from chat.tests.fixtures import chatRoom, in_memory_channel_layer
+from courses.models import Enrolment
+from courses.tests.fixtures import (
+    enrol,
+    enrolled_student_user,
+    not_enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+
+
+@pytest.mark.django_db
+class TestRoomRoster:
+    @pytest.fixture(autouse=True)
+    def setup(
+        self,
+        enrol,
+        enrolled_student_user,
+        not_enrolled_student_user,
+        teacher_user,
+        chatRoom,
+    ):
+        self.chatRoom = chatRoom
+        self.student = enrolled_student_user
+        self.not_enrolled_student = not_enrolled_student_user
+        self.teacher = teacher_user
+
+    def test_roster_is_loaded_with_one_query_then_cached(
+        self, django_assert_num_queries
+    ):
+        with django_assert_num_queries(1):
+            roster = get_room_roster(self.chatRoom.id)
+
+        assert {member["username"] for member in roster} == {
+            self.student.username,
+            self.teacher.username,
+        }
+
+        with django_assert_num_queries(0):
+            assert get_room_roster(self.chatRoom.id) == roster
+
+    def test_last_active_and_online_state(self):
+        last_active = timezone.now() - timedelta(hours=1)
+        ChatMembership.objects.create(
+            user=self.student,
+            chat_room=self.chatRoom,
+            last_active_timestamp=last_active,
+        )
+
+        roster = {
+            member["username"]: member
+            for member in get_room_roster(
+                self.chatRoom.id, online_usernames=[self.teacher.username]
+            )
+        }
+
+        assert roster[self.student.username]["last_active_timestamp"] == last_active
+        assert roster[self.teacher.username]["last_active_timestamp"] is None
+        assert roster[self.teacher.username]["is_online"]
+        assert not roster[self.student.username]["is_online"]
+
+    def test_enrolment_invalidates_roster(self):
+        get_room_roster(self.chatRoom.id)
+
+        Enrolment.objects.create(
+            student=self.not_enrolled_student, course=self.chatRoom.course
+        )
+
+        assert self.not_enrolled_student.username in [
+            member["username"] for member in get_room_roster(self.chatRoom.id)
+        ]
+
+    def test_room_view_renders_roster(self):
+        client = APIClient()
+        client.force_login(self.student)
+
+        response = client.get(
+            reverse("room", kwargs={"room_name": self.chatRoom.chat_name})
+        )
+
+        assert response.status_code == 200
+        assert response.context["users"] == get_room_roster(self.chatRoom.id)
+        assert f'data-username="{self.teacher.username}"' in response.content.decode(
+            "utf-8"
+        )
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_user_connected_payload_has_roster_entries(
+    enrol, enrolled_student_user, chatRoom, in_memory_channel_layer
+):
+    communicator = WebsocketCommunicator(
+        ChatConsumer.as_asgi(), f"/ws/chat/{chatRoom.chat_name}/"
+    )
+    communicator.scope["user"] = enrolled_student_user
+    communicator.scope["url_route"] = {"kwargs": {"room_name": chatRoom.chat_name}}
+    connected, _ = await communicator.connect()
+    assert connected
+
+    await communicator.send_json_to(
+        {"action": "get_user_data", "chat_room_id": chatRoom.id}
+    )
+
+    frames = [await communicator.receive_json_from() for _ in range(2)]
+    user_connected = next(
+        frame for frame in frames if frame["action"] == "user_connected"
+    )
+
+    assert user_connected["users"] == [enrolled_student_user.username]
+    assert [member["username"] for member in user_connected["members"]] == [
+        enrolled_student_user.username
+    ]
+    assert user_connected["members"][0]["is_online"]
+
+    await communicator.disconnect()
@@ -0,0 +1,131 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+from django.test import AsyncClient
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from chat.models import Message
+from chat.tests.fixtures import chatRoom
+from courses.tests.fixtures import (
+    enrol,
+    enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+from users.tests.factories import UserFactory
+from users.models import User
+
+
+@pytest.mark.django_db
+class TestRoomTranscript:
+    @pytest.fixture(autouse=True)
+    def setup(self, enrol, enrolled_student_user, teacher_user, chatRoom, settings):
+        settings.CHAT_TRANSCRIPT_CHUNK_SIZE = 2
+        self.client = APIClient()
+        self.chatRoom = chatRoom
+        self.student = enrolled_student_user
+        self.teacher = teacher_user
+        self.url = reverse("room_transcript", kwargs={"room_name": chatRoom.chat_name})
+
+        self.days = [
+            timezone.make_aware(datetime(2024, 3, day, 12)) for day in (1, 2, 3)
+        ]
+        for i, timestamp in enumerate(self.days):
+            Message.objects.create(
+                chat_room=chatRoom,
+                user=enrolled_student_user,
+                content=f"<b>message {i}</b>",
+                timestamp=timestamp,
+            )
+
+    def get(self, **params):
+        self.client.force_login(self.teacher)
+        return self.client.get(self.url, params)
+
+    def test_jsonl_transcript_is_streamed(self):
+        response = self.get()
+
+        assert response.status_code == 200
+        assert response.streaming
+        assert response["Content-Type"] == "application/x-ndjson"
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).decode().splitlines()
+        ]
+        assert [row["content"] for row in rows] == [
+            "<b>message 0</b>",
+            "<b>message 1</b>",
+            "<b>message 2</b>",
+        ]
+        assert rows[0]["username"] == self.student.username
+
+    def test_csv_transcript_with_date_range(self):
+        response = self.get(format="csv", start="2024-03-02", end="2024-03-03")
+
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        assert [row["content"] for row in rows] == [
+            "<b>message 1</b>",
+            "<b>message 2</b>",
+        ]
+        assert rows[0]["timestamp"] == self.days[1].isoformat()
+
+    def test_html_transcript_is_escaped(self):
+        response = self.get(format="html", end="2024-03-01")
+
+        content = b"".join(response.streaming_content).decode()
+        assert "&lt;b&gt;message 0&lt;/b&gt;" in content
+        assert "message 1" not in content
+        assert "<b>" not in content
+
+    def test_invalid_parameters(self):
+        assert self.get(format="pdf").status_code == 400
+        assert self.get(start="yesterday").status_code == 400
+
+    def test_datetime_bounds(self):
+        response = self.get(start="2024-03-01T13:00:00", end="2024-03-03T12:00:00")
+
+        rows = b"".join(response.streaming_content).decode().splitlines()
+        assert [json.loads(row)["content"] for row in rows] == ["<b>message 1</b>"]
+
+    def test_only_course_teacher_can_export(self):
+        other_teacher = UserFactory(user_type=User.TEACHER)
+        self.client.force_login(other_teacher)
+        assert self.client.get(self.url).status_code == 403
+
+        self.client.force_login(self.student)
+        assert self.client.get(self.url).status_code == 403
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+class TestRoomTranscriptASGI:
+    @pytest.fixture(autouse=True)
+    def setup(self, enrol, enrolled_student_user, teacher_user, chatRoom, settings):
+        settings.CHAT_TRANSCRIPT_CHUNK_SIZE = 1
+        self.teacher = teacher_user
+        self.url = reverse("room_transcript", kwargs={"room_name": chatRoom.chat_name})
+        for i in range(3):
+            Message.objects.create(
+                chat_room=chatRoom, user=enrolled_student_user, content=f"message {i}"
+            )
+
+    async def test_transcript_is_streamed_one_batch_at_a_time(self):
+        client = AsyncClient()
+        await client.aforce_login(self.teacher)
+        response = await client.get(self.url)
+
+        assert response.status_code == 200
+        # Django would buffer a synchronous iterator before sending it
+        assert response.is_async
+        batches = [batch async for batch in response.streaming_content]
+        assert [json.loads(batch)["content"] for batch in batches] == [
+            "message 0",
+            "message 1",
+            "message 2",
+        ]
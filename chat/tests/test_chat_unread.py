@@ -0,0 +1,127 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from chat.consumers import ChatConsumer
+from chat.models import ChatMembership, Message
+from chat.serializers import MessageSerializer
+from chat.tests.fixtures import chatRoom
+from chat.unread import (
+    count_new_messages,
+    increment_unread_counts,
+    unread_count_expression,
+)
+from courses.tests.fixtures import (
+    enrol,
+    enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+
+
+@pytest.mark.django_db
+class TestUnreadCounts:
+    @pytest.fixture(autouse=True)
+    def setup(self, enrol, enrolled_student_user, teacher_user, chatRoom):
+        self.chatRoom = chatRoom
+        self.student = enrolled_student_user
+        self.teacher = teacher_user
+        self.student_membership = ChatMembership.objects.create(
+            user=self.student, chat_room=chatRoom
+        )
+        self.teacher_membership = ChatMembership.objects.create(
+            user=self.teacher, chat_room=chatRoom
+        )
+
+    def unread_count(self, membership):
+        membership.refresh_from_db()
+        return membership.unread_count
+
+    def send(self, user, content="hello"):
+        serializer = MessageSerializer(
+            data={"chat_room": self.chatRoom.id, "user": user.id, "content": content}
+        )
+        assert serializer.is_valid()
+        return serializer.save()
+
+    def test_saved_message_is_unread_for_other_members(self):
+        self.send(self.student)
+        self.send(self.student)
+
+        assert self.unread_count(self.teacher_membership) == 2
+        assert self.unread_count(self.student_membership) == 0
+
+    def test_bulk_increment_with_several_senders(self, django_assert_num_queries):
+        messages = [
+            Message(chat_room=self.chatRoom, user=user, content="hello")
+            for user in (self.student, self.student, self.teacher)
+        ]
+
+        with django_assert_num_queries(1):
+            increment_unread_counts(count_new_messages(messages))
+
+        assert self.unread_count(self.teacher_membership) == 2
+        assert self.unread_count(self.student_membership) == 1
+
+    def test_reset_keeps_messages_after_last_viewed(self):
+        viewed = self.send(self.student)
+        self.send(self.student)
+        self.send(self.teacher)
+
+        ChatMembership.objects.filter(pk=self.teacher_membership.pk).update(
+            last_viewed_message_id=viewed.id,
+            unread_count=unread_count_expression(
+                self.teacher.id, self.chatRoom.id, viewed.id
+            ),
+        )
+
+        assert self.unread_count(self.teacher_membership) == 1
+
+    def test_unread_counts_endpoint(self):
+        self.send(self.student)
+        client = APIClient()
+        client.force_login(self.teacher)
+
+        response = client.get(reverse("unread_counts"))
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "unread_counts": [
+                {
+                    "chat_room_id": self.chatRoom.id,
+                    "room_name": self.chatRoom.chat_name,
+                    "unread_count": 1,
+                }
+            ]
+        }
+
+    def test_index_shows_unread_badge(self):
+        self.send(self.student)
+        client = APIClient()
+        client.force_login(self.teacher)
+
+        response = client.get(reverse("chat"))
+
+        assert [room.unread_count for room in response.context["chat_rooms"]] == [1]
+        content = response.content.decode("utf-8")
+        assert 'class="badge bg-primary rounded-pill">1</span>' in content
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_consumer_resets_unread_count(enrol, teacher_user, chatRoom):
+    membership = await ChatMembership.objects.acreate(
+        user=teacher_user, chat_room=chatRoom, unread_count=3
+    )
+    viewed = await Message.objects.acreate(
+        chat_room=chatRoom, user=enrol.student, content="viewed"
+    )
+    await Message.objects.acreate(chat_room=chatRoom, user=enrol.student, content="new")
+
+    consumer = ChatConsumer()
+    consumer.scope = {"user": teacher_user}
+    assert await consumer.update_last_viewed_message_id(chatRoom.id, viewed.id)
+
+    await membership.arefresh_from_db()
+    assert membership.last_viewed_message_id == viewed.id
+    assert membership.unread_count == 1
@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+
+from chat.consumers import ChatConsumer
+from chat.models import Message
+from chat.tests.fixtures import chatRoom, in_memory_channel_layer
+from chat.writebehind import MessageWriteBuffer, get_message_buffer, is_provisional_id
+from courses.tests.fixtures import (
+    enrol,
+    enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+
+
+def build_messages(chat_room, user, count):
+    return [
+        Message(chat_room=chat_room, user=user, content=f"message {i}")
+        for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+class TestMessageWriteBuffer:
+    @pytest.fixture(autouse=True)
+    def setup(self, chatRoom, enrolled_student_user, in_memory_channel_layer):
+        self.chatRoom = chatRoom
+        self.user = enrolled_student_user
+
+    async def test_flush_persists_batch(self):
+        buffer = MessageWriteBuffer(batch_size=10, flush_interval=60)
+        provisional_ids = [
+            buffer.enqueue(message, "chat_test")
+            for message in build_messages(self.chatRoom, self.user, 3)
+        ]
+
+        assert all(is_provisional_id(message_id) for message_id in provisional_ids)
+        assert buffer.resolve(provisional_ids[0]) is None
+
+        await buffer.flush()
+
+        assert buffer.pending_count == 0
+        persisted_ids = [buffer.resolve(message_id) for message_id in provisional_ids]
+        assert await Message.objects.filter(id__in=persisted_ids).acount() == 3
+
+    async def test_batch_size_triggers_flush(self):
+        buffer = MessageWriteBuffer(batch_size=2, flush_interval=60)
+        provisional_ids = [
+            buffer.enqueue(message, "chat_test")
+            for message in build_messages(self.chatRoom, self.user, 2)
+        ]
+
+        # give the flusher a chance to pick up the full batch
+        for _ in range(50):
+            if buffer.resolve(provisional_ids[-1]) is not None:
+                break
+            await asyncio.sleep(0.05)
+
+        assert buffer.resolve(provisional_ids[-1]) is not None
+
+    async def test_invalid_message_fails_on_its_own(self):
+        buffer = MessageWriteBuffer(batch_size=10, flush_interval=60, max_retries=2)
+        messages = build_messages(self.chatRoom, self.user, 3)
+        # e.g. a message of a room deleted since it was sent
+        messages[1].chat_room_id = self.chatRoom.id + 1000
+        provisional_ids = [buffer.enqueue(message, "chat_test") for message in messages]
+
+        await buffer.flush()
+
+        assert buffer.resolve(provisional_ids[0]) is not None
+        assert buffer.resolve(provisional_ids[1]) is None
+        assert buffer.resolve(provisional_ids[2]) is not None
+        assert buffer.pending_count == 1
+
+        # Only the invalid message is retried, then dropped
+        await buffer.flush()
+
+        assert buffer.pending_count == 0
+        assert await Message.objects.filter(chat_room=self.chatRoom).acount() == 2
+
+    async def test_flush_sync_on_shutdown(self):
+        buffer = MessageWriteBuffer(batch_size=10, flush_interval=60)
+        for message in build_messages(self.chatRoom, self.user, 4):
+            buffer.enqueue(message, "chat_test")
+
+        await database_sync_to_async(buffer.flush_sync)()
+
+        assert buffer.pending_count == 0
+        assert await Message.objects.filter(chat_room=self.chatRoom).acount() == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+class TestChatConsumerWriteBehind:
+    @pytest.fixture(autouse=True)
+    def setup(
+        self, enrol, enrolled_student_user, chatRoom, in_memory_channel_layer, settings
+    ):
+        settings.CHAT_WRITE_BEHIND = {"ENABLED": True, "FLUSH_INTERVAL": 0.05}
+        self.chatRoom = chatRoom
+        self.user = enrolled_student_user
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chat/{self.chatRoom.chat_name}/"
+        )
+        communicator.scope["user"] = self.user
+        communicator.scope["url_route"] = {
+            "kwargs": {"room_name": self.chatRoom.chat_name}
+        }
+        connected, _ = await communicator.connect()
+        assert connected
+        return communicator
+
+    async def test_message_broadcast_before_persisted(self):
+        communicator = await self.connect()
+
+        await communicator.send_json_to(
+            {"message": {"chat_room": self.chatRoom.id, "content": "hello"}}
+        )
+
+        broadcast = await communicator.receive_json_from()
+        assert broadcast["action"] == "send_message"
+        provisional_id = broadcast["message"]["id"]
+        assert is_provisional_id(provisional_id)
+
+        persisted = await communicator.receive_json_from(timeout=2)
+        assert persisted["action"] == "message_persisted"
+        message_id = persisted["message"]["ids"][provisional_id]
+
+        message = await Message.objects.aget(id=message_id)
+        assert message.content == "hello"
+        assert message.timestamp.isoformat() == broadcast["message"]["timestamp"]
+
+        await communicator.disconnect()
+
+    async def test_message_for_other_room_is_rejected(self):
+        communicator = await self.connect()
+
+        await communicator.send_json_to(
+            {"message": {"chat_room": self.chatRoom.id + 1, "content": "hello"}}
+        )
+
+        assert await communicator.receive_nothing()
+        assert get_message_buffer().pending_count == 0
+
+        await communicator.disconnect()
@@ -0,0 +1,223 @@
+import csv
+import itertools
+import json
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.html import escape
+
+from chat.archive import iter_archived_messages
+from chat.models import Message
+
+DEFAULT_TRANSCRIPT_CHUNK_SIZE = 2000
+
+TRANSCRIPT_FIELDS = ["id", "timestamp", "username", "full_name", "content", "file"]
+
+TRANSCRIPT_CONTENT_TYPES = {
+    "jsonl": "application/x-ndjson",
+    "csv": "text/csv",
+    "html": "text/html",
+}
+
+
+def get_transcript_chunk_size():
+    return getattr(
+        settings, "CHAT_TRANSCRIPT_CHUNK_SIZE", DEFAULT_TRANSCRIPT_CHUNK_SIZE
+    )
+
+
+def parse_transcript_bound(value, end=False):
+    """
+    Parses a date or datetime bound of the transcript date range.
+
+    A date covers the whole day, so an end date includes the messages of that day.
+
+    :param value: An ISO 8601 date or datetime, or an empty value.
+    :type value: str or None
+    :param end: Whether the value is the end of the range.
+    :type end: bool
+
+    :return: The aware datetime of the bound, or None if no value is given.
+    :rtype: datetime or None
+
+    :raises ValueError: If the value is not a valid date or datetime.
+    """
+    if not value:
+        return None
+
+    day = parse_date(value)
+    if day is not None:
+        if end:
+            day += timedelta(days=1)
+        bound = datetime.combine(day, time.min)
+    else:
+        bound = parse_datetime(value)
+        if bound is None:
+            raise ValueError(f"Invalid date: {value}")
+
+    if timezone.is_naive(bound):
+        bound = timezone.make_aware(bound)
+    return bound
+
+
+def get_transcript_messages(chat_room, start=None, end=None):
+    """
+    Iterates over the messages of a chat room in chronological order.
+
+    Archived messages come first, read one segment at a time. The messages in the
+    database follow, fetched in chunks of ``CHAT_TRANSCRIPT_CHUNK_SIZE`` rows along
+    the history index with their sender joined, so memory stays flat whatever the
+    size of the room.
+
+    :param chat_room: The chat room to export.
+    :type chat_room: ChatRoom
+    :param start: Only include messages sent at or after this time.
+    :type start: datetime or None
+    :param end: Only include messages sent before this time.
+    :type end: datetime or None
+
+    :return: An iterator over the messages.
+    :rtype: iterator of Message
+    """
+    messages = Message.objects.filter(chat_room=chat_room)
+    if start:
+        messages = messages.filter(timestamp__gte=start)
+    if end:
+        messages = messages.filter(timestamp__lt=end)
+
+    return itertools.chain(
+        iter_archived_messages(chat_room, start=start, end=end),
+        messages.select_related("user")
+        .order_by("timestamp", "id")
+        .iterator(chunk_size=get_transcript_chunk_size()),
+    )
+
+
+def transcript_row(message):
+    """
+    Returns the exported fields of a message.
+
+    :param message: The message, with its user loaded.
+    :type message: Message
+
+    :return: The values of :data:`TRANSCRIPT_FIELDS`.
+    :rtype: dict
+    """
+    return {
+        "id": message.id,
+        "timestamp": timezone.localtime(message.timestamp).isoformat(),
+        "username": message.user.username,
+        "full_name": message.user.get_full_name(),
+        "content": message.content or "",
+        "file": message.file.name if message.file else "",
+    }
+
+
+class Echo:
+    """
+    File-like object returning what is written to it, so csv.writer rows can be
+    streamed instead of buffered.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_jsonl(chat_room, messages):
+    for message in messages:
+        yield json.dumps(transcript_row(message)) + "\n"
+
+
+def stream_csv(chat_room, messages):
+    writer = csv.DictWriter(Echo(), fieldnames=TRANSCRIPT_FIELDS)
+    yield writer.writeheader()
+    for message in messages:
+        yield writer.writerow(transcript_row(message))
+
+
+def stream_html(chat_room, messages):
+    title = escape(f"Transcript of {chat_room.chat_name}")
+    yield (
+        f"<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<title>{title}</title>\n</head>\n<body>\n<h1>{title}</h1>\n"
+        "<table>\n<thead><tr>"
+        + "".join(f"<th>{field}</th>" for field in TRANSCRIPT_FIELDS)
+        + "</tr></thead>\n<tbody>\n"
+    )
+    for message in messages:
+        row = transcript_row(message)
+        yield (
+            "<tr>"
+            + "".join(f"<td>{escape(row[field])}</td>" for field in TRANSCRIPT_FIELDS)
+            + "</tr>\n"
+        )
+    yield "</tbody>\n</table>\n</body>\n</html>\n"
+
+
+TRANSCRIPT_RENDERERS = {
+    "jsonl": stream_jsonl,
+    "csv": stream_csv,
+    "html": stream_html,
+}
+
+
+def stream_transcript(chat_room, transcript_format, start=None, end=None):
+    """
+    Streams the transcript of a chat room, one message at a time.
+
+    :param chat_room: The chat room to export.
+    :type chat_room: ChatRoom
+    :param transcript_format: One of ``jsonl``, ``csv`` or ``html``.
+    :type transcript_format: str
+    :param start: Only include messages sent at or after this time.
+    :type start: datetime or None
+    :param end: Only include messages sent before this time.
+    :type end: datetime or None
+
+    :return: A generator of transcript chunks.
+    :rtype: generator of str
+
+    :raises ValueError: If the format is not supported.
+    """
+    if transcript_format not in TRANSCRIPT_RENDERERS:
+        raise ValueError(f"Unsupported transcript format: {transcript_format}")
+
+    messages = get_transcript_messages(chat_room, start=start, end=end)
+    return TRANSCRIPT_RENDERERS[transcript_format](chat_room, messages)
+
+
+async def astream_transcript(chat_room, transcript_format, start=None, end=None):
+    """
+    Streams the transcript of a chat room from an ASGI server, see
+    :func:`stream_transcript`.
+
+    Django buffers the whole of a synchronous iterator before an ASGI response is
+    sent, so the transcript is read in a thread, ``CHAT_TRANSCRIPT_CHUNK_SIZE``
+    chunks at a time, and each batch is sent before the next one is read.
+
+    :param chat_room: The chat room to export.
+    :type chat_room: ChatRoom
+    :param transcript_format: One of ``jsonl``, ``csv`` or ``html``.
+    :type transcript_format: str
+    :param start: Only include messages sent at or after this time.
+    :type start: datetime or None
+    :param end: Only include messages sent before this time.
+    :type end: datetime or None
+
+    :return: An asynchronous generator of transcript batches.
+    :rtype: async generator of str
+
+    :raises ValueError: If the format is not supported.
+    """
+    chunks = stream_transcript(chat_room, transcript_format, start=start, end=end)
+    batch_size = get_transcript_chunk_size()
+    next_batch = sync_to_async(lambda: list(itertools.islice(chunks, batch_size)))
+    try:
+        while batch := await next_batch():
+            yield "".join(batch)
+    finally:
+        # the database cursor belongs to the thread that read the messages
+        await sync_to_async(chunks.close)()
@@ -0,0 +1,99 @@
+from collections import Counter, defaultdict
+
+from django.db.models import Case, Count, F, IntegerField, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from chat.models import ChatMembership, Message
+
+
+def count_new_messages(messages):
+    """
+    Counts persisted messages per chat room and sender.
+
+    :param messages: The persisted messages.
+    :type messages: iterable of Message
+
+    :return: A mapping of chat room ID to a Counter of messages per sender ID.
+    :rtype: dict[int, Counter]
+    """
+    counts = defaultdict(Counter)
+    for message in messages:
+        counts[message.chat_room_id][message.user_id] += 1
+    return counts
+
+
+def increment_unread_counts(counts):
+    """
+    Adds newly persisted messages to the unread counters of the chat room members.
+
+    Each member's counter grows by the messages sent by other users. The counters are
+    updated in the database with one ``UPDATE`` per chat room, so concurrent writers
+    never lose increments. Call it in the transaction persisting the messages.
+
+    :param counts: A mapping of chat room ID to a Counter of new messages per sender
+        ID, see :func:`count_new_messages`.
+    :type counts: dict[int, Counter]
+    """
+    for chat_room_id, senders in counts.items():
+        total = sum(senders.values())
+        ChatMembership.objects.filter(chat_room_id=chat_room_id).update(
+            unread_count=F("unread_count")
+            + Case(
+                *[
+                    When(user_id=user_id, then=Value(total - sent))
+                    for user_id, sent in senders.items()
+                ],
+                default=Value(total),
+                output_field=IntegerField(),
+            )
+        )
+
+
+def unread_count_expression(user_id, chat_room_id, last_viewed_message_id):
+    """
+    Builds an expression counting the messages of other users persisted after the
+    last viewed message.
+
+    Used to reset a counter in the same ``UPDATE`` that moves the last viewed message,
+    so messages persisted while the user is leaving the room stay unread. The count
+    only reads the tail of the room history after ``last_viewed_message_id``.
+
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :param chat_room_id: The ID of the chat room.
+    :type chat_room_id: int
+    :param last_viewed_message_id: The ID of the last message viewed by the user.
+    :type last_viewed_message_id: int or None
+
+    :return: The unread count expression.
+    :rtype: Coalesce
+    """
+    unread_messages = (
+        Message.objects.filter(
+            chat_room_id=chat_room_id, id__gt=last_viewed_message_id or 0
+        )
+        .exclude(user_id=user_id)
+        .order_by()
+        .values("chat_room_id")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    return Coalesce(Subquery(unread_messages), Value(0))
+
+
+def get_unread_counts(user):
+    """
+    Retrieves the unread counters of every chat room the user is a member of.
+
+    :param user: The user.
+    :type user: User
+
+    :return: A list of dicts with the ``chat_room_id``, ``room_name`` and
+        ``unread_count`` of each membership, read with a single query.
+    :rtype: list[dict]
+    """
+    return list(
+        ChatMembership.objects.filter(user=user)
+        .order_by("chat_room_id")
+        .values("chat_room_id", "unread_count", room_name=F("chat_room__chat_name"))
+    )
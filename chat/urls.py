@@ -4,5 +4,10 @@ from chat import views
 
 urlpatterns = [
     path("", views.index, name="chat"),
+    path("api/unread-counts/", views.unread_counts, name="unread_counts"),
     path("<str:room_name>/", views.room, name="room"),
+    path("<str:room_name>/history/", views.room_history, name="room_history"),
+    path(
+        "<str:room_name>/transcript/", views.room_transcript, name="room_transcript"
+    ),
 ]
@@ -1,11 +1,26 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render, get_object_or_404
+from django.views.decorators.http import require_http_methods
+from chat.history import (
+    get_message_page,
+    group_messages_by_date,
+    serialize_message,
+)
 from chat.models import ChatMembership, ChatRoom
-from courses.models import Enrolment, User
+from chat.roster import get_room_roster
+from chat.transcripts import (
+    TRANSCRIPT_CONTENT_TYPES,
+    astream_transcript,
+    parse_transcript_bound,
+    stream_transcript,
+)
+from chat.unread import get_unread_counts
+from courses.models import Enrolment
 from elearning_auth.decorators import custom_login_required
+from users.decorators import teacher_required
 from django.contrib import messages
-from django.db.models import OuterRef, F, Subquery, Value
-from django.db.models.functions import Coalesce
-from django.utils import timezone
+from django.db.models import OuterRef, Subquery
 import logging
 
 logger = logging.getLogger(__name__)
@@ -29,6 +44,24 @@ def get_chat_rooms_for_user(user):
     return enrolled_chat_rooms | teaching_chat_rooms
 
 
+def user_can_access_room(user, chat_room):
+    """
+    Check if the user is enrolled in, or teaching, the course of the chat room.
+
+    :param user: The user requesting access.
+    :type user: User
+    :param chat_room: The chat room being accessed.
+    :type chat_room: ChatRoom
+
+    :return: True if the user may access the chat room, False otherwise.
+    :rtype: bool
+    """
+    return (
+        chat_room.course.teacher_id == user.id
+        or Enrolment.is_student_enrolled(user, chat_room.course)
+    )
+
+
 @custom_login_required
 def index(request):
     """
@@ -37,8 +70,15 @@ def index(request):
     # Get the currently logged-in user
     user = request.user
 
-    # Fetch the chat rooms associated with the enrolled courses
-    chat_rooms = get_chat_rooms_for_user(user)
+    # Fetch the chat rooms associated with the enrolled courses, with the unread
+    # counter of the user in each room
+    chat_rooms = get_chat_rooms_for_user(user).annotate(
+        unread_count=Subquery(
+            ChatMembership.objects.filter(
+                user=user, chat_room_id=OuterRef("pk")
+            ).values("unread_count")[:1]
+        )
+    )
 
     # Pass the chat rooms to the template
     context = {"chat_rooms": chat_rooms}
@@ -64,63 +104,15 @@ def room(request, room_name):
     chat_room = get_object_or_404(ChatRoom, chat_name=room_name)
     course = chat_room.course
     # Check if the user is authorized to access the chat room
-    is_enrolled_or_teacher = (
-        Enrolment.is_student_enrolled(request.user, chat_room.course)
-        or chat_room.course.teacher == request.user
-    )
-
-    if is_enrolled_or_teacher:
-        # Get users in the course (both students and teacher)
-        # Filter users
-        # Get users enrolled in the course or the course teacher
-        users = User.objects.filter(
-            enrolment__course=chat_room.course
-        ) | User.objects.filter(pk=chat_room.course.teacher_id)
-
-        # Filter ChatMembership queryset based on chat_room_id
-        chat_membership_queryset = ChatMembership.objects.filter(
-            chat_room_id=chat_room.id
-        )
-
-        # Subquery to get the last_active_timestamp for each user
-        last_active_subquery = chat_membership_queryset.filter(
-            user_id=OuterRef("pk")
-        ).values("last_active_timestamp")[
-            :1
-        ]  # Limit to 1 since each user has only one timestamp per chat room
-
-        # Annotate each user with the last_active_timestamp from ChatMembership
-        users_with_last_active = users.annotate(
-            last_active_timestamp=Coalesce(
-                Subquery(last_active_subquery), F("last_login"), Value(None)
-            )
-        )
-
-        # Initialize a dictionary to store message blocks
-
-        message_blocks = {}
-
-        for message in chat_room.messages.all():
-            # Localize the timestamp to the current timezone
-            localized_timestamp = timezone.localtime(message.timestamp)
-
-            # Extract the date component without the time
-            message_date = localized_timestamp.date()
-
-            # Check if a message block already exists for the current date
-            if message_date in message_blocks:
-                message_blocks[message_date]["messages"].append(message)
-            else:
-                # Create a new message block for the current date
-                message_blocks[message_date] = {
-                    "date": message_date,
-                    "messages": [message],
-                }
+    if user_can_access_room(request.user, chat_room):
+        # Members of the room with their last activity, from the cached roster
+        members = get_room_roster(chat_room.id)
 
-        # Convert the dictionary to a list of message blocks
-        message_blocks = list(message_blocks.values())
+        # Only the newest page of the history is rendered, older pages are
+        # loaded on demand through the room_history endpoint
+        latest_messages, history_cursor = get_message_page(chat_room)
+        message_blocks = group_messages_by_date(latest_messages)
 
-        logger.info("message_blocks: %s", message_blocks)
         return render(
             request,
             "chat/private/chat_room.html",
@@ -129,11 +121,142 @@ def room(request, room_name):
                 "room_name": room_name,
                 "course": course,
                 "current_user": request.user.username,
-                "users": users_with_last_active,
+                "users": members,
                 "message_blocks": message_blocks,
+                "history_cursor": history_cursor,
             },
         )
     else:
         # Redirect the user to the index page with an error message
         messages.error(request, "You are not authorized to enter the chatroom.")
         return redirect("/")
+
+
+@custom_login_required
+@require_http_methods(["GET"])
+def room_history(request, room_name):
+    """
+    Return the page of chat messages older than the ``before`` cursor.
+
+    The page is rendered as an HTML fragment for HTMX, ending with a loader that
+    fetches the next older page when revealed. Pass ``format=json`` to receive the
+    messages and the next cursor as JSON instead.
+
+    :param request: HttpRequest object.
+    :type request: HttpRequest
+    :param room_name: The name of the chat room.
+    :type room_name: str
+
+    :return: The rendered history fragment, or a JSON response.
+    :rtype: HttpResponse or JsonResponse
+    """
+    chat_room = get_object_or_404(
+        ChatRoom.objects.select_related("course"), chat_name=room_name
+    )
+
+    if not user_can_access_room(request.user, chat_room):
+        return JsonResponse(
+            {"error": "You are not authorized to enter the chatroom."}, status=403
+        )
+
+    try:
+        older_messages, history_cursor = get_message_page(
+            chat_room, before=request.GET.get("before")
+        )
+    except ValueError as e:
+        logger.error("Invalid chat history cursor: %s", e)
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+    if request.GET.get("format") == "json":
+        return JsonResponse(
+            {
+                "messages": [serialize_message(message) for message in older_messages],
+                "next_cursor": history_cursor,
+            }
+        )
+
+    return render(
+        request,
+        "chat/partials/message_history.html",
+        {
+            "room_name": room_name,
+            "current_user": request.user.username,
+            "message_blocks": group_messages_by_date(older_messages),
+            "history_cursor": history_cursor,
+        },
+    )
+
+
+@custom_login_required
+@require_http_methods(["GET"])
+def unread_counts(request):
+    """
+    Return the unread message counters of the user in every chat room they joined.
+
+    The counters are maintained as messages are persisted, so this reads them with a
+    single query instead of counting the messages of each room.
+
+    :param request: HttpRequest object.
+    :type request: HttpRequest
+
+    :return: A JSON response with the ``unread_counts`` of each chat room.
+    :rtype: JsonResponse
+    """
+    return JsonResponse({"unread_counts": get_unread_counts(request.user)})
+
+
+@custom_login_required
+@teacher_required
+@require_http_methods(["GET"])
+def room_transcript(request, room_name):
+    """
+    Stream the transcript of a chat room to the teacher of its course.
+
+    The ``format`` query parameter selects ``jsonl`` (default), ``csv`` or ``html``,
+    and the optional ``start`` and ``end`` parameters (ISO 8601 dates or datetimes)
+    restrict the date range. Messages are streamed as they are read from the
+    database, so exporting a large room does not load it in memory.
+
+    :param request: HttpRequest object.
+    :type request: HttpRequest
+    :param room_name: The name of the chat room.
+    :type room_name: str
+
+    :return: The streamed transcript, as an attachment.
+    :rtype: StreamingHttpResponse
+    """
+    chat_room = get_object_or_404(
+        ChatRoom.objects.select_related("course"), chat_name=room_name
+    )
+
+    if chat_room.course.teacher_id != request.user.id:
+        return JsonResponse(
+            {"error": "Only the teacher of the course can export the transcript."},
+            status=403,
+        )
+
+    transcript_format = request.GET.get("format", "jsonl")
+    if transcript_format not in TRANSCRIPT_CONTENT_TYPES:
+        return JsonResponse({"error": "Unsupported transcript format"}, status=400)
+
+    try:
+        start = parse_transcript_bound(request.GET.get("start"))
+        end = parse_transcript_bound(request.GET.get("end"), end=True)
+    except ValueError as e:
+        logger.error("Invalid transcript date range: %s", e)
+        return JsonResponse({"error": "Invalid date range"}, status=400)
+
+    # an ASGI server only streams asynchronous iterators, a WSGI one synchronous ones
+    if isinstance(request, ASGIRequest):
+        stream = astream_transcript
+    else:
+        stream = stream_transcript
+
+    response = StreamingHttpResponse(
+        stream(chat_room, transcript_format, start=start, end=end),
+        content_type=TRANSCRIPT_CONTENT_TYPES[transcript_format],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{chat_room.chat_name}-transcript.{transcript_format}"'
+    )
+    return response
@@ -0,0 +1,302 @@
+import asyncio
+import atexit
+import logging
+import uuid
+from collections import OrderedDict
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from chat.frames import build_frame_event
+from chat.models import Message
+from chat.unread import count_new_messages, increment_unread_counts
+
+logger = logging.getLogger(__name__)
+
+PROVISIONAL_ID_PREFIX = "tmp-"
+
+DEFAULT_WRITE_BEHIND = {
+    "ENABLED": False,
+    "BATCH_SIZE": 100,  # flush as soon as this many messages are pending
+    "FLUSH_INTERVAL": 0.5,  # seconds, flush at least this often
+    "MAX_RETRIES": 3,  # attempts before a failing message is dropped
+    "RESOLVED_IDS": 10000,  # provisional ids remembered after being persisted
+}
+
+
+def get_write_behind_config():
+    """
+    Returns the write-behind configuration merged over the defaults.
+
+    :return: The ``CHAT_WRITE_BEHIND`` setting merged over :data:`DEFAULT_WRITE_BEHIND`.
+    :rtype: dict
+    """
+    return {**DEFAULT_WRITE_BEHIND, **getattr(settings, "CHAT_WRITE_BEHIND", {})}
+
+
+def is_write_behind_enabled():
+    """
+    Checks if chat messages should be persisted through the write-behind buffer.
+
+    :return: True if write-behind persistence is enabled.
+    :rtype: bool
+    """
+    return bool(get_write_behind_config()["ENABLED"])
+
+
+def is_provisional_id(message_id):
+    """
+    Checks if a message ID was assigned by the buffer rather than the database.
+
+    :param message_id: The message ID to check.
+    :type message_id: int or str or None
+
+    :return: True if the ID is provisional.
+    :rtype: bool
+    """
+    return isinstance(message_id, str) and message_id.startswith(PROVISIONAL_ID_PREFIX)
+
+
+class MessageWriteBuffer:
+    """
+    Per-process buffer that persists chat messages in ``bulk_create`` batches.
+
+    Messages are validated by the consumer, handed to :meth:`enqueue` and broadcast
+    immediately under a provisional ID. An asyncio flusher writes the pending batch
+    when it reaches ``BATCH_SIZE`` messages or every ``FLUSH_INTERVAL`` seconds, then
+    notifies each room of the database IDs assigned to its provisional IDs. A batch
+    which fails is written row by row, so only the messages which fail on their own,
+    e.g. of a deleted room, are retried and eventually dropped.
+
+    Pending messages are also written when the process exits gracefully, see
+    :meth:`flush_sync`.
+    """
+
+    def __init__(self, batch_size, flush_interval, max_retries=3, resolved_ids=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.resolved_ids_limit = resolved_ids
+
+        self._pending = []  # list of (provisional_id, room_group_name, Message, attempts)
+        self._resolved = OrderedDict()  # provisional_id -> database id
+        self._loop = None
+        self._flusher = None
+        self._wakeup = None
+        self._flush_lock = None
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    def enqueue(self, message, room_group_name):
+        """
+        Adds an unsaved message to the buffer.
+
+        :param message: The validated, unsaved message.
+        :type message: Message
+        :param room_group_name: The group to notify once the message is persisted.
+        :type room_group_name: str
+
+        :return: The provisional ID of the message.
+        :rtype: str
+        """
+        provisional_id = f"{PROVISIONAL_ID_PREFIX}{uuid.uuid4().hex}"
+        self._pending.append((provisional_id, room_group_name, message, 0))
+
+        self._ensure_flusher()
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+        return provisional_id
+
+    def resolve(self, message_id):
+        """
+        Maps a provisional ID to its database ID.
+
+        :param message_id: A database or provisional message ID.
+        :type message_id: int or str
+
+        :return: The database ID, or None if the provisional ID is still pending or unknown.
+        :rtype: int or None
+        """
+        if not is_provisional_id(message_id):
+            return message_id
+        return self._resolved.get(message_id)
+
+    async def flush(self):
+        """
+        Writes every pending message to the database and notifies the rooms.
+        """
+        self._ensure_flusher()
+
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+
+            try:
+                failed = await database_sync_to_async(self._write_batch)(batch)
+            except Exception as e:
+                logger.error("Failed to persist %d buffered messages: %s", len(batch), e)
+                self._requeue(batch)
+                return
+
+            if failed:
+                self._requeue(failed)
+                batch = [entry for entry in batch if entry not in failed]
+            await self._notify_persisted(batch)
+
+    def flush_sync(self):
+        """
+        Writes every pending message to the database synchronously.
+
+        Registered with :mod:`atexit` so batches survive a graceful shutdown of the
+        ASGI server, after the event loop has stopped.
+        """
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        try:
+            failed = self._write_batch(batch)
+            logger.info(
+                "Persisted %d buffered messages on shutdown", len(batch) - len(failed)
+            )
+        except Exception as e:
+            logger.error(
+                "Failed to persist %d buffered messages on shutdown: %s", len(batch), e
+            )
+
+    def _write_batch(self, batch):
+        """
+        Writes a batch in one ``bulk_create``, or row by row if the batch fails.
+
+        :return: The entries of the batch which could not be written.
+        :rtype: list[tuple]
+        """
+        close_old_connections()
+        messages = [message for _, _, message, _ in batch]
+        try:
+            with transaction.atomic():
+                Message.objects.bulk_create(messages, batch_size=self.batch_size)
+                increment_unread_counts(count_new_messages(messages))
+            failed = []
+        except Exception as e:
+            logger.warning(
+                "Failed to persist a batch of %d buffered messages, writing them one "
+                "by one: %s",
+                len(batch),
+                e,
+            )
+            failed = self._write_rows(batch)
+
+        for provisional_id, _, message, _ in batch:
+            if message.pk is not None:
+                self._resolved[provisional_id] = message.id
+        while len(self._resolved) > self.resolved_ids_limit:
+            self._resolved.popitem(last=False)
+
+        logger.debug("Persisted %d buffered messages", len(batch) - len(failed))
+        return failed
+
+    def _write_rows(self, batch):
+        failed = []
+        for entry in batch:
+            provisional_id, _, message, _ = entry
+            # A rolled back chunk of the batch may have assigned IDs
+            message.pk = None
+            try:
+                with transaction.atomic():
+                    Message.objects.bulk_create([message])
+                    increment_unread_counts(count_new_messages([message]))
+            except Exception as e:
+                logger.error(
+                    "Failed to persist buffered message %s: %s", provisional_id, e
+                )
+                message.pk = None
+                failed.append(entry)
+        return failed
+
+    def _requeue(self, batch):
+        retry = []
+        for provisional_id, room_group_name, message, attempts in batch:
+            if attempts + 1 < self.max_retries:
+                retry.append((provisional_id, room_group_name, message, attempts + 1))
+            else:
+                logger.error(
+                    "Dropping buffered message %s after %d attempts",
+                    provisional_id,
+                    attempts + 1,
+                )
+        self._pending = retry + self._pending
+
+    async def _notify_persisted(self, batch):
+        ids_by_room = {}
+        for provisional_id, room_group_name, message, _ in batch:
+            ids_by_room.setdefault(room_group_name, {})[provisional_id] = message.id
+
+        channel_layer = get_channel_layer()
+        for room_group_name, ids in ids_by_room.items():
+            try:
+                await channel_layer.group_send(
+                    room_group_name,
+                    build_frame_event(
+                        {
+                            "type": "chat.message",
+                            "action": "message_persisted",
+                            "message": {"ids": ids},
+                        }
+                    ),
+                )
+            except Exception as e:
+                logger.error("Failed to send persisted message ids: %s", e)
+
+    def _ensure_flusher(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._flusher and not self._flusher.done():
+            return
+
+        # (re)bind the flusher to the running loop
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Unexpected error in the message flusher: %s", e)
+
+
+_buffer = None
+
+
+def get_message_buffer():
+    """
+    Returns the per-process message write buffer, creating it on first use.
+
+    :return: The message write buffer.
+    :rtype: MessageWriteBuffer
+    """
+    global _buffer
+    if _buffer is None:
+        config = get_write_behind_config()
+        _buffer = MessageWriteBuffer(
+            batch_size=config["BATCH_SIZE"],
+            flush_interval=config["FLUSH_INTERVAL"],
+            max_retries=config["MAX_RETRIES"],
+            resolved_ids=config["RESOLVED_IDS"],
+        )
+        atexit.register(_buffer.flush_sync)
+    return _buffer
@@ -5,8 +5,14 @@ from courses.models import (
     Feedback,
     Course,
     CourseMaterial,
+    CourseRatingSummary,
     Assignment,
     Enrolment,
+    MaterialBlob,
+    MaterialUpload,
+    MaterialUploadJob,
+    StudentDeadline,
+    TeacherRatingSummary,
 )
 from django.contrib import admin
 
@@ -16,3 +22,9 @@ admin.site.register(CourseMaterial)
 admin.site.register(Assignment)
 admin.site.register(AssignmentSubmission)
 admin.site.register(Enrolment)
+admin.site.register(MaterialUpload)
+admin.site.register(MaterialUploadJob)
+admin.site.register(MaterialBlob)
+admin.site.register(StudentDeadline)
+admin.site.register(CourseRatingSummary)
+admin.site.register(TeacherRatingSummary)
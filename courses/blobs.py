@@ -0,0 +1,173 @@
+import hashlib
+import logging
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from courses.models import CourseMaterial, MaterialBlob
+
+logger = logging.getLogger(__name__)
+
+
+def hash_file(file):
+    """
+    Computes the SHA-256 hex digest and size of a file, one chunk at a time.
+
+    :param file: The file to hash, rewound afterwards.
+    :type file: django.core.files.File
+
+    :return: The digest and size of the file.
+    :rtype: tuple[str, int]
+    """
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return digest.hexdigest(), size
+
+
+def reference_blob(sha256):
+    """
+    Adds a reference to the blob with the given digest, if it exists.
+
+    :param sha256: The SHA-256 hex digest of the file.
+    :type sha256: str
+
+    :return: The referenced blob, or None if no blob has this digest.
+    :rtype: MaterialBlob or None
+    """
+    if not MaterialBlob.objects.filter(sha256=sha256).update(
+        ref_count=F("ref_count") + 1
+    ):
+        return None
+    return MaterialBlob.objects.get(sha256=sha256)
+
+
+def create_blob(blob):
+    """
+    Saves a new blob holding one reference, or references the blob saved by a
+    concurrent upload of the same bytes after deleting the file of the new one.
+    """
+    blob.ref_count = 1
+    try:
+        with transaction.atomic():
+            blob.save()
+    except IntegrityError:
+        default_storage.delete(blob.file.name)
+        return reference_blob(blob.sha256)
+    return blob
+
+
+def acquire_blob(file, filename):
+    """
+    Returns the blob holding the bytes of a file, storing them only if no blob holds
+    them yet. The caller owns one reference to the returned blob.
+
+    :param file: The uploaded file.
+    :type file: django.core.files.File
+    :param filename: The name the file is stored under if it is new.
+    :type filename: str
+
+    :return: The blob of the file.
+    :rtype: MaterialBlob
+    """
+    sha256, size = hash_file(file)
+
+    blob = reference_blob(sha256)
+    if blob is not None:
+        logger.info("Deduplicated %s into blob %s", filename, sha256)
+        return blob
+
+    blob = MaterialBlob(sha256=sha256, size=size)
+    blob.file.save(filename, file, save=False)
+    return create_blob(blob)
+
+
+def adopt_blob(storage_name, sha256, size):
+    """
+    Returns the blob holding the bytes of a file already in the storage, e.g. a
+    chunked upload. The file becomes the blob if its bytes are new, otherwise it is
+    deleted. The caller owns one reference to the returned blob.
+
+    :param storage_name: The name of the file in the default storage.
+    :type storage_name: str
+    :param sha256: The SHA-256 hex digest of the file.
+    :type sha256: str
+    :param size: The size of the file in bytes.
+    :type size: int
+
+    :return: The blob of the file.
+    :rtype: MaterialBlob
+    """
+    blob = reference_blob(sha256)
+    if blob is not None:
+        default_storage.delete(storage_name)
+        logger.info("Deduplicated %s into blob %s", storage_name, sha256)
+        return blob
+
+    blob = MaterialBlob(sha256=sha256, size=size)
+    blob.file.name = storage_name
+    return create_blob(blob)
+
+
+def release_blob(blob_id):
+    """
+    Drops a reference to a blob, deleting the blob and its file once no course
+    material references it.
+
+    :param blob_id: The ID of the blob.
+    :type blob_id: int
+    """
+    with transaction.atomic():
+        MaterialBlob.objects.filter(pk=blob_id, ref_count__gt=0).update(
+            ref_count=F("ref_count") - 1
+        )
+        orphan = MaterialBlob.objects.filter(pk=blob_id, ref_count=0).first()
+        if orphan is None:
+            return
+        orphan.delete()
+
+        # the file goes once the deletion of the blob is committed
+        transaction.on_commit(lambda: default_storage.delete(orphan.file.name))
+
+
+def create_course_material(course_id, week_number, blob, name):
+    """
+    Creates a course material using the file of a blob, without copying it.
+
+    The reference to the blob acquired by the caller is handed over to the course
+    material, or released if the material cannot be created.
+
+    :param course_id: The ID of the course of the material.
+    :type course_id: int
+    :param week_number: The week number of the material.
+    :type week_number: int
+    :param blob: The blob of the file, with a reference owned by the caller.
+    :type blob: MaterialBlob
+    :param name: The name of the uploaded file.
+    :type name: str
+
+    :return: The created course material.
+    :rtype: CourseMaterial
+
+    :raises ValueError: If the same file is already a material of the week.
+    """
+    material = CourseMaterial(
+        course_id=course_id, week_number=week_number, blob=blob, name=name
+    )
+    material.material.name = blob.file.name
+
+    try:
+        with transaction.atomic():
+            material.save()
+    except IntegrityError as e:
+        release_blob(blob.pk)
+        raise ValueError(f"{name} is already a material of week {week_number}.") from e
+    except Exception:
+        release_blob(blob.pk)
+        raise
+    return material
@@ -0,0 +1,383 @@
+import base64
+import json
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from courses.models import Course
+from users.search import (
+    NAME_VECTOR,
+    has_vector_index,
+    match_expression,
+    tsquery_expression,
+    vector_match,
+    warn_unindexed_search,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COURSE_CATALOGUE = {
+    "PAGE_SIZE": 12,  # courses per catalogue page
+}
+
+# FTS5 table holding the searchable text of every course, keyed by the course ID
+SEARCH_TABLE = "courses_course_search"
+
+# PostgreSQL text search vector of the text of a course, indexed by
+# courses_course_search_vector_idx
+SEARCH_VECTOR = (
+    "to_tsvector('simple', coalesce(courses_course.name, '') || ' ' || "
+    "coalesce(courses_course.summary, '') || ' ' || "
+    "coalesce(courses_course.description, ''))"
+)
+
+# Facet values and the filter each one applies, relative to the current time
+DURATION_FACETS = {
+    "short": ("Up to 4 weeks", lambda now: Q(duration_weeks__lte=4)),
+    "medium": (
+        "5 to 12 weeks",
+        lambda now: Q(duration_weeks__gte=5, duration_weeks__lte=12),
+    ),
+    "long": ("More than 12 weeks", lambda now: Q(duration_weeks__gt=12)),
+}
+START_FACETS = {
+    "started": ("Already started", lambda now: Q(start_date__lte=now)),
+    "next_30_days": (
+        "Starting within 30 days",
+        lambda now: Q(start_date__gt=now, start_date__lte=now + timedelta(days=30)),
+    ),
+    "later": (
+        "Starting later",
+        lambda now: Q(start_date__gt=now + timedelta(days=30)),
+    ),
+}
+RATING_FACETS = {
+    "4": ("4 stars & up", lambda now: Q(rating_average__gte=4)),
+    "3": ("3 stars & up", lambda now: Q(rating_average__gte=3)),
+    "2": ("2 stars & up", lambda now: Q(rating_average__gte=2)),
+}
+FACETS = {
+    "duration": DURATION_FACETS,
+    "start": START_FACETS,
+    "rating": RATING_FACETS,
+}
+
+# Sort orders and their keyset field, courses without a rating come last
+SORTS = {
+    "newest": ("start_date", True),
+    "rating": ("rating_average", True),
+    "name": ("name", False),
+}
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a catalogue page cursor cannot be decoded.
+    """
+
+
+def get_catalogue_config():
+    """
+    Returns the course catalogue configuration merged over the defaults.
+
+    :return: The ``COURSE_CATALOGUE`` setting merged over the defaults.
+    :rtype: dict
+    """
+    return {**DEFAULT_COURSE_CATALOGUE, **getattr(settings, "COURSE_CATALOGUE", {})}
+
+
+def has_search_index():
+    """
+    Returns whether the database has the FTS5 full-text index, i.e. is SQLite.
+    """
+    return connection.vendor == "sqlite"
+
+
+def index_course(course):
+    """
+    Adds a course to the catalogue search index, or refreshes its indexed text.
+
+    :param course: The saved course, with its teacher.
+    :type course: Course
+    """
+    if not has_search_index():
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [course.pk])
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} "
+            "(rowid, name, summary, description, teacher_name) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            [
+                course.pk,
+                course.name,
+                course.summary,
+                strip_tags(course.description or ""),
+                course.teacher.get_full_name(),
+            ],
+        )
+
+
+def unindex_course(course_id):
+    """
+    Removes a course from the catalogue search index.
+
+    :param course_id: The ID of the deleted course.
+    :type course_id: int
+    """
+    if not has_search_index():
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [course_id])
+
+
+def rebuild_catalogue_index():
+    """
+    Rebuilds the catalogue search index and the course ratings, e.g. after a bulk
+    import that bypassed the signals.
+
+    :return: The number of indexed courses.
+    :rtype: int
+    """
+    from courses.ratings import rebuild_rating_summaries
+
+    count = 0
+    if has_search_index():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        for course in Course.objects.select_related("teacher").iterator():
+            index_course(course)
+            count += 1
+
+    rebuild_rating_summaries()
+
+    logger.info("Indexed %d courses for the catalogue", count)
+    return count
+
+
+def search_filter(query):
+    """
+    Returns the filter of the courses matching a search query over their name,
+    summary, description and teacher name, or None for an empty query.
+
+    On PostgreSQL the words are matched through the GIN indexes of the course text
+    and of the teacher names, so every word must be found in the one or the other.
+
+    :rtype: Q or None
+    """
+    if not query.strip():
+        return None
+
+    if has_vector_index():
+        expression = tsquery_expression(query)
+        if not expression:
+            return Q(pk__in=[])
+        return Q(vector_match(SEARCH_VECTOR, expression)) | Q(
+            teacher_id__in=RawSQL(
+                "SELECT id FROM users_user "
+                f"WHERE ({NAME_VECTOR}) @@ to_tsquery('simple', %s)",
+                [expression],
+            )
+        )
+
+    if not has_search_index():
+        warn_unindexed_search("Catalogue search", connection.vendor)
+        return (
+            Q(name__icontains=query)
+            | Q(summary__icontains=query)
+            | Q(description__icontains=query)
+            | Q(teacher__first_name__icontains=query)
+            | Q(teacher__last_name__icontains=query)
+        )
+
+    expression = match_expression(query)
+    if not expression:
+        return Q(pk__in=[])
+    return Q(
+        id__in=RawSQL(
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s",
+            [expression],
+        )
+    )
+
+
+def encode_cursor(course, sort):
+    """
+    Encodes the position of the last course of a page.
+
+    :rtype: str
+    """
+    field, _descending = SORTS[sort]
+    value = getattr(course, field)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, value, course.pk]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort):
+    """
+    Decodes a page cursor into the sort value and ID of the last course.
+
+    :raises InvalidCursor: If the cursor is malformed or of another sort order.
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, course_id = json.loads(payload)
+        if cursor_sort != sort or not isinstance(course_id, int):
+            raise ValueError(cursor_sort)
+        if SORTS[sort][0] == "start_date":
+            value = datetime.fromisoformat(value)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid page cursor.") from e
+    return value, course_id
+
+
+def after_cursor(sort, value, course_id):
+    """
+    Returns the filter of the courses after a position in a sort order.
+
+    Courses without a value, i.e. without a rating, come after every other course.
+
+    :rtype: Q
+    """
+    field, descending = SORTS[sort]
+    if value is None:
+        return Q(**{f"{field}__isnull": True, "id__gt": course_id})
+
+    beyond = f"{field}__lt" if descending else f"{field}__gt"
+    return (
+        Q(**{beyond: value})
+        | Q(**{field: value, "id__gt": course_id})
+        | Q(**{f"{field}__isnull": True})
+    )
+
+
+def order_by(sort):
+    """
+    Returns the ordering of a sort order, matching :func:`after_cursor`.
+
+    :rtype: list
+    """
+    field, descending = SORTS[sort]
+    if descending:
+        return [F(field).desc(nulls_last=True), "id"]
+    return [F(field).asc(nulls_last=True), "id"]
+
+
+def facet_counts(courses, filters, now):
+    """
+    Counts the courses of each facet value. The count of a value applies the
+    filters of the other facets, so it is the number of results picking it gives.
+
+    :param courses: The courses matching the search query.
+    :type courses: QuerySet
+    :param filters: The selected value of each facet.
+    :type filters: dict[str, str or None]
+    :param now: The reference time of the start date facet.
+    :type now: datetime
+
+    :return: The value, label, count and selection of each facet value.
+    :rtype: dict[str, list[dict]]
+    """
+    facets = {}
+    for name, values in FACETS.items():
+        others = courses
+        for other, selected in filters.items():
+            if other != name and selected:
+                others = others.filter(FACETS[other][selected][1](now))
+
+        counts = others.aggregate(
+            **{
+                value: Count("id", filter=make_filter(now))
+                for value, (_label, make_filter) in values.items()
+            }
+        )
+        facets[name] = [
+            {
+                "value": value,
+                "label": label,
+                "count": counts[value],
+                "selected": filters.get(name) == value,
+            }
+            for value, (label, _make_filter) in values.items()
+        ]
+    return facets
+
+
+def search_catalogue(
+    query="",
+    duration=None,
+    start=None,
+    rating=None,
+    sort="newest",
+    cursor=None,
+    page_size=None,
+    now=None,
+):
+    """
+    Searches the official courses of the catalogue.
+
+    The search query matches the words of the name, summary, description and
+    teacher name of the courses by prefix, through the full-text index, see
+    :func:`search_filter`. Pages are
+    read by keyset on the sort value and the course ID, so a deep page costs the
+    same as the first one.
+
+    :param query: The search query.
+    :type query: str
+    :param duration: The selected duration facet value.
+    :type duration: str or None
+    :param start: The selected start date facet value.
+    :type start: str or None
+    :param rating: The selected rating facet value.
+    :type rating: str or None
+    :param sort: The sort order, one of ``SORTS``.
+    :type sort: str
+    :param cursor: The cursor of the page, None for the first page.
+    :type cursor: str or None
+    :param page_size: The number of courses per page, defaults to ``PAGE_SIZE``.
+    :type page_size: int or None
+    :param now: The reference time of the start date facet.
+    :type now: datetime or None
+
+    :return: The ``courses`` of the page with their teacher, the ``next_cursor``
+        or None on the last page, and the ``facets`` counts.
+    :rtype: dict
+
+    :raises InvalidCursor: If the cursor cannot be decoded.
+    """
+    page_size = page_size or get_catalogue_config()["PAGE_SIZE"]
+    now = now or timezone.now()
+    filters = {"duration": duration, "start": start, "rating": rating}
+
+    courses = Course.objects.filter(status=Course.OFFICIAL)
+    match = search_filter(query)
+    if match is not None:
+        courses = courses.filter(match)
+
+    facets = facet_counts(courses, filters, now)
+
+    for name, selected in filters.items():
+        if selected:
+            courses = courses.filter(FACETS[name][selected][1](now))
+    if cursor:
+        courses = courses.filter(after_cursor(sort, *decode_cursor(cursor, sort)))
+
+    page = list(
+        courses.select_related("teacher").order_by(*order_by(sort))[: page_size + 1]
+    )
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(page[-1], sort)
+
+    return {"courses": page, "next_cursor": next_cursor, "facets": facets}
@@ -0,0 +1,213 @@
+import logging
+from itertools import groupby
+
+from django.db.models import Max
+
+from courses.models import (
+    Assignment,
+    AssignmentSubmission,
+    Enrolment,
+    StudentDeadline,
+)
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_FIELDS = ["course", "assignment_name", "week_number", "deadline"]
+
+
+def latest_submissions(assignments, student_ids=None):
+    """
+    Returns the time of the latest submission of each student to the assignments.
+
+    :param assignments: The assignments, or their IDs.
+    :type assignments: list
+    :param student_ids: Only include the submissions of these students.
+    :type student_ids: list[int] or None
+
+    :return: The latest submission time per ``(student_id, assignment_id)``.
+    :rtype: dict[tuple[int, int], datetime]
+    """
+    submissions = AssignmentSubmission.objects.filter(assignment__in=assignments)
+    if student_ids is not None:
+        submissions = submissions.filter(student_id__in=student_ids)
+
+    return {
+        (row["student_id"], row["assignment_id"]): row["submitted_at"]
+        for row in submissions.values("student_id", "assignment_id").annotate(
+            submitted_at=Max("submitted_at")
+        )
+    }
+
+
+def upsert_deadlines(assignments, student_ids):
+    """
+    Creates or refreshes the dashboard rows of every student for the assignments,
+    in one INSERT ... ON CONFLICT DO UPDATE.
+
+    :param assignments: The assignments, with their course loaded.
+    :type assignments: list[Assignment]
+    :param student_ids: The IDs of the students enrolled in their courses.
+    :type student_ids: list[int]
+
+    :return: The number of rows written.
+    :rtype: int
+    """
+    if not assignments or not student_ids:
+        return 0
+
+    submitted = latest_submissions(assignments, student_ids)
+    rows = [
+        StudentDeadline(
+            student_id=student_id,
+            course_id=assignment.course_id,
+            assignment=assignment,
+            assignment_name=assignment.name,
+            week_number=assignment.week_number,
+            deadline=assignment.get_assignment_deadline(),
+            submitted_at=submitted.get((student_id, assignment.id)),
+        )
+        for assignment in assignments
+        for student_id in student_ids
+    ]
+    StudentDeadline.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["student", "assignment"],
+        update_fields=DEADLINE_FIELDS + ["submitted_at"],
+    )
+    return len(rows)
+
+
+def sync_assignment(assignment):
+    """
+    Creates or refreshes the dashboard rows of every student enrolled in the course
+    of an assignment.
+
+    :param assignment: The saved assignment.
+    :type assignment: Assignment
+    """
+    student_ids = list(
+        Enrolment.objects.filter(course_id=assignment.course_id).values_list(
+            "student_id", flat=True
+        )
+    )
+    upsert_deadlines([assignment], student_ids)
+
+
+def sync_course(course):
+    """
+    Refreshes the deadlines of the assignments of a course, e.g. after its start
+    date changed.
+
+    :param course: The saved course.
+    :type course: Course
+    """
+    for assignment in course.assignments.all():
+        assignment.course = course
+        StudentDeadline.objects.filter(assignment=assignment).update(
+            deadline=assignment.get_assignment_deadline()
+        )
+
+
+def sync_enrolment(enrolment):
+    """
+    Creates the dashboard rows of a newly enrolled student.
+
+    :param enrolment: The saved enrolment.
+    :type enrolment: Enrolment
+    """
+    assignments = list(
+        Assignment.objects.filter(course_id=enrolment.course_id).select_related(
+            "course"
+        )
+    )
+    upsert_deadlines(assignments, [enrolment.student_id])
+
+
+def remove_enrolment(enrolment):
+    """
+    Deletes the dashboard rows of a student no longer enrolled in a course.
+
+    :param enrolment: The deleted enrolment.
+    :type enrolment: Enrolment
+    """
+    StudentDeadline.objects.filter(
+        student_id=enrolment.student_id, course_id=enrolment.course_id
+    ).delete()
+
+
+def sync_submission(student_id, assignment_id):
+    """
+    Refreshes the latest submission of a student in their dashboard row.
+
+    :param student_id: The ID of the student.
+    :type student_id: int
+    :param assignment_id: The ID of the assignment.
+    :type assignment_id: int
+    """
+    submitted_at = latest_submissions([assignment_id], [student_id]).get(
+        (student_id, assignment_id)
+    )
+    StudentDeadline.objects.filter(
+        student_id=student_id, assignment_id=assignment_id
+    ).update(submitted_at=submitted_at)
+
+
+def rebuild_student_deadlines(courses=None):
+    """
+    Rebuilds the dashboard rows from the courses, assignments, enrolments and
+    submissions, e.g. after a bulk import that bypassed the signals.
+
+    :param courses: The courses to rebuild, defaults to every course.
+    :type courses: QuerySet or None
+
+    :return: The number of rows written.
+    :rtype: int
+    """
+    assignments = Assignment.objects.select_related("course").order_by("course_id")
+    enrolments = Enrolment.objects.all()
+    stale = StudentDeadline.objects.all()
+    if courses is not None:
+        assignments = assignments.filter(course__in=courses)
+        enrolments = enrolments.filter(course__in=courses)
+        stale = stale.filter(course__in=courses)
+
+    stale.delete()
+
+    students_by_course = {}
+    for course_id, student_id in enrolments.values_list("course_id", "student_id"):
+        students_by_course.setdefault(course_id, []).append(student_id)
+
+    written = 0
+    for course_id, course_assignments in groupby(
+        assignments.iterator(), key=lambda assignment: assignment.course_id
+    ):
+        written += upsert_deadlines(
+            list(course_assignments), students_by_course.get(course_id, [])
+        )
+
+    logger.info("Rebuilt %d student deadlines", written)
+    return written
+
+
+def get_student_dashboard(student):
+    """
+    Returns the deadlines of a student grouped by course, from the read model.
+
+    :param student: The student.
+    :type student: User
+
+    :return: The deadlines of each course, soonest first.
+    :rtype: dict[Course, list[StudentDeadline]]
+    """
+    deadlines = (
+        StudentDeadline.objects.filter(student=student)
+        .select_related("course")
+        .order_by("course_id", "deadline", "assignment_id")
+    )
+    return {
+        course: list(course_deadlines)
+        for course, course_deadlines in groupby(
+            deadlines, key=lambda deadline: deadline.course
+        )
+    }
@@ -1,26 +1,33 @@
+import inspect
 from django.http import HttpResponseForbidden
 from functools import wraps
 
-from courses.models import Enrolment
+from users.access import get_request_enrolment, in_group
 
 
 def check_student_banned(view_func):
     """
-    Decorator to check the banned status of the student.
+    Decorator to check the banned status of the student in the course of the view,
+    given by its ``course_id`` argument.
+
+    The groups of the user and their enrolment in the course are resolved once per
+    request, see :func:`users.access.get_request_enrolment`.
 
     :param view_func: The view function to decorate.
     :type view_func: function
     :return: Decorated function.
     :rtype: function
     """
+    signature = inspect.signature(inspect.unwrap(view_func))
 
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if request.user.groups.filter(name="student").exists():
-            enrolment = Enrolment.objects.filter(student=request.user).first()
-            if not enrolment:
+        if in_group(request, "student"):
+            arguments = signature.bind_partial(request, *args, **kwargs).arguments
+            is_banned = get_request_enrolment(request, arguments.get("course_id"))
+            if is_banned is None:
                 return HttpResponseForbidden("You are not enrolled into the course.")
-            elif not enrolment.is_banned:
+            elif not is_banned:
                 return view_func(request, *args, **kwargs)
             else:
                 return HttpResponseForbidden(
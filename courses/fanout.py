@@ -0,0 +1,231 @@
+import logging
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.mail import get_connection, send_mass_mail
+from django.utils import timezone
+from notifications.models import Notification
+
+from courses.models import Enrolment
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COURSE_FANOUT = {
+    "BATCH_SIZE": 500,  # recipients loaded, emailed and notified at a time
+    "FROM_EMAIL": "awdtest04@gmail.com",
+}
+
+
+def get_fanout_config():
+    """
+    Returns the fan-out configuration merged over the defaults.
+
+    :return: The ``COURSE_FANOUT`` setting merged over the defaults.
+    :rtype: dict
+    """
+    return {**DEFAULT_COURSE_FANOUT, **getattr(settings, "COURSE_FANOUT", {})}
+
+
+def iter_enrolled_students(course_id, batch_size):
+    """
+    Iterates over the students enrolled in a course, one page at a time.
+
+    Pages are read by keyset on the student ID with ``values_list``, so no model
+    instance is built and every page is a bounded range scan.
+
+    :param course_id: The ID of the course.
+    :type course_id: int
+    :param batch_size: The number of students per page.
+    :type batch_size: int
+
+    :return: An iterator over pages of ``(id, email, first_name, last_name)`` tuples.
+    :rtype: iterator of list[tuple]
+    """
+    last_student_id = 0
+    while True:
+        page = list(
+            Enrolment.objects.filter(
+                course_id=course_id, student_id__gt=last_student_id
+            )
+            .order_by("student_id")
+            .values_list(
+                "student_id",
+                "student__email",
+                "student__first_name",
+                "student__last_name",
+            )[:batch_size]
+        )
+        if not page:
+            return
+        yield page
+        last_student_id = page[-1][0]
+
+
+def create_notifications(actor, recipient_ids, verb):
+    """
+    Creates the django notifications of many recipients in one INSERT, with the
+    fields ``notify.send`` would set.
+
+    :param actor: The sender of the notifications.
+    :type actor: User
+    :param recipient_ids: The IDs of the recipients.
+    :type recipient_ids: list[int]
+    :param verb: The notification message.
+    :type verb: str
+
+    :return: The created notifications.
+    :rtype: list[Notification]
+    """
+    actor_content_type = ContentType.objects.get_for_model(actor)
+    timestamp = timezone.now()
+    return Notification.objects.bulk_create(
+        [
+            Notification(
+                recipient_id=recipient_id,
+                actor_content_type=actor_content_type,
+                actor_object_id=actor.pk,
+                verb=verb,
+                timestamp=timestamp,
+                level=Notification.LEVELS.info,
+            )
+            for recipient_id in recipient_ids
+        ]
+    )
+
+
+def fan_out_course_event(
+    course_id, actor_id, verb, email_subject=None, email_body=None
+):
+    """
+    Notifies every student enrolled in a course, and emails them if an email is
+    given.
+
+    Each page of recipients gets its notifications in a single ``bulk_create`` and
+    its emails through ``send_mass_mail`` over one SMTP connection, opened once for
+    the whole fan-out. Every email starts with a greeting of its recipient.
+
+    :param course_id: The ID of the course.
+    :type course_id: int
+    :param actor_id: The ID of the user sending the notifications.
+    :type actor_id: int
+    :param verb: The notification message.
+    :type verb: str
+    :param email_subject: The subject of the email, or None to only notify.
+    :type email_subject: str or None
+    :param email_body: The body of the email, after the greeting.
+    :type email_body: str or None
+
+    :return: The number of notifications and emails sent.
+    :rtype: dict[str, int]
+    """
+    config = get_fanout_config()
+    actor = User.objects.get(pk=actor_id)
+    sent = {"notifications": 0, "emails": 0}
+
+    connection = get_connection() if email_subject else None
+    if connection:
+        connection.open()
+
+    try:
+        for page in iter_enrolled_students(course_id, config["BATCH_SIZE"]):
+            sent["notifications"] += len(
+                create_notifications(actor, [student[0] for student in page], verb)
+            )
+
+            if connection:
+                sent["emails"] += send_mass_mail(
+                    (
+                        (
+                            email_subject,
+                            f"Dear {f'{first_name} {last_name}'.strip()},\n\n"
+                            + email_body,
+                            config["FROM_EMAIL"],
+                            [email],
+                        )
+                        for _, email, first_name, last_name in page
+                        if email
+                    ),
+                    connection=connection,
+                )
+    finally:
+        if connection:
+            connection.close()
+
+    logger.info(
+        "Sent %d notifications and %d emails to the students of course %s",
+        sent["notifications"],
+        sent["emails"],
+        course_id,
+    )
+    return sent
+
+
+def materials_update_email(course, week, num_of_materials):
+    """
+    Returns the email sent to the students of a course when materials are added.
+
+    :param course: The course for which the materials update is being sent.
+    :type course: Course
+    :param week: The week number for which the materials update is being sent.
+    :type week: int
+    :param num_of_materials: The number of new materials added for the specified week.
+    :type num_of_materials: int
+
+    :return: The subject and the body of the email, after the greeting.
+    :rtype: tuple[str, str]
+    """
+    subject = f"Materials Update for {course.name}"
+
+    # Introduction
+    intro = (
+        "We hope this message finds you well. As part of our ongoing efforts to support your learning experience, "
+        "we are pleased to inform you about the latest updates in your course materials.\n\n"
+    )
+
+    # Instructions on accessing materials
+    instructions = (
+        f"{num_of_materials} new course materials {'have' if num_of_materials > 1 else 'has'} been added to week '{week}'.\n"
+        f"To access the materials, click on the link below:\n"
+        f"https://localhost/official/{course.id}?week={week}.\n\n"
+    )
+
+    # Call to action
+    call_to_action = (
+        "We encourage you to review the new materials at your earliest convenience to stay updated with the course "
+        "content.\n\n"
+    )
+
+    # Closing statement
+    closing = " Best regards,\nThe Course Management Team"
+
+    return subject, intro + instructions + call_to_action + closing
+
+
+def enrolment_email(user, course):
+    """
+    Returns the enrollment confirmation email of a user.
+
+    :param user: The user who has been enrolled in the course.
+    :type user: User
+    :param course: The course in which the user has been enrolled.
+    :type course: Course
+
+    :return: The subject and the message of the email.
+    :rtype: tuple[str, str]
+    """
+    subject = f"Successful Enrolment to {course.name}"
+    message = (
+        f"Dear {user.get_full_name()},\n\n"
+        f"Congratulations! You have successfully enrolled in the course '{course.name}'.\n"
+        f"We're excited to have you on board and look forward to seeing you excel in the course.\n\n"
+        f"Course Details:\n"
+        f"Name: {course.name}\n"
+        f"Start Date: {course.start_date}\n"
+        f"End Date: {course.datetime_from_start_date(course.duration_weeks)}\n"
+        f"Duration: {course.duration_weeks} weeks\n"
+        f"Teacher: {course.teacher.get_full_name()} - {course.teacher.email}\n\n"
+        f"If you have any questions or need assistance, feel free to contact us.\n\n"
+        f"Best regards,\nThe Course Management Team"
+    )
+    return subject, message
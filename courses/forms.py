@@ -1,5 +1,6 @@
 from django import forms
 
+from courses.catalogue import DURATION_FACETS, RATING_FACETS, SORTS, START_FACETS
 from courses.models import (
     Assignment,
     AssignmentSubmission,
@@ -146,3 +147,42 @@ class FeedbackForm(forms.ModelForm):
                 choices=[(i, "") for i in range(1, 6)]
             ),
         }
+
+
+class CourseCatalogueForm(forms.Form):
+    """
+    Validates the search query, facets, sort order and page of the catalogue.
+    """
+
+    q = forms.CharField(
+        required=False,
+        max_length=200,
+        widget=forms.TextInput(
+            attrs={
+                "class": "form-control",
+                "type": "search",
+                "placeholder": "Search courses or teachers",
+            }
+        ),
+    )
+    duration = forms.ChoiceField(
+        required=False,
+        choices=[("", "Any duration")]
+        + [(value, label) for value, (label, _) in DURATION_FACETS.items()],
+    )
+    start = forms.ChoiceField(
+        required=False,
+        choices=[("", "Any start date")]
+        + [(value, label) for value, (label, _) in START_FACETS.items()],
+    )
+    rating = forms.ChoiceField(
+        required=False,
+        choices=[("", "Any rating")]
+        + [(value, label) for value, (label, _) in RATING_FACETS.items()],
+    )
+    sort = forms.ChoiceField(
+        required=False,
+        choices=[(sort, sort.capitalize()) for sort in SORTS],
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    cursor = forms.CharField(required=False, widget=forms.HiddenInput)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from courses.catalogue import rebuild_catalogue_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the search index and the ratings of the course catalogue."
+
+    def handle(self, *args, **options):
+        count = rebuild_catalogue_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} courses."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.dashboard import rebuild_student_deadlines
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the deadlines of the student dashboard from the assignments, "
+        "enrolments and submissions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--course",
+            action="append",
+            type=int,
+            dest="course_ids",
+            help="Only rebuild the course with this ID. Can be repeated.",
+        )
+
+    def handle(self, *args, course_ids=None, **options):
+        courses = None
+        if course_ids:
+            courses = Course.objects.filter(id__in=course_ids)
+            missing = set(course_ids) - set(courses.values_list("id", flat=True))
+            if missing:
+                raise CommandError(
+                    f"Unknown courses: {', '.join(map(str, sorted(missing)))}"
+                )
+
+        written = rebuild_student_deadlines(courses)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} student deadlines."))
@@ -0,0 +1,66 @@
+# Generated by Django 5.0 on 2026-10-18 17:46
+
+import courses.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0004_materialuploadjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MaterialBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sha256", models.CharField(max_length=64, unique=True)),
+                (
+                    "file",
+                    models.FileField(
+                        max_length=255, upload_to=courses.models.blob_upload_path
+                    ),
+                ),
+                ("size", models.PositiveBigIntegerField()),
+                ("ref_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Material Blob",
+                "verbose_name_plural": "Material Blobs",
+            },
+        ),
+        migrations.AddField(
+            model_name="coursematerial",
+            name="name",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name="coursematerial",
+            name="material",
+            field=models.FileField(
+                max_length=255, upload_to=courses.models.material_upload_path
+            ),
+        ),
+        migrations.AddField(
+            model_name="coursematerial",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="course_materials",
+                to="courses.materialblob",
+            ),
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 5.0 on 2026-10-18 17:56
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_student_deadlines(apps, schema_editor):
+    Assignment = apps.get_model("courses", "Assignment")
+    AssignmentSubmission = apps.get_model("courses", "AssignmentSubmission")
+    Enrolment = apps.get_model("courses", "Enrolment")
+    StudentDeadline = apps.get_model("courses", "StudentDeadline")
+
+    students_by_course = {}
+    for course_id, student_id in Enrolment.objects.values_list(
+        "course_id", "student_id"
+    ):
+        students_by_course.setdefault(course_id, []).append(student_id)
+
+    submitted = {
+        (row["student_id"], row["assignment_id"]): row["submitted_at"]
+        for row in AssignmentSubmission.objects.values(
+            "student_id", "assignment_id"
+        ).annotate(submitted_at=Max("submitted_at"))
+    }
+
+    rows = []
+    for assignment in Assignment.objects.select_related("course").iterator():
+        start_date = assignment.course.start_date
+        deadline = start_date and (
+            start_date
+            + timedelta(weeks=max(assignment.week_number - 1, 0))
+            + timedelta(days=assignment.duration_days)
+        )
+        rows.extend(
+            StudentDeadline(
+                student_id=student_id,
+                course_id=assignment.course_id,
+                assignment_id=assignment.id,
+                assignment_name=assignment.name,
+                week_number=assignment.week_number,
+                deadline=deadline,
+                submitted_at=submitted.get((student_id, assignment.id)),
+            )
+            for student_id in students_by_course.get(assignment.course_id, [])
+        )
+    StudentDeadline.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0005_materialblob"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StudentDeadline",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("assignment_name", models.CharField(max_length=100)),
+                (
+                    "week_number",
+                    models.PositiveIntegerField(verbose_name="Week Number"),
+                ),
+                ("deadline", models.DateTimeField(null=True)),
+                ("submitted_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "assignment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="student_deadlines",
+                        to="courses.assignment",
+                    ),
+                ),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="courses.course",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="deadlines",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Student Deadline",
+                "verbose_name_plural": "Student Deadlines",
+                "indexes": [
+                    models.Index(
+                        fields=["student", "course", "deadline"],
+                        name="student_deadline_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="studentdeadline",
+            constraint=models.UniqueConstraint(
+                fields=("student", "assignment"), name="unique_student_deadline"
+            ),
+        ),
+        migrations.RunPython(backfill_student_deadlines, migrations.RunPython.noop),
+    ]
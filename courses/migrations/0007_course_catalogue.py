@@ -0,0 +1,110 @@
+# Generated by Django 5.0 on 2026-10-18 18:05
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Avg, Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils.html import strip_tags
+
+SEARCH_TABLE = "courses_course_search"
+
+
+def backfill_course_ratings(apps, schema_editor):
+    Course = apps.get_model("courses", "Course")
+    Feedback = apps.get_model("courses", "Feedback")
+
+    ratings = (
+        Feedback.objects.filter(course_id=OuterRef("pk"))
+        .order_by()
+        .values("course_id")
+    )
+    Course.objects.update(
+        rating_count=Coalesce(
+            Subquery(ratings.annotate(count=Count("id")).values("count")), Value(0)
+        ),
+        rating_average=Subquery(
+            ratings.annotate(average=Avg("course_rating")).values("average")
+        ),
+    )
+
+
+def create_search_index(apps, schema_editor):
+    # The full-text index is a SQLite FTS5 table, other databases fall back to
+    # substring lookups
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    Course = apps.get_model("courses", "Course")
+
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        "name, summary, description, teacher_name, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    with schema_editor.connection.cursor() as cursor:
+        for course in Course.objects.select_related("teacher").iterator():
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} "
+                "(rowid, name, summary, description, teacher_name) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [
+                    course.pk,
+                    course.name,
+                    course.summary,
+                    strip_tags(course.description or ""),
+                    f"{course.teacher.first_name} {course.teacher.last_name}",
+                ],
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0006_studentdeadline"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="rating_average",
+            field=models.FloatField(
+                blank=True, editable=False, null=True, verbose_name="Average Rating"
+            ),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="rating_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Number of Ratings"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["status", "start_date", "id"], name="course_start_keyset_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["status", "rating_average", "id"],
+                name="course_rating_keyset_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                fields=["status", "name", "id"], name="course_name_keyset_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_course_ratings, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
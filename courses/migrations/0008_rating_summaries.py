@@ -0,0 +1,113 @@
+# Generated by Django 5.0 on 2026-10-18 18:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+STAR_FIELDS = ["one_star", "two_stars", "three_stars", "four_stars", "five_stars"]
+
+
+def summarize(feedbacks, field):
+    return feedbacks.aggregate(
+        count=Count("id"),
+        total=Sum(field, default=0),
+        **{
+            star_field: Count("id", filter=Q(**{field: stars}))
+            for stars, star_field in enumerate(STAR_FIELDS, start=1)
+        },
+    )
+
+
+def backfill_rating_summaries(apps, schema_editor):
+    Course = apps.get_model("courses", "Course")
+    Feedback = apps.get_model("courses", "Feedback")
+    CourseRatingSummary = apps.get_model("courses", "CourseRatingSummary")
+    TeacherRatingSummary = apps.get_model("courses", "TeacherRatingSummary")
+
+    course_ids = Feedback.objects.values_list("course_id", flat=True).distinct()
+    CourseRatingSummary.objects.bulk_create(
+        CourseRatingSummary(
+            course_id=course_id,
+            **summarize(Feedback.objects.filter(course_id=course_id), "course_rating"),
+        )
+        for course_id in course_ids
+    )
+
+    teacher_ids = Course.objects.filter(id__in=course_ids).values_list(
+        "teacher_id", flat=True
+    )
+    TeacherRatingSummary.objects.bulk_create(
+        TeacherRatingSummary(
+            teacher_id=teacher_id,
+            **summarize(
+                Feedback.objects.filter(course__teacher_id=teacher_id),
+                "teacher_rating",
+            ),
+        )
+        for teacher_id in set(teacher_ids)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0007_course_catalogue"),
+        ("users", "0002_user_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CourseRatingSummary",
+            fields=[
+                ("count", models.PositiveIntegerField(default=0)),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("one_star", models.PositiveIntegerField(default=0)),
+                ("two_stars", models.PositiveIntegerField(default=0)),
+                ("three_stars", models.PositiveIntegerField(default=0)),
+                ("four_stars", models.PositiveIntegerField(default=0)),
+                ("five_stars", models.PositiveIntegerField(default=0)),
+                (
+                    "course",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rating_summary",
+                        serialize=False,
+                        to="courses.course",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Course Rating Summary",
+                "verbose_name_plural": "Course Rating Summaries",
+            },
+        ),
+        migrations.CreateModel(
+            name="TeacherRatingSummary",
+            fields=[
+                ("count", models.PositiveIntegerField(default=0)),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("one_star", models.PositiveIntegerField(default=0)),
+                ("two_stars", models.PositiveIntegerField(default=0)),
+                ("three_stars", models.PositiveIntegerField(default=0)),
+                ("four_stars", models.PositiveIntegerField(default=0)),
+                ("five_stars", models.PositiveIntegerField(default=0)),
+                (
+                    "teacher",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="teacher_rating_summary",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Teacher Rating Summary",
+                "verbose_name_plural": "Teacher Rating Summaries",
+            },
+        ),
+        migrations.RunPython(backfill_rating_summaries, migrations.RunPython.noop),
+    ]
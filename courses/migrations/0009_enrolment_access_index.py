@@ -0,0 +1,21 @@
+# Generated by Django 5.0 on 2026-10-18 18:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0008_rating_summaries"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="enrolment",
+            index=models.Index(
+                fields=["student", "course", "is_banned"], name="enrolment_access_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# The search vector of courses.catalogue, PostgreSQL only: SQLite has the FTS5 table
+# of 0007_course_catalogue
+SEARCH_VECTOR = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || "
+    "coalesce(summary, '') || ' ' || coalesce(description, ''))"
+)
+
+
+def create_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS courses_course_search_vector_idx "
+        f"ON courses_course USING gin (({SEARCH_VECTOR}))"
+    )
+
+
+def drop_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute("DROP INDEX IF EXISTS courses_course_search_vector_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0009_enrolment_access_index"),
+        ("users", "0003_user_search_vector"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_vector_index, drop_vector_index),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-18 19:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0010_course_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="materialupload",
+            name="job",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="uploads",
+                to="courses.materialuploadjob",
+            ),
+        ),
+    ]
@@ -1,9 +1,11 @@
 import os
+import uuid
 from django.db import models
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.utils.text import slugify
+from django.db.models.signals import post_delete, post_save
 from ckeditor.fields import RichTextField
 from django.core.validators import (
     MinValueValidator,
@@ -11,6 +13,22 @@ from django.core.validators import (
     FileExtensionValidator,
 )
 
+from courses.signals import (
+    index_course,
+    index_teacher_courses,
+    invalidate_course_weeks,
+    invalidate_enrolment_access,
+    invalidate_material_week,
+    release_material_blob,
+    remove_enrolment_deadlines,
+    remove_feedback_ratings,
+    sync_assignment_deadlines,
+    sync_course_deadlines,
+    sync_enrolment_deadlines,
+    sync_submission_deadline,
+    unindex_course,
+    update_feedback_ratings,
+)
 from users.models import User
 
 
@@ -25,6 +43,8 @@ class Course(models.Model):
         teacher (ForeignKey): Relationship to the User model representing the teacher.
         duration_weeks (PositiveIntegerField): The duration of the course in weeks.
         status (str): Indicates whether the course is in draft or official mode.
+        rating_count (PositiveIntegerField): The number of feedbacks of the course.
+        rating_average (FloatField): The average course rating of the feedbacks.
 
     """
 
@@ -52,6 +72,14 @@ class Course(models.Model):
 
     start_date = models.DateTimeField(default=timezone.now)
 
+    # Denormalized from the feedbacks, so the catalogue can filter and sort on them
+    rating_count = models.PositiveIntegerField(
+        _("Number of Ratings"), default=0, editable=False
+    )
+    rating_average = models.FloatField(
+        _("Average Rating"), null=True, blank=True, editable=False
+    )
+
     def __str__(self):
         return self.name
 
@@ -69,6 +97,19 @@ class Course(models.Model):
         verbose_name = _("Course")
         verbose_name_plural = _("Courses")
         unique_together = ["name", "teacher"]
+        indexes = [
+            # keyset pagination of the catalogue, see courses.catalogue
+            models.Index(
+                fields=["status", "start_date", "id"], name="course_start_keyset_idx"
+            ),
+            models.Index(
+                fields=["status", "rating_average", "id"],
+                name="course_rating_keyset_idx",
+            ),
+            models.Index(
+                fields=["status", "name", "id"], name="course_name_keyset_idx"
+            ),
+        ]
 
     def get_absolute_url(self):
         return reverse("official", kwargs={"course_id": self.pk})
@@ -94,6 +135,51 @@ def material_upload_path(instance, filename):
     return os.path.join("materials", f"{course_id}-{course_name}", filename)
 
 
+def blob_upload_path(instance, filename):
+    """
+    Function to determine the upload path for deduplicated material files.
+
+    Args:
+        instance: The MaterialBlob instance being uploaded.
+        filename (str): The original filename of the file being uploaded.
+
+    Returns:
+        str: The upload path for the file, addressed by its SHA-256 digest.
+
+    """
+    return os.path.join(
+        "materials", "blobs", instance.sha256[:2], instance.sha256, filename
+    )
+
+
+class MaterialBlob(models.Model):
+    """
+    Model representing the bytes of a material file, stored once whatever the
+    number of course materials using them.
+
+    Attributes:
+        sha256 (str): The SHA-256 hex digest of the file, its content address.
+        file (FileField): The stored file.
+        size (PositiveBigIntegerField): The size of the file in bytes.
+        ref_count (PositiveIntegerField): The number of course materials using the
+            file, which is deleted with the blob once no material uses it.
+
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to=blob_upload_path, max_length=255)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Material Blob")
+        verbose_name_plural = _("Material Blobs")
+
+    def __str__(self):
+        return f"{self.sha256} ({self.ref_count} references)"
+
+
 class CourseMaterial(models.Model):
     """
     Model representing the linking of course materials to weeks of a course.
@@ -102,14 +188,26 @@ class CourseMaterial(models.Model):
         course (ForeignKey): The course to which the material is linked.
         materials (ManyToManyField): Relationship to Material model.
         week_number (PositiveIntegerField): The week number to which the materials are linked.
+        blob (ForeignKey): The deduplicated file of the material.
+        name (str): The name of the uploaded file, shared blobs keep the name of
+            their first upload.
 
     """
 
     course = models.ForeignKey(
         Course, on_delete=models.CASCADE, related_name="course_materials"
     )
-    material = models.FileField(upload_to=material_upload_path)
+    material = models.FileField(upload_to=material_upload_path, max_length=255)
     week_number = models.PositiveIntegerField(_("Week Number"))
+    # materials uploaded since content-addressed storage point at the file of a blob
+    blob = models.ForeignKey(
+        MaterialBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="course_materials",
+    )
+    name = models.CharField(max_length=255, blank=True)
 
     class Meta:
         verbose_name = _("Course Material")
@@ -123,7 +221,148 @@ class CourseMaterial(models.Model):
         """
         Method to return the base name of the uploaded file.
         """
-        return os.path.basename(self.material.name)
+        return self.name or os.path.basename(self.material.name)
+
+
+class MaterialUpload(models.Model):
+    """
+    Model representing a chunked, resumable upload of a course material file.
+
+    Chunks are written straight to the final storage location of the material, the
+    course material is only created once every byte has been received.
+
+    Attributes:
+        id (UUIDField): The unguessable identifier of the upload.
+        course (ForeignKey): The course the material is uploaded to.
+        week_number (PositiveIntegerField): The week the material is uploaded to.
+        uploaded_by (ForeignKey): The teacher uploading the material.
+        filename (str): The original name of the uploaded file.
+        storage_name (str): The name of the file in the default storage.
+        size (PositiveBigIntegerField): The total size of the file in bytes.
+        received_bytes (PositiveBigIntegerField): The bytes received so far, which is
+            the offset of the next chunk.
+        sha256 (str): The optional SHA-256 hex digest of the whole file.
+        status (str): Whether the upload is pending, complete or failed.
+        material (ForeignKey): The course material created by the upload.
+        job (ForeignKey): The job which reported the complete upload, so it is only
+            reported once.
+
+    """
+
+    PENDING = "pending"
+    COMPLETE = "complete"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, _("Pending")),
+        (COMPLETE, _("Complete")),
+        (FAILED, _("Failed")),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="material_uploads"
+    )
+    week_number = models.PositiveIntegerField(_("Week Number"))
+    uploaded_by = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="material_uploads"
+    )
+    filename = models.CharField(max_length=255)
+    storage_name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received_bytes = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(
+        _("Status"), max_length=20, choices=STATUS_CHOICES, default=PENDING
+    )
+    material = models.ForeignKey(
+        CourseMaterial, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    job = models.ForeignKey(
+        "MaterialUploadJob",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="uploads",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Material Upload")
+        verbose_name_plural = _("Material Uploads")
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.size} bytes)"
+
+
+class MaterialUploadJob(models.Model):
+    """
+    Model representing the background processing of a batch of uploaded materials.
+
+    The upload view returns as soon as the job is queued, the Celery task records
+    its progress here after each file so it can be polled.
+
+    Attributes:
+        id (UUIDField): The identifier of the job returned to the client.
+        course (ForeignKey): The course the materials are uploaded to.
+        week_number (PositiveIntegerField): The week the materials are uploaded to.
+        created_by (ForeignKey): The teacher who uploaded the materials.
+        total_files (PositiveIntegerField): The number of files in the batch.
+        processed_files (PositiveIntegerField): The number of files processed so far.
+        num_of_materials (PositiveIntegerField): The number of materials created.
+        failed_materials (JSONField): The name and error message of each failed file.
+        status (str): Whether the job is pending, running, complete or failed.
+
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETE = "complete"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, _("Pending")),
+        (RUNNING, _("Running")),
+        (COMPLETE, _("Complete")),
+        (FAILED, _("Failed")),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="material_upload_jobs"
+    )
+    week_number = models.PositiveIntegerField(_("Week Number"))
+    created_by = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="material_upload_jobs"
+    )
+    total_files = models.PositiveIntegerField()
+    processed_files = models.PositiveIntegerField(default=0)
+    num_of_materials = models.PositiveIntegerField(default=0)
+    failed_materials = models.JSONField(default=list, blank=True)
+    status = models.CharField(
+        _("Status"), max_length=20, choices=STATUS_CHOICES, default=PENDING
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Material Upload Job")
+        verbose_name_plural = _("Material Upload Jobs")
+
+    def __str__(self):
+        return f"{self.course.name} week {self.week_number}: {self.status}"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.COMPLETE, self.FAILED)
+
+    @property
+    def progress(self):
+        """
+        Returns the percentage of processed files.
+        """
+        if not self.total_files:
+            return 100
+        return round(100 * self.processed_files / self.total_files)
 
 
 class Assignment(models.Model):
@@ -280,6 +519,108 @@ class Feedback(models.Model):
     def __str__(self):
         return f"Feedback for {self.course} by {self.user}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # the ratings as loaded, so saving can update the rating summaries by delta
+        instance._loaded_ratings = (
+            instance.__dict__.get("course_id"),
+            instance.__dict__.get("course_rating"),
+            instance.__dict__.get("teacher_rating"),
+        )
+        return instance
+
+
+class RatingSummary(models.Model):
+    """
+    Abstract model of the materialized ratings of many feedbacks, updated
+    incrementally as feedbacks are saved and deleted.
+
+    Attributes:
+        count (PositiveIntegerField): The number of ratings.
+        total (PositiveIntegerField): The sum of the ratings.
+        one_star (PositiveIntegerField): The number of 1 star ratings, and so on up
+            to five_stars.
+    """
+
+    STAR_FIELDS = ["one_star", "two_stars", "three_stars", "four_stars", "five_stars"]
+
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    one_star = models.PositiveIntegerField(default=0)
+    two_stars = models.PositiveIntegerField(default=0)
+    three_stars = models.PositiveIntegerField(default=0)
+    four_stars = models.PositiveIntegerField(default=0)
+    five_stars = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def average(self):
+        """
+        Returns the average rating, or None without ratings.
+        """
+        return self.total / self.count if self.count else None
+
+    @property
+    def histogram(self):
+        """
+        Returns the number and percentage of ratings of each star, 5 stars first.
+
+        :rtype: list[dict]
+        """
+        return [
+            {
+                "stars": stars,
+                "count": getattr(self, field),
+                "percent": round(100 * getattr(self, field) / self.count)
+                if self.count
+                else 0,
+            }
+            for stars, field in reversed(list(enumerate(self.STAR_FIELDS, start=1)))
+        ]
+
+
+class CourseRatingSummary(RatingSummary):
+    """
+    Materialized course ratings of the feedbacks of a course.
+    """
+
+    course = models.OneToOneField(
+        Course,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="rating_summary",
+    )
+
+    class Meta:
+        verbose_name = _("Course Rating Summary")
+        verbose_name_plural = _("Course Rating Summaries")
+
+    def __str__(self):
+        return f"{self.course}: {self.count} ratings"
+
+
+class TeacherRatingSummary(RatingSummary):
+    """
+    Materialized teacher ratings of the feedbacks of every course of a teacher.
+    """
+
+    teacher = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="teacher_rating_summary",
+    )
+
+    class Meta:
+        verbose_name = _("Teacher Rating Summary")
+        verbose_name_plural = _("Teacher Rating Summaries")
+
+    def __str__(self):
+        return f"{self.teacher}: {self.count} ratings"
+
 
 class Enrolment(models.Model):
     """
@@ -311,3 +652,92 @@ class Enrolment(models.Model):
     class Meta:
         verbose_name = _("Enrolment")
         verbose_name_plural = _("Enrolments")
+        indexes = [
+            # covers the access check of a student to a course, see users.access
+            models.Index(
+                fields=["student", "course", "is_banned"], name="enrolment_access_idx"
+            )
+        ]
+
+
+class StudentDeadline(models.Model):
+    """
+    Denormalized row of the student dashboard: one assignment of a course the
+    student is enrolled in, with its deadline and the student's latest submission.
+
+    The rows are maintained by signals on Course, Assignment, AssignmentSubmission
+    and Enrolment, so the home page reads the deadlines of a student with one
+    indexed query.
+
+    Attributes:
+        student (ForeignKey): The enrolled student.
+        course (ForeignKey): The course of the assignment.
+        assignment (ForeignKey): The assignment.
+        assignment_name (str): The name of the assignment.
+        week_number (PositiveIntegerField): The week of the assignment.
+        deadline (DateTimeField): The deadline of the assignment.
+        submitted_at (DateTimeField): When the student last submitted the assignment.
+    """
+
+    student = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="deadlines"
+    )
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="+")
+    assignment = models.ForeignKey(
+        Assignment, on_delete=models.CASCADE, related_name="student_deadlines"
+    )
+    assignment_name = models.CharField(max_length=100)
+    week_number = models.PositiveIntegerField(_("Week Number"))
+    deadline = models.DateTimeField(null=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Student Deadline")
+        verbose_name_plural = _("Student Deadlines")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["student", "assignment"], name="unique_student_deadline"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["student", "course", "deadline"],
+                name="student_deadline_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.assignment_name}: {self.deadline}"
+
+
+# Keep the reference counts of the deduplicated material files in sync
+post_delete.connect(release_material_blob, sender=CourseMaterial)
+
+# Keep the student dashboard read model in sync
+post_save.connect(sync_course_deadlines, sender=Course)
+post_save.connect(sync_assignment_deadlines, sender=Assignment)
+post_save.connect(sync_submission_deadline, sender=AssignmentSubmission)
+post_delete.connect(sync_submission_deadline, sender=AssignmentSubmission)
+post_save.connect(sync_enrolment_deadlines, sender=Enrolment)
+post_delete.connect(remove_enrolment_deadlines, sender=Enrolment)
+
+# Keep the course catalogue search index in sync
+post_save.connect(index_course, sender=Course)
+post_delete.connect(unindex_course, sender=Course)
+post_save.connect(index_teacher_courses, sender=User)
+
+# Keep the materialized course and teacher ratings in sync
+post_save.connect(update_feedback_ratings, sender=Feedback)
+post_delete.connect(remove_feedback_ratings, sender=Feedback)
+
+# Invalidate the cached content of the course weeks
+post_save.connect(invalidate_material_week, sender=CourseMaterial)
+post_delete.connect(invalidate_material_week, sender=CourseMaterial)
+post_save.connect(invalidate_material_week, sender=Assignment)
+post_delete.connect(invalidate_material_week, sender=Assignment)
+post_save.connect(invalidate_course_weeks, sender=Course)
+post_delete.connect(invalidate_course_weeks, sender=Course)
+
+# Invalidate the cached access of the enrolled students
+post_save.connect(invalidate_enrolment_access, sender=Enrolment)
+post_delete.connect(invalidate_enrolment_access, sender=Enrolment)
@@ -0,0 +1,223 @@
+import logging
+
+from django.core.paginator import Paginator
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from courses.models import (
+    Course,
+    CourseRatingSummary,
+    Feedback,
+    RatingSummary,
+    TeacherRatingSummary,
+)
+
+logger = logging.getLogger(__name__)
+
+FEEDBACKS_PER_PAGE = 10
+
+
+def update_summary(model, pk, removed=None, added=None):
+    """
+    Moves one rating of a summary, in a single UPDATE.
+
+    :param model: The rating summary model.
+    :type model: type[RatingSummary]
+    :param pk: The primary key of the summary, i.e. its course or teacher ID.
+    :type pk: int
+    :param removed: The rating to remove, if any.
+    :type removed: int or None
+    :param added: The rating to add, if any. The summary is created if needed.
+    :type added: int or None
+    """
+    if removed == added:
+        return
+    if added is not None:
+        model.objects.bulk_create([model(pk=pk)], ignore_conflicts=True)
+
+    changes = {}
+    count = (added is not None) - (removed is not None)
+    if count:
+        changes["count"] = F("count") + count
+    changes["total"] = F("total") + (added or 0) - (removed or 0)
+    if removed is not None:
+        field = RatingSummary.STAR_FIELDS[removed - 1]
+        changes[field] = F(field) - 1
+    if added is not None:
+        field = RatingSummary.STAR_FIELDS[added - 1]
+        changes[field] = F(field) + 1
+
+    model.objects.filter(pk=pk).update(**changes)
+
+
+def sync_course_rating(course_id):
+    """
+    Copies the count and average of the course ratings summary onto the course, in
+    a single UPDATE, for the catalogue to filter and sort on.
+
+    :param course_id: The ID of the course.
+    :type course_id: int
+    """
+    summary = CourseRatingSummary.objects.filter(course_id=OuterRef("pk"))
+    Course.objects.filter(pk=course_id).update(
+        rating_count=Coalesce(Subquery(summary.values("count")), Value(0)),
+        rating_average=Subquery(
+            summary.filter(count__gt=0).values(
+                average=F("total") * 1.0 / F("count")
+            )
+        ),
+    )
+
+
+def apply_feedback(feedback, created, previous=None):
+    """
+    Applies the ratings of a saved feedback to the rating summaries of its course
+    and teacher, by delta from its previous ratings.
+
+    :param feedback: The saved feedback.
+    :type feedback: Feedback
+    :param created: Whether the feedback was created.
+    :type created: bool
+    :param previous: The ``(course_id, course_rating, teacher_rating)`` of an
+        updated feedback as it was loaded.
+    :type previous: tuple or None
+    """
+    if not created and previous is None:
+        # updated without knowing its previous ratings
+        rebuild_rating_summaries(courses=[feedback.course_id])
+    else:
+        course_id, course_rating, teacher_rating = (
+            (None, None, None) if created else previous
+        )
+        if course_id is not None and course_id != feedback.course_id:
+            remove_feedback_ratings(course_id, course_rating, teacher_rating)
+            course_rating = teacher_rating = None
+
+        update_summary(
+            CourseRatingSummary,
+            feedback.course_id,
+            removed=course_rating,
+            added=feedback.course_rating,
+        )
+        update_summary(
+            TeacherRatingSummary,
+            Course.objects.values_list("teacher_id", flat=True).get(
+                pk=feedback.course_id
+            ),
+            removed=teacher_rating,
+            added=feedback.teacher_rating,
+        )
+        sync_course_rating(feedback.course_id)
+
+    feedback._loaded_ratings = (
+        feedback.course_id,
+        feedback.course_rating,
+        feedback.teacher_rating,
+    )
+
+
+def remove_feedback_ratings(course_id, course_rating, teacher_rating):
+    """
+    Removes one feedback's ratings from the summaries of a course and its teacher.
+    """
+    teacher_id = Course.objects.filter(pk=course_id).values_list(
+        "teacher_id", flat=True
+    )
+    update_summary(CourseRatingSummary, course_id, removed=course_rating)
+    if teacher_id:
+        update_summary(TeacherRatingSummary, teacher_id[0], removed=teacher_rating)
+    sync_course_rating(course_id)
+
+
+def remove_feedback(feedback):
+    """
+    Removes the ratings of a deleted feedback from the rating summaries of its
+    course and teacher. Nothing is created, so this is safe while the course or
+    teacher is being deleted.
+
+    :param feedback: The deleted feedback.
+    :type feedback: Feedback
+    """
+    course_id, course_rating, teacher_rating = getattr(
+        feedback,
+        "_loaded_ratings",
+        (feedback.course_id, feedback.course_rating, feedback.teacher_rating),
+    )
+    remove_feedback_ratings(course_id, course_rating, teacher_rating)
+
+
+def summary_values(feedbacks, field):
+    """
+    Aggregates the ratings of feedbacks into the fields of a rating summary.
+
+    :rtype: dict
+    """
+    return feedbacks.aggregate(
+        count=Count("id"),
+        total=Sum(field, default=0),
+        **{
+            star_field: Count("id", filter=Q(**{field: stars}))
+            for stars, star_field in enumerate(RatingSummary.STAR_FIELDS, start=1)
+        },
+    )
+
+
+def rebuild_rating_summaries(courses=None):
+    """
+    Recomputes the rating summaries from the feedbacks, e.g. after a bulk import
+    that bypassed the signals.
+
+    :param courses: The IDs of the courses to rebuild, with their teachers,
+        defaults to every course.
+    :type courses: list[int] or None
+
+    :return: The number of rebuilt course summaries.
+    :rtype: int
+    """
+    course_ids = courses
+    if course_ids is None:
+        course_ids = list(Course.objects.values_list("id", flat=True))
+    teacher_ids = set(
+        Course.objects.filter(id__in=course_ids).values_list("teacher_id", flat=True)
+    )
+
+    for course_id in course_ids:
+        CourseRatingSummary.objects.update_or_create(
+            course_id=course_id,
+            defaults=summary_values(
+                Feedback.objects.filter(course_id=course_id), "course_rating"
+            ),
+        )
+        sync_course_rating(course_id)
+
+    for teacher_id in teacher_ids:
+        TeacherRatingSummary.objects.update_or_create(
+            teacher_id=teacher_id,
+            defaults=summary_values(
+                Feedback.objects.filter(course__teacher_id=teacher_id),
+                "teacher_rating",
+            ),
+        )
+
+    logger.info("Rebuilt the rating summaries of %d courses", len(course_ids))
+    return len(course_ids)
+
+
+def get_feedback_page(course_id, page_number=1):
+    """
+    Returns a page of the feedbacks of a course, newest first, with their users.
+
+    :param course_id: The ID of the course.
+    :type course_id: int
+    :param page_number: The page number, the last page if it is out of range.
+    :type page_number: int or str
+
+    :return: The page of feedbacks.
+    :rtype: django.core.paginator.Page
+    """
+    feedbacks = (
+        Feedback.objects.filter(course_id=course_id)
+        .select_related("user")
+        .order_by("-created_at", "-id")
+    )
+    return Paginator(feedbacks, FEEDBACKS_PER_PAGE).get_page(page_number)
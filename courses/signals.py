@@ -0,0 +1,150 @@
+def release_material_blob(sender, instance, **kwargs):
+    """
+    Drops the reference of a deleted course material to its blob, so the file is
+    deleted once no material uses it. Also runs when the course is deleted.
+    """
+    from courses.blobs import release_blob
+
+    if instance.blob_id:
+        release_blob(instance.blob_id)
+
+
+def sync_course_deadlines(sender, instance, created, raw=False, **kwargs):
+    """
+    Refreshes the dashboard deadlines of a course whose start date may have changed.
+    """
+    from courses.dashboard import sync_course
+
+    if not created and not raw:
+        sync_course(instance)
+
+
+def sync_assignment_deadlines(sender, instance, raw=False, **kwargs):
+    """
+    Adds or refreshes a saved assignment on the dashboard of the enrolled students.
+    """
+    from courses.dashboard import sync_assignment
+
+    if not raw:
+        sync_assignment(instance)
+
+
+def sync_submission_deadline(sender, instance, raw=False, **kwargs):
+    """
+    Refreshes the submission status of a student on their dashboard when a
+    submission is saved or deleted.
+    """
+    from courses.dashboard import sync_submission
+
+    if not raw:
+        sync_submission(instance.student_id, instance.assignment_id)
+
+
+def sync_enrolment_deadlines(sender, instance, created, raw=False, **kwargs):
+    """
+    Adds the assignments of a course to the dashboard of a newly enrolled student.
+    """
+    from courses.dashboard import sync_enrolment
+
+    if created and not raw:
+        sync_enrolment(instance)
+
+
+def remove_enrolment_deadlines(sender, instance, **kwargs):
+    """
+    Removes the assignments of a course from the dashboard of an unenrolled student.
+    """
+    from courses.dashboard import remove_enrolment
+
+    remove_enrolment(instance)
+
+
+def index_course(sender, instance, raw=False, **kwargs):
+    """
+    Adds a saved course to the catalogue search index, or refreshes it.
+    """
+    from courses.catalogue import index_course
+
+    if not raw:
+        index_course(instance)
+
+
+def unindex_course(sender, instance, **kwargs):
+    """
+    Removes a deleted course from the catalogue search index.
+    """
+    from courses.catalogue import unindex_course
+
+    unindex_course(instance.pk)
+
+
+def index_teacher_courses(
+    sender, instance, created, raw=False, update_fields=None, **kwargs
+):
+    """
+    Refreshes the teacher name in the catalogue search index of their courses.
+    """
+    from courses.catalogue import index_course
+
+    if created or raw or instance.user_type != instance.TEACHER:
+        return
+    if update_fields and not {"first_name", "last_name"} & set(update_fields):
+        return
+    for course in instance.courses_taught.all():
+        course.teacher = instance
+        index_course(course)
+
+
+def update_feedback_ratings(sender, instance, created, raw=False, **kwargs):
+    """
+    Applies the ratings of a saved feedback to the course and teacher rating
+    summaries, replacing its previous ratings if it was updated.
+    """
+    from courses.ratings import apply_feedback
+
+    if not raw:
+        apply_feedback(instance, created, getattr(instance, "_loaded_ratings", None))
+
+
+def remove_feedback_ratings(sender, instance, **kwargs):
+    """
+    Removes the ratings of a deleted feedback from the course and teacher rating
+    summaries.
+    """
+    from courses.ratings import remove_feedback
+
+    remove_feedback(instance)
+
+
+def invalidate_material_week(sender, instance, created=True, **kwargs):
+    """
+    Invalidates the cached content of the week of a course material or assignment
+    that was created or deleted, or of every week of its course when it was changed,
+    as it may have moved to another week.
+    """
+    from courses.week_content import invalidate_course_content, invalidate_week_content
+
+    if created:
+        invalidate_week_content(instance.course_id, instance.week_number)
+    else:
+        invalidate_course_content(instance.course_id)
+
+
+def invalidate_course_weeks(sender, instance, **kwargs):
+    """
+    Invalidates the cached content of every week of a course that was saved, whose
+    start date or teacher may have changed, or deleted.
+    """
+    from courses.week_content import invalidate_course_content
+
+    invalidate_course_content(instance.pk)
+
+
+def invalidate_enrolment_access(sender, instance, **kwargs):
+    """
+    Invalidates the cached access of a student whose enrolment was saved or
+    deleted, including ban toggles.
+    """
+    from users.access import invalidate_user_access
+
+    invalidate_user_access(instance.student_id)
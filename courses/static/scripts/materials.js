@@ -53,6 +53,74 @@ if (materialsScriptLoaded === undefined) {
         loadingIndicator.classList.remove('visually-hidden')
     }
 
+    async function sha256Hex(data) {
+        const digest = await crypto.subtle.digest('SHA-256', data);
+        return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    // Uploads a file in chunks, resuming from the offset the server reports after an
+    // interrupted or rejected chunk. Returns the upload id.
+    async function uploadFileInChunks(file, startUrl, csrfToken) {
+        const body = new FormData();
+        body.append('filename', file.name);
+        body.append('size', file.size);
+        let response = await fetch(startUrl, { method: 'POST', body, headers: { 'X-CSRFToken': csrfToken } });
+        let upload = await response.json();
+        if (!response.ok) {
+            throw new Error(upload.error);
+        }
+
+        let retries = 3;
+        while (upload.status === 'pending') {
+            const chunk = await file.slice(upload.offset, upload.offset + upload.chunk_size).arrayBuffer();
+            response = await fetch(upload.upload_url, {
+                method: 'PUT',
+                body: chunk,
+                headers: {
+                    'X-CSRFToken': csrfToken,
+                    'Upload-Offset': upload.offset,
+                    'Upload-Checksum': await sha256Hex(chunk),
+                },
+            }).catch(() => null);
+
+            if (response && (response.ok || response.status === 409)) {
+                upload = { ...upload, ...await response.json() };
+            } else if (retries-- > 0) {
+                // resume from the offset the server actually received
+                response = await fetch(upload.upload_url);
+                upload = { ...upload, ...await response.json() };
+            } else {
+                throw new Error(`Failed to upload ${file.name}`);
+            }
+        }
+        return upload.upload_id;
+    }
+
+    let uploadForm = document.querySelector('#uploadForm');
+
+    if (uploadForm && window.crypto && crypto.subtle) {
+        // Large lecture videos are sent in resumable chunks instead of a single request
+        uploadForm.addEventListener('htmx:confirm', async function (event) {
+            event.preventDefault();
+
+            const csrfToken = uploadForm.querySelector('[name=csrfmiddlewaretoken]').value;
+            const uploadIds = [];
+            for (const file of uploadForm.querySelector('#id_material').files) {
+                try {
+                    uploadIds.push(await uploadFileInChunks(file, uploadForm.dataset.chunkedUploadUrl, csrfToken));
+                } catch (error) {
+                    console.error(error);
+                }
+            }
+
+            htmx.ajax('POST', uploadForm.dataset.chunkedFinishUrl, {
+                target: '#materials-container',
+                values: { upload_id: uploadIds },
+                headers: { 'X-CSRFToken': csrfToken },
+            });
+        });
+    }
+
     const saveBtn = document.getElementById('assignmentUploadBtn');
     // Add event listener to save button
     if (saveBtn) {
@@ -1,56 +1,289 @@
 import logging
+import math
 import os
-from celery import shared_task
+from celery import chord, shared_task
 
-from courses.models import CourseMaterial
-from django.core.files.uploadedfile import SimpleUploadedFile
+from courses.blobs import acquire_blob, create_course_material
+from courses.fanout import (
+    enrolment_email,
+    fan_out_course_event,
+    get_fanout_config,
+    materials_update_email,
+)
+from courses.models import Course, MaterialUploadJob
+from django.conf import settings
+from django.core.files import File
+from django.core.mail import send_mail
+from users.models import User
+from django.db.models import F
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task
-def upload_materials(course_id, week_number, temporary_paths):
+DEFAULT_MATERIAL_UPLOAD_TASKS = {
+    "FILES_PER_TASK": 1,  # smallest number of files handled by one subtask
+    "MAX_PARALLEL": 8,  # most subtasks queued for one upload
+    "MAX_RETRIES": 3,  # attempts of a failed file after the first one
+    "RETRY_DELAY": 5,  # seconds before a failed file is retried
+    "QUEUE": None,  # queue of the subtasks, to cap them with a dedicated worker
+}
+
+
+def get_upload_task_config():
+    """
+    Returns the material upload task configuration merged over the defaults.
+
+    :return: The ``MATERIAL_UPLOAD_TASKS`` setting merged over the defaults.
+    :rtype: dict
+    """
+    return {
+        **DEFAULT_MATERIAL_UPLOAD_TASKS,
+        **getattr(settings, "MATERIAL_UPLOAD_TASKS", {}),
+    }
+
+
+def batch_temporary_files(temporary_files):
+    """
+    Splits uploaded files into at most ``MAX_PARALLEL`` batches of at least
+    ``FILES_PER_TASK`` files.
+
+    :param temporary_files: List of temporary file paths and material names.
+    :type temporary_files: list[tuple[str, str]]
+
+    :return: The batches of temporary files.
+    :rtype: list[list[tuple[str, str]]]
+    """
+    config = get_upload_task_config()
+    batch_size = max(
+        config["FILES_PER_TASK"],
+        math.ceil(len(temporary_files) / config["MAX_PARALLEL"]),
+    )
+    return [
+        temporary_files[i : i + batch_size]
+        for i in range(0, len(temporary_files), batch_size)
+    ]
+
+
+def upload_materials(course_id, week_number, temporary_files, job_id=None):
     """
     Upload materials asynchronously.
 
+    The files are split by :func:`batch_temporary_files`, each batch is processed by
+    an :func:`upload_material_files` subtask. A chord collects the results of the
+    subtasks into :func:`aggregate_material_uploads` once they are all done.
+
     :param course_id: The ID of the course for which materials are being uploaded.
     :type course_id: int
     :param week_number: The week number for which materials are being uploaded.
     :type week_number: int
-    :param temporary_paths: List of temporary file paths.
-    :type temporary_paths: list[str]
+    :param temporary_files: List of temporary file paths and material names.
+    :type temporary_files: list[tuple[str, str]]
+    :param job_id: The ID of the MaterialUploadJob tracking the upload.
+    :type job_id: str or None
+
+    :return: The result of the aggregating task, the number of uploaded materials
+        and the failed uploads.
+    :rtype: celery.result.AsyncResult
     """
-    num_of_materials = 0  # Counter for successfully uploaded materials
-    failed_materials = []  # List to store failed uploads
+    header = [
+        upload_material_files.signature(
+            (course_id, week_number, batch),
+            {"job_id": job_id},
+            queue=get_upload_task_config()["QUEUE"],
+        )
+        for batch in batch_temporary_files(temporary_files)
+    ]
+    callback = aggregate_material_uploads.s(job_id=job_id)
+
+    if not header:
+        return callback.delay([])
+    return chord(header)(callback)
 
-    for temp_path in temporary_paths:
+
+@shared_task(bind=True)
+def upload_material_files(
+    self, course_id, week_number, temporary_files, job_id=None, results=None
+):
+    """
+    Creates the course materials of a batch of uploaded files.
+
+    A failed file is retried on its own, after ``RETRY_DELAY`` seconds and up to
+    ``MAX_RETRIES`` times, the files already uploaded are kept. Duplicates of a
+    material of the week are not retried. The temporary file
+    is deleted once uploaded or out of retries.
+
+    :param course_id: The ID of the course for which materials are being uploaded.
+    :type course_id: int
+    :param week_number: The week number for which materials are being uploaded.
+    :type week_number: int
+    :param temporary_files: List of temporary file paths and material names.
+    :type temporary_files: list[tuple[str, str]]
+    :param job_id: The ID of the MaterialUploadJob tracking the upload.
+    :type job_id: str or None
+    :param results: The results of the files uploaded by previous attempts.
+    :type results: list[dict] or None
+
+    :return: For each file, the ID of its course material or the upload error.
+    :rtype: list[dict]
+    """
+    config = get_upload_task_config()
+    results = results or []
+    retry_files = []
+    MaterialUploadJob.objects.filter(
+        pk=job_id, status=MaterialUploadJob.PENDING
+    ).update(status=MaterialUploadJob.RUNNING)
+
+    for temp_path, material_name in temporary_files:
         try:
-            # Read the file content
+            # Only files whose bytes are not stored yet are copied to the storage,
+            # in chunks instead of reading them into memory
             with open(temp_path, "rb") as file:
-                file_content = file.read()
-
-            # Create an InMemoryUploadedFile
-            uploaded_file = SimpleUploadedFile(
-                name=temp_path.split("/")[-1],  # Extract filename from the path
-                content=file_content,
-                content_type="application/octet-stream",  # Specify the content type
+                blob = acquire_blob(File(file), material_name)
+            course_material = create_course_material(
+                course_id, week_number, blob, material_name
             )
-
-            # Create a CourseMaterial object for the uploaded material
-            course_material = CourseMaterial.objects.create(
-                course_id=course_id,
-                week_number=week_number,
-                material=uploaded_file,
+            results.append(
+                {"material_name": material_name, "material_id": course_material.id}
             )
-            num_of_materials += 1
         except Exception as e:
-            # Log the error and add the failed material to the list
-            failed_materials.append(
-                {"material_path": temp_path, "error_message": str(e)}
-            )
             logger.error(f"Failed to upload material: {temp_path}. Error: {e}")
-    # Delete temporary files after processing
-    for temp_path in temporary_paths:
-        os.remove(temp_path)
+            if (
+                not isinstance(e, ValueError)
+                and self.request.retries < config["MAX_RETRIES"]
+                and os.path.exists(temp_path)
+            ):
+                retry_files.append((temp_path, material_name))
+                continue
+
+            # Add the failed material to the list
+            results.append(
+                {
+                    "material_name": material_name,
+                    "material_path": temp_path,
+                    "error_message": str(e),
+                }
+            )
+
+        # Delete the temporary file after processing
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        MaterialUploadJob.objects.filter(pk=job_id).update(
+            processed_files=F("processed_files") + 1
+        )
+
+    if retry_files:
+        raise self.retry(
+            args=(course_id, week_number, retry_files),
+            kwargs={"job_id": job_id, "results": results},
+            countdown=config["RETRY_DELAY"],
+        )
+    return results
+
 
+@shared_task
+def aggregate_material_uploads(batch_results, job_id=None):
+    """
+    Collects the results of the :func:`upload_material_files` subtasks of an upload.
+
+    :param batch_results: The results of each subtask.
+    :type batch_results: list[list[dict]]
+    :param job_id: The ID of the MaterialUploadJob tracking the upload.
+    :type job_id: str or None
+
+    :return: The number of uploaded materials and the failed uploads.
+    :rtype: tuple[int, list[dict]]
+    """
+    num_of_materials = 0  # Counter for successfully uploaded materials
+    failed_materials = []  # List to store failed uploads
+
+    for results in batch_results:
+        for result in results:
+            if "material_id" in result:
+                num_of_materials += 1
+            else:
+                failed_materials.append(result)
+
+    finish_upload_job(job_id, num_of_materials, failed_materials)
     return num_of_materials, failed_materials
+
+
+def finish_upload_job(job_id, num_of_materials, failed_materials):
+    """
+    Records the result of an upload job and queues the notification of the students
+    of the course if any material was uploaded.
+
+    A job is only finished once, a redelivered callback does not notify the students
+    again.
+    """
+    finished = MaterialUploadJob.objects.filter(
+        pk=job_id,
+        status__in=(MaterialUploadJob.PENDING, MaterialUploadJob.RUNNING),
+    ).update(
+        status=(
+            MaterialUploadJob.COMPLETE
+            if num_of_materials or not failed_materials
+            else MaterialUploadJob.FAILED
+        ),
+        num_of_materials=num_of_materials,
+        failed_materials=failed_materials,
+    )
+
+    if finished and num_of_materials > 0:
+        notify_material_upload.delay(job_id)
+
+
+@shared_task
+def notify_material_upload(job_id):
+    """
+    Notifies the students enrolled in the course of a finished upload job, by email
+    and with a django notification.
+
+    :param job_id: The ID of the finished MaterialUploadJob.
+    :type job_id: str
+
+    :return: The number of notifications and emails sent.
+    :rtype: dict[str, int]
+    """
+    job = MaterialUploadJob.objects.select_related("course").get(pk=job_id)
+    course, week_number = job.course, job.week_number
+
+    course_link = f'<a href="{course.get_absolute_url()}?week={week_number}">{course.name}</a>'
+    verb = f"<span class='fw-bold'>{job.num_of_materials} materials</span> added to {course_link}"
+    email_subject, email_body = materials_update_email(
+        course, week_number, job.num_of_materials
+    )
+
+    return fan_out_course_event(
+        course.id, job.created_by_id, verb, email_subject, email_body
+    )
+
+
+@shared_task
+def notify_course_students(
+    course_id, actor_id, verb, email_subject=None, email_body=None
+):
+    """
+    Notifies the students enrolled in a course, and emails them if an email is
+    given. See :func:`courses.fanout.fan_out_course_event`.
+
+    :return: The number of notifications and emails sent.
+    :rtype: dict[str, int]
+    """
+    return fan_out_course_event(course_id, actor_id, verb, email_subject, email_body)
+
+
+@shared_task
+def send_enrolment_email(user_id, course_id):
+    """
+    Sends the enrollment confirmation email of a user.
+
+    :param user_id: The ID of the enrolled user.
+    :type user_id: int
+    :param course_id: The ID of the course.
+    :type course_id: int
+    """
+    user = User.objects.get(pk=user_id)
+    course = Course.objects.select_related("teacher").get(pk=course_id)
+    subject, message = enrolment_email(user, course)
+
+    send_mail(subject, message, get_fanout_config()["FROM_EMAIL"], [user.email])
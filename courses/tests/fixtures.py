@@ -59,3 +59,13 @@ def courseMaterials(official_course):
 @pytest.fixture
 def assignmentMaterial(official_course):
     return AssignmentFactory.create(course=official_course, week_number=1)
+
+
+@pytest.fixture
+def celery_eager(monkeypatch):
+    """
+    Runs the Celery tasks queued by the code under test in process.
+    """
+    from eLearningApp.celery import app
+
+    monkeypatch.setattr(app.conf, "task_always_eager", True)
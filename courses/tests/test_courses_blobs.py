@@ -0,0 +1,81 @@
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from courses.blobs import acquire_blob, adopt_blob, create_course_material
+from courses.models import CourseMaterial, MaterialBlob
+from courses.tests.factories import CourseFactory
+from courses.tests.fixtures import official_course, teacher_user
+
+
+@pytest.mark.django_db
+class TestMaterialBlobs:
+    @pytest.fixture(autouse=True)
+    def setup(self, official_course, teacher_user, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+        self.course = official_course
+        self.teacher = teacher_user
+
+    def upload(self, content, name, course=None, week_number=1):
+        course = course or self.course
+        blob = acquire_blob(ContentFile(content), name)
+        return create_course_material(course.id, week_number, blob, name)
+
+    def test_identical_uploads_share_one_file(self):
+        other_course = CourseFactory(teacher=self.teacher)
+
+        first = self.upload(b"%PDF syllabus", "syllabus.pdf")
+        second = self.upload(b"%PDF syllabus", "syllabus v2.pdf", week_number=2)
+        third = self.upload(b"%PDF syllabus", "syllabus.pdf", course=other_course)
+
+        blob = MaterialBlob.objects.get()
+        assert blob.ref_count == 3
+        assert first.material.name == second.material.name == third.material.name
+        assert first.material.name == blob.file.name
+        assert blob.file.name.startswith(f"materials/blobs/{blob.sha256[:2]}/")
+        assert second.get_base_name() == "syllabus v2.pdf"
+        assert second.material.read() == b"%PDF syllabus"
+
+    def test_file_is_deleted_with_its_last_material(
+        self, django_capture_on_commit_callbacks
+    ):
+        first = self.upload(b"%PDF notes", "notes.pdf")
+        second = self.upload(b"%PDF notes", "notes.pdf", week_number=2)
+        name = first.material.name
+
+        client = APIClient()
+        client.force_login(self.teacher)
+        response = client.delete(reverse("delete_course_material", args=[first.id]))
+        assert response.status_code == 303
+        assert MaterialBlob.objects.get().ref_count == 1
+        assert default_storage.exists(name)
+
+        # course deletion cascades to the last material
+        with django_capture_on_commit_callbacks(execute=True):
+            self.course.delete()
+        assert not MaterialBlob.objects.exists()
+        assert not default_storage.exists(name)
+
+    def test_duplicate_in_the_same_week_is_rejected(self):
+        self.upload(b"%PDF slides", "slides.pdf")
+
+        with pytest.raises(ValueError):
+            self.upload(b"%PDF slides", "slides copy.pdf")
+
+        assert MaterialBlob.objects.get().ref_count == 1
+        assert CourseMaterial.objects.count() == 1
+
+    def test_adopted_file_is_dropped_when_bytes_exist(self):
+        material = self.upload(b"%PDF video", "video.mp4")
+        blob = MaterialBlob.objects.get()
+        storage_name = default_storage.save(
+            "materials/chunked/video.mp4", ContentFile(b"%PDF video")
+        )
+
+        assert adopt_blob(storage_name, blob.sha256, blob.size) == blob
+        assert not default_storage.exists(storage_name)
+        assert default_storage.exists(material.material.name)
+        blob.refresh_from_db()
+        assert blob.ref_count == 2
@@ -0,0 +1,167 @@
+import importlib
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from courses.catalogue import (
+    SEARCH_VECTOR,
+    InvalidCursor,
+    search_catalogue,
+    search_filter,
+)
+from courses.models import Course
+from courses.tests.factories import CourseFactory, FeedbackFactory
+from users.models import User
+from users.search import NAME_VECTOR
+from users.tests.factories import UserFactory
+from users.tests.fixtures import postgres_connection
+
+
+@pytest.mark.django_db
+class TestCourseCatalogue:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.now = timezone.now()
+        self.teacher = UserFactory(
+            user_type=User.TEACHER, first_name="Barbara", last_name="Liskov"
+        )
+
+    def course(self, **kwargs):
+        kwargs.setdefault("teacher", self.teacher)
+        kwargs.setdefault("status", Course.OFFICIAL)
+        kwargs.setdefault("start_date", self.now)
+        return CourseFactory(**kwargs)
+
+    def test_search_matches_text_and_teacher_name(self):
+        python = self.course(name="Python for beginners", summary="Variables")
+        databases = self.course(
+            name="Databases", description="<p>Relational <b>algebra</b></p>"
+        )
+        draft = self.course(name="Python internals", status=Course.DRAFT)
+
+        assert search_catalogue("pyth")["courses"] == [python]
+        assert search_catalogue("algebra")["courses"] == [databases]
+        assert set(search_catalogue("liskov")["courses"]) == {python, databases}
+        assert draft not in search_catalogue("python")["courses"]
+        assert search_catalogue("/??/")["courses"] == []
+
+    def test_renamed_teacher_is_reindexed(self):
+        course = self.course(name="Types")
+
+        self.teacher.last_name = "Hoare"
+        self.teacher.save()
+
+        assert search_catalogue("hoare")["courses"] == [course]
+        assert search_catalogue("liskov")["courses"] == []
+
+    def test_ratings_are_precomputed_from_feedbacks(self):
+        course = self.course()
+        FeedbackFactory(course=course, course_rating=5)
+        feedback = FeedbackFactory(course=course, course_rating=2)
+
+        course.refresh_from_db()
+        assert (course.rating_count, course.rating_average) == (2, 3.5)
+
+        feedback.delete()
+        course.refresh_from_db()
+        assert (course.rating_count, course.rating_average) == (1, 5.0)
+
+    def test_facets_filter_and_count(self):
+        short = self.course(duration_weeks=3)
+        long = self.course(duration_weeks=20, start_date=self.now.replace(year=2099))
+        FeedbackFactory(course=short, course_rating=4)
+
+        catalogue = search_catalogue(duration="short", now=self.now)
+        assert catalogue["courses"] == [short]
+
+        facets = {
+            name: {facet["value"]: facet["count"] for facet in values}
+            for name, values in catalogue["facets"].items()
+        }
+        # the counts of a facet ignore its own selection
+        assert facets["duration"] == {"short": 1, "medium": 0, "long": 1}
+        assert facets["start"] == {"started": 1, "next_30_days": 0, "later": 0}
+        assert facets["rating"] == {"4": 1, "3": 1, "2": 1}
+
+        assert search_catalogue(rating="4")["courses"] == [short]
+        assert search_catalogue(start="later", now=self.now)["courses"] == [long]
+
+    @pytest.mark.parametrize("sort", ["newest", "rating", "name"])
+    def test_keyset_pages_cover_every_course_once(self, sort):
+        courses = [
+            self.course(start_date=self.now - timezone.timedelta(days=i % 3))
+            for i in range(7)
+        ]
+        for course in courses[:4]:
+            FeedbackFactory(course=course, course_rating=course.id % 3 + 1)
+
+        seen, cursor = [], None
+        while True:
+            catalogue = search_catalogue(sort=sort, cursor=cursor, page_size=3)
+            seen += catalogue["courses"]
+            cursor = catalogue["next_cursor"]
+            if not cursor:
+                break
+
+        assert len(seen) == len(set(seen)) == 7
+        assert seen == search_catalogue(sort=sort, page_size=10)["courses"]
+
+    def test_invalid_cursor_is_rejected(self):
+        with pytest.raises(InvalidCursor):
+            search_catalogue(cursor="not-a-cursor")
+
+    def test_rebuild_restores_the_index(self):
+        course = self.course(name="Compilers")
+        Course.objects.filter(pk=course.pk).update(rating_count=9)
+
+        call_command("rebuild_course_catalogue")
+
+        course.refresh_from_db()
+        assert course.rating_count == 0
+        assert search_catalogue("compilers")["courses"] == [course]
+
+    def test_postgres_matches_words_through_the_vector_indexes(
+        self, postgres_connection
+    ):
+        courses = Course.objects.filter(search_filter("Python lis"))
+        sql, params = courses.query.get_compiler(
+            connection=postgres_connection
+        ).as_sql()
+
+        assert f"({SEARCH_VECTOR}) @@ to_tsquery('simple', %s)" in sql
+        assert f"({NAME_VECTOR}) @@ to_tsquery('simple', %s)" in sql
+        assert params == ("python:* & lis:*", "python:* & lis:*")
+        # the query must use the expressions of the indexes to use the indexes
+        courses_migration = importlib.import_module(
+            "courses.migrations.0010_course_search_vector"
+        )
+        users_migration = importlib.import_module(
+            "users.migrations.0003_user_search_vector"
+        )
+        assert SEARCH_VECTOR.replace("courses_course.", "") == (
+            courses_migration.SEARCH_VECTOR
+        )
+        assert NAME_VECTOR.replace("users_user.", "") == users_migration.NAME_VECTOR
+
+    def test_view_pages_with_a_fixed_number_of_queries(
+        self, client, settings, django_assert_max_num_queries
+    ):
+        settings.COURSE_CATALOGUE = {"PAGE_SIZE": 5}
+        for _ in range(8):
+            self.course(teacher=UserFactory(user_type=User.TEACHER))
+
+        # three facet counts and the page, with the teachers joined
+        with django_assert_max_num_queries(6):
+            response = client.get(reverse("courses"), {"sort": "name"})
+
+        assert response.status_code == 200
+        assert len(response.context["courses"]) == 5
+        assert "cursor=" in response.context["next_url"]
+
+        response = client.get(reverse("courses") + response.context["next_url"])
+        assert len(response.context["courses"]) == 3
+        assert response.context["next_url"] is None
+
+        assert client.get(reverse("courses"), {"cursor": "x"}).status_code == 400
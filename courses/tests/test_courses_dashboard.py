@@ -0,0 +1,121 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from courses.dashboard import get_student_dashboard, rebuild_student_deadlines
+from courses.models import StudentDeadline
+from courses.tests.factories import (
+    AssignmentFactory,
+    AssignmentSubmissionFactory,
+    EnrolmentFactory,
+)
+from courses.tests.fixtures import (
+    enrol,
+    enrolled_student_user,
+    not_enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+
+
+@pytest.mark.django_db
+class TestStudentDashboard:
+    @pytest.fixture(autouse=True)
+    def setup(self, official_course, enrolled_student_user, enrol):
+        self.course = official_course
+        self.student = enrolled_student_user
+
+    def test_assignments_are_added_to_enrolled_students(
+        self, not_enrolled_student_user
+    ):
+        assignment = AssignmentFactory(course=self.course, week_number=2)
+
+        deadline = StudentDeadline.objects.get()
+        assert deadline.student == self.student
+        assert deadline.assignment_name == assignment.name
+        assert deadline.deadline == assignment.get_assignment_deadline()
+        assert deadline.submitted_at is None
+
+    def test_enrolment_adds_and_removes_the_course_assignments(
+        self, not_enrolled_student_user
+    ):
+        AssignmentFactory.create_batch(2, course=self.course)
+
+        enrolment = EnrolmentFactory(
+            student=not_enrolled_student_user, course=self.course
+        )
+        assert not_enrolled_student_user.deadlines.count() == 2
+
+        enrolment.delete()
+        assert not not_enrolled_student_user.deadlines.exists()
+
+    def test_only_the_students_own_submission_is_shown(
+        self, not_enrolled_student_user
+    ):
+        assignment = AssignmentFactory(course=self.course)
+        EnrolmentFactory(student=not_enrolled_student_user, course=self.course)
+
+        submission = AssignmentSubmissionFactory(
+            assignment=assignment, student=self.student, submitted_at=timezone.now()
+        )
+
+        assert (
+            self.student.deadlines.get().submitted_at == submission.submitted_at
+        )
+        assert not_enrolled_student_user.deadlines.get().submitted_at is None
+
+        submission.delete()
+        assert self.student.deadlines.get().submitted_at is None
+
+    def test_course_start_date_moves_the_deadlines(self):
+        assignment = AssignmentFactory(course=self.course)
+
+        self.course.start_date += timezone.timedelta(days=7)
+        self.course.save()
+
+        assignment.refresh_from_db()
+        assert (
+            self.student.deadlines.get().deadline
+            == assignment.get_assignment_deadline()
+        )
+
+    def test_rebuild_restores_the_read_model(self):
+        assignment = AssignmentFactory(course=self.course)
+        AssignmentSubmissionFactory(
+            assignment=assignment, student=self.student, submitted_at=timezone.now()
+        )
+        StudentDeadline.objects.all().delete()
+
+        assert rebuild_student_deadlines() == 1
+        assert self.student.deadlines.get().submitted_at is not None
+
+        call_command("rebuild_student_deadlines", course=[self.course.id])
+        assert StudentDeadline.objects.count() == 1
+
+    def test_dashboard_groups_deadlines_by_course(self):
+        other_enrolment = EnrolmentFactory(student=self.student)
+        AssignmentFactory.create_batch(2, course=self.course)
+        AssignmentFactory(course=other_enrolment.course)
+
+        dashboard = get_student_dashboard(self.student)
+
+        assert {course: len(deadlines) for course, deadlines in dashboard.items()} == {
+            self.course: 2,
+            other_enrolment.course: 1,
+        }
+
+    def test_home_page_queries_do_not_grow_with_assignments(
+        self, client, django_assert_max_num_queries
+    ):
+        AssignmentFactory.create_batch(5, course=self.course)
+        for enrolment in EnrolmentFactory.create_batch(3, student=self.student):
+            AssignmentFactory.create_batch(3, course=enrolment.course)
+        client.force_login(self.student)
+
+        # session, user, status updates, courses, chats and deadlines
+        with django_assert_max_num_queries(8):
+            response = client.get(reverse("home"))
+
+        assert response.status_code == 200
+        assert sum(len(d) for d in response.context["grouped_deadlines"].values()) == 14
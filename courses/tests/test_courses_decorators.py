@@ -35,7 +35,9 @@ class TestUserDecorators:
         enrolment1 = EnrolmentFactory(student=student, is_banned=False)
         request.user = student
 
-        response = check_student_banned(lambda request: HttpResponse())(request)
+        response = check_student_banned(lambda request, course_id: HttpResponse())(
+            request, course_id=enrolment1.course_id
+        )
 
         assert response.status_code == 200
 
@@ -47,10 +49,26 @@ class TestUserDecorators:
         enrolment2 = EnrolmentFactory(student=student, is_banned=True)
         request.user = student
 
-        response = check_student_banned(lambda request: HttpResponse())(request)
+        response = check_student_banned(lambda request, course_id: HttpResponse())(
+            request, course_id=enrolment2.course_id
+        )
 
         assert response.status_code == 403
 
+    def test_check_student_banned_in_another_course(self):
+        request = self.request_factory.get("/")
+        student = self.student_user
+
+        # The student is enrolled in one course and banned from another
+        enrolment = EnrolmentFactory(student=student, is_banned=False)
+        banned_enrolment = EnrolmentFactory(student=student, is_banned=True)
+        request.user = student
+
+        view = check_student_banned(lambda request, course_id: HttpResponse())
+
+        assert view(request, course_id=enrolment.course_id).status_code == 200
+        assert view(request, course_id=banned_enrolment.course_id).status_code == 403
+
     def test_check_student_is_not_student(self):
         request = self.request_factory.get("/")
         teacher = self.teacher_user
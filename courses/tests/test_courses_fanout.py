@@ -0,0 +1,117 @@
+import pytest
+from django.core import mail
+from django.urls import reverse
+from notifications.models import Notification
+from rest_framework.test import APIClient
+
+from courses.fanout import fan_out_course_event, iter_enrolled_students
+from courses.models import Enrolment, MaterialUploadJob
+from courses.tasks import notify_material_upload
+from courses.tests.factories import EnrolmentFactory
+from courses.tests.fixtures import (
+    celery_eager,
+    enrol,
+    enrolled_student_user,
+    not_enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+from users.models import User
+from users.tests.factories import UserFactory
+
+
+@pytest.mark.django_db
+class TestCourseFanOut:
+    @pytest.fixture(autouse=True)
+    def setup(self, official_course, teacher_user, settings):
+        settings.COURSE_FANOUT = {"BATCH_SIZE": 2, "FROM_EMAIL": "courses@example.com"}
+        self.course = official_course
+        self.teacher = teacher_user
+        self.students = UserFactory.create_batch(5, user_type=User.STUDENT)
+        for student in self.students:
+            EnrolmentFactory(student=student, course=official_course)
+
+    def test_every_student_is_notified_and_emailed_once(self):
+        sent = fan_out_course_event(
+            self.course.id, self.teacher.id, "New quiz", "Quiz", "A quiz was added."
+        )
+
+        assert sent == {"notifications": 5, "emails": 5}
+        assert sorted(
+            Notification.objects.values_list("recipient_id", flat=True)
+        ) == sorted(student.id for student in self.students)
+        assert all(
+            notification.actor == self.teacher
+            for notification in Notification.objects.all()
+        )
+
+        assert sorted(message.to[0] for message in mail.outbox) == sorted(
+            student.email for student in self.students
+        )
+        message = mail.outbox[0]
+        assert message.subject == "Quiz"
+        assert message.from_email == "courses@example.com"
+        assert message.body.startswith("Dear ")
+        assert message.body.endswith("A quiz was added.")
+
+    def test_students_are_paged_by_batch_size(self):
+        pages = list(iter_enrolled_students(self.course.id, 2))
+
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert [student[0] for page in pages for student in page] == sorted(
+            student.id for student in self.students
+        )
+
+    def test_queries_grow_with_pages_not_students(self, django_assert_max_num_queries):
+        # actor, content type, then a select and an insert per page and a last select
+        with django_assert_max_num_queries(10):
+            fan_out_course_event(self.course.id, self.teacher.id, "New quiz")
+
+        assert Notification.objects.count() == 5
+        assert not mail.outbox
+
+    def test_other_courses_are_not_notified(self, not_enrolled_student_user):
+        fan_out_course_event(self.course.id, self.teacher.id, "New quiz")
+
+        assert not not_enrolled_student_user.notifications.exists()
+
+
+@pytest.mark.django_db
+class TestFanOutTasks:
+    @pytest.fixture(autouse=True)
+    def setup(self, official_course, teacher_user, celery_eager):
+        self.client = APIClient()
+        self.course = official_course
+        self.teacher = teacher_user
+
+    def test_material_upload_notifies_the_week(self, enrol, enrolled_student_user):
+        job = MaterialUploadJob.objects.create(
+            course=self.course,
+            week_number=2,
+            created_by=self.teacher,
+            total_files=3,
+            num_of_materials=3,
+            status=MaterialUploadJob.COMPLETE,
+        )
+
+        assert notify_material_upload(str(job.id)) == {"notifications": 1, "emails": 1}
+
+        notification = enrolled_student_user.notifications.get()
+        assert "3 materials" in notification.verb
+        assert "?week=2" in notification.verb
+        assert mail.outbox[0].subject == f"Materials Update for {self.course.name}"
+
+    def test_enrolment_email_is_sent_after_commit(
+        self, not_enrolled_student_user, django_capture_on_commit_callbacks
+    ):
+        self.client.force_login(not_enrolled_student_user)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.client.post(
+                reverse("enroll", kwargs={"course_id": self.course.id})
+            )
+
+        assert response.status_code == 201
+        assert Enrolment.objects.filter(student=not_enrolled_student_user).exists()
+        assert mail.outbox[0].to == [not_enrolled_student_user.email]
+        assert mail.outbox[0].subject == f"Successful Enrolment to {self.course.name}"
@@ -0,0 +1,151 @@
+import pytest
+from django.urls import reverse
+
+from courses.models import (
+    Course,
+    CourseRatingSummary,
+    Feedback,
+    TeacherRatingSummary,
+)
+from courses.ratings import FEEDBACKS_PER_PAGE, rebuild_rating_summaries
+from courses.tests.factories import CourseFactory, FeedbackFactory
+from courses.tests.fixtures import (
+    enrol,
+    enrolled_student_user,
+    not_enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+
+
+def summary_fields(summary):
+    return (
+        summary.count,
+        summary.total,
+        [bar["count"] for bar in summary.histogram],
+    )
+
+
+@pytest.mark.django_db
+class TestRatingSummaries:
+    @pytest.fixture(autouse=True)
+    def setup(self, official_course, teacher_user):
+        self.course = official_course
+        self.teacher = teacher_user
+
+    def test_created_feedbacks_are_counted(self):
+        other_course = CourseFactory(teacher=self.teacher)
+        FeedbackFactory(course=self.course, course_rating=5, teacher_rating=4)
+        FeedbackFactory(course=self.course, course_rating=3, teacher_rating=4)
+        FeedbackFactory(course=other_course, course_rating=1, teacher_rating=2)
+
+        summary = CourseRatingSummary.objects.get(course=self.course)
+        assert summary_fields(summary) == (2, 8, [1, 0, 1, 0, 0])
+        assert summary.average == 4
+
+        teacher_summary = TeacherRatingSummary.objects.get(teacher=self.teacher)
+        assert summary_fields(teacher_summary) == (3, 10, [0, 2, 0, 1, 0])
+
+        self.course.refresh_from_db()
+        assert (self.course.rating_count, self.course.rating_average) == (2, 4.0)
+
+    def test_update_or_create_moves_the_ratings(self, enrolled_student_user):
+        for course_rating, teacher_rating in [(2, 2), (5, 3), (5, 3)]:
+            Feedback.objects.update_or_create(
+                course_id=self.course.id,
+                user_id=enrolled_student_user.id,
+                defaults={
+                    "course_rating": course_rating,
+                    "teacher_rating": teacher_rating,
+                    "comments": "Good",
+                },
+            )
+
+        summary = CourseRatingSummary.objects.get(course=self.course)
+        assert summary_fields(summary) == (1, 5, [1, 0, 0, 0, 0])
+        teacher_summary = TeacherRatingSummary.objects.get(teacher=self.teacher)
+        assert summary_fields(teacher_summary) == (1, 3, [0, 0, 1, 0, 0])
+
+    def test_updates_touch_only_the_summaries(
+        self, enrolled_student_user, django_assert_num_queries
+    ):
+        feedback = FeedbackFactory(
+            course=self.course, user=enrolled_student_user, course_rating=1
+        )
+        feedback = Feedback.objects.get(pk=feedback.pk)
+        feedback.course_rating = 4
+
+        # the save, then the teacher, both summaries and the course, no aggregate
+        with django_assert_num_queries(5):
+            feedback.save()
+
+        summary = CourseRatingSummary.objects.get(course=self.course)
+        assert summary_fields(summary)[:2] == (1, 4)
+
+    def test_deleted_feedbacks_are_removed(self):
+        feedback = FeedbackFactory(course=self.course, course_rating=4)
+        FeedbackFactory(course=self.course, course_rating=2)
+
+        feedback.delete()
+
+        summary = CourseRatingSummary.objects.get(course=self.course)
+        assert summary_fields(summary) == (1, 2, [0, 0, 0, 1, 0])
+        self.course.refresh_from_db()
+        assert self.course.rating_average == 2.0
+
+    def test_deleting_the_course_keeps_the_teacher_summary_consistent(self):
+        FeedbackFactory(course=self.course, teacher_rating=5)
+
+        Course.objects.filter(pk=self.course.pk).delete()
+
+        assert not CourseRatingSummary.objects.exists()
+        teacher_summary = TeacherRatingSummary.objects.get(teacher=self.teacher)
+        assert summary_fields(teacher_summary) == (0, 0, [0, 0, 0, 0, 0])
+
+    def test_rebuild_matches_the_incremental_summaries(self):
+        FeedbackFactory.create_batch(4, course=self.course)
+        expected = summary_fields(CourseRatingSummary.objects.get(course=self.course))
+        CourseRatingSummary.objects.update(count=0, total=0, five_stars=0)
+
+        rebuild_rating_summaries()
+
+        summary = CourseRatingSummary.objects.get(course=self.course)
+        assert summary_fields(summary) == expected
+
+
+@pytest.mark.django_db
+class TestCourseFeedbacks:
+    @pytest.fixture(autouse=True)
+    def setup(self, client, official_course, enrol, enrolled_student_user):
+        self.client = client
+        self.course = official_course
+        self.client.force_login(enrolled_student_user)
+        FeedbackFactory.create_batch(FEEDBACKS_PER_PAGE + 3, course=official_course)
+
+    def test_course_page_shows_the_first_page_and_summary(self):
+        response = self.client.get(
+            reverse("official", kwargs={"course_id": self.course.id})
+        )
+
+        assert response.status_code == 200
+        assert len(response.context["course_feedbacks"]) == FEEDBACKS_PER_PAGE
+        assert response.context["rating_summary"].count == FEEDBACKS_PER_PAGE + 3
+
+    def test_load_more_returns_the_next_page(self):
+        response = self.client.get(
+            reverse("course_feedbacks", kwargs={"course_id": self.course.id}),
+            {"page": 2},
+        )
+
+        assert response.status_code == 200
+        assert len(response.context["course_feedbacks"]) == 3
+        assert not response.context["course_feedbacks"].has_next()
+
+    def test_load_more_requires_access_to_the_course(self, not_enrolled_student_user):
+        self.client.force_login(not_enrolled_student_user)
+
+        response = self.client.get(
+            reverse("course_feedbacks", kwargs={"course_id": self.course.id})
+        )
+
+        assert response.status_code == 403
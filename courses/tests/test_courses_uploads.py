@@ -0,0 +1,263 @@
+import hashlib
+import os
+
+import pytest
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from courses.models import CourseMaterial, MaterialUpload, MaterialUploadJob
+from courses import tasks
+from courses.blobs import acquire_blob
+from courses.tasks import batch_temporary_files, upload_materials
+from courses.tests.fixtures import (
+    celery_eager,
+    enrol,
+    enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.mark.django_db
+class TestChunkedMaterialUpload:
+    @pytest.fixture(autouse=True)
+    def setup(self, official_course, teacher_user, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+        settings.MATERIAL_UPLOAD = {"CHUNK_SIZE": 16, "BLOCK_SIZE": 4}
+        self.client = APIClient()
+        self.client.force_login(teacher_user)
+        self.course = official_course
+        self.content = b"lecture video bytes " * 3  # 60 bytes, 4 chunks
+
+    def start(self, **data):
+        data = {"filename": "week 1 video.mp4", "size": len(self.content), **data}
+        return self.client.post(
+            reverse(
+                "start_material_upload",
+                kwargs={"course_id": self.course.id, "week_number": 1},
+            ),
+            data,
+        )
+
+    def put_chunk(self, upload_url, offset, chunk, checksum=None):
+        return self.client.generic(
+            "PUT",
+            upload_url,
+            chunk,
+            content_type="application/octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset),
+            HTTP_UPLOAD_CHECKSUM=checksum or sha256(chunk),
+        )
+
+    def test_chunks_are_streamed_to_the_material_file(self):
+        response = self.start(sha256=sha256(self.content))
+        assert response.status_code == 201
+        upload = response.json()
+        assert upload["offset"] == 0 and upload["chunk_size"] == 16
+
+        for offset in range(0, len(self.content), 16):
+            response = self.put_chunk(
+                upload["upload_url"], offset, self.content[offset : offset + 16]
+            )
+            assert response.status_code == 200
+
+        state = response.json()
+        assert state["status"] == MaterialUpload.COMPLETE
+        material = CourseMaterial.objects.get(id=state["material_id"])
+        assert material.week_number == 1
+        assert material.material.name.startswith(f"materials/{self.course.id}-")
+        assert material.material.read() == self.content
+
+    def test_upload_resumes_after_rejected_chunks(self):
+        upload = self.start().json()
+        self.put_chunk(upload["upload_url"], 0, self.content[:16])
+
+        # a corrupted chunk is dropped
+        response = self.put_chunk(
+            upload["upload_url"], 16, self.content[16:32], checksum=sha256(b"x")
+        )
+        assert response.status_code == 400
+
+        # a chunk at the wrong offset tells the client where to resume
+        response = self.put_chunk(upload["upload_url"], 32, self.content[32:48])
+        assert response.status_code == 409
+        assert response.json()["offset"] == 16
+
+        assert self.client.get(upload["upload_url"]).json()["offset"] == 16
+        path = default_storage.path(MaterialUpload.objects.get().storage_name)
+        with open(path, "rb") as f:
+            assert f.read() == self.content[:16]
+
+    def test_whole_file_digest_mismatch_fails_upload(self):
+        upload = self.start(sha256=sha256(b"something else")).json()
+
+        for offset in range(0, len(self.content), 16):
+            response = self.put_chunk(
+                upload["upload_url"], offset, self.content[offset : offset + 16]
+            )
+
+        assert response.status_code == 400
+        upload = MaterialUpload.objects.get()
+        assert upload.status == MaterialUpload.FAILED
+        assert not default_storage.exists(upload.storage_name)
+        assert not CourseMaterial.objects.exists()
+
+    def test_invalid_uploads_are_rejected(self):
+        assert self.start(size=0).status_code == 400
+        assert self.start(filename="").status_code == 400
+
+        upload = self.start().json()
+        response = self.put_chunk(upload["upload_url"], 0, self.content[:32])
+        assert response.status_code == 400
+
+    def test_finish_reports_the_uploaded_materials(
+        self,
+        enrol,
+        enrolled_student_user,
+        celery_eager,
+        django_capture_on_commit_callbacks,
+    ):
+        upload = self.start().json()
+        for offset in range(0, len(self.content), 16):
+            self.put_chunk(
+                upload["upload_url"], offset, self.content[offset : offset + 16]
+            )
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.client.post(
+                reverse(
+                    "finish_material_uploads",
+                    kwargs={"course_id": self.course.id, "week_number": 1},
+                ),
+                {"upload_id": [upload["upload_id"]]},
+            )
+
+        assert response.status_code == 302
+        assert MaterialUploadJob.objects.get().num_of_materials == 1
+        assert enrolled_student_user.notifications.count() == 1
+
+        # a repeated request does not report the upload again
+        with django_capture_on_commit_callbacks(execute=True):
+            self.client.post(
+                reverse(
+                    "finish_material_uploads",
+                    kwargs={"course_id": self.course.id, "week_number": 1},
+                ),
+                {"upload_id": [upload["upload_id"]]},
+            )
+
+        assert MaterialUploadJob.objects.count() == 1
+        assert enrolled_student_user.notifications.count() == 1
+
+    def test_only_the_uploader_can_send_chunks(self, enrolled_student_user):
+        upload = self.start().json()
+
+        self.client.force_login(enrolled_student_user)
+        response = self.put_chunk(upload["upload_url"], 0, self.content[:16])
+
+        assert response.status_code == 403
+
+
+@pytest.mark.django_db
+class TestMaterialUploadJob:
+    @pytest.fixture(autouse=True)
+    def setup(self, official_course, teacher_user, settings, tmp_path, celery_eager):
+        settings.MEDIA_ROOT = tmp_path / "media"
+        self.client = APIClient()
+        self.client.force_login(teacher_user)
+        self.course = official_course
+        self.job = MaterialUploadJob.objects.create(
+            course=official_course,
+            week_number=1,
+            created_by=teacher_user,
+            total_files=2,
+        )
+        self.tmp_path = tmp_path
+        self.url = reverse("upload_job_progress", kwargs={"job_id": self.job.id})
+
+        # The temporary files are not named after their materials, as in the view
+        self.temporary_files = []
+        for name in ("notes.pdf", "slides.pdf"):
+            path = tmp_path / f"tmp-{name}"
+            path.write_bytes(b"%PDF-1.4 " + name.encode())
+            self.temporary_files.append((str(path), name))
+
+    def test_task_records_progress_and_notifies(self, enrol, enrolled_student_user):
+        assert self.client.get(self.url).json()["progress"] == 0
+
+        result = upload_materials(
+            self.course.id,
+            1,
+            self.temporary_files + [(str(self.tmp_path / "missing"), "missing.pdf")],
+            job_id=str(self.job.id),
+        ).get()
+
+        assert result[0] == 2
+        assert [failed["material_name"] for failed in result[1]] == ["missing.pdf"]
+        progress = self.client.get(self.url).json()
+        assert progress["status"] == MaterialUploadJob.COMPLETE
+        assert progress["num_of_materials"] == 2
+        assert "material_path" not in progress["failed_materials"][0]
+        assert enrolled_student_user.notifications.count() == 1
+
+    def test_job_is_only_finished_once(self, enrol, enrolled_student_user):
+        tasks.finish_upload_job(str(self.job.id), 2, [])
+        tasks.finish_upload_job(str(self.job.id), 0, [{"material_name": "x.pdf"}])
+
+        self.job.refresh_from_db()
+        assert self.job.status == MaterialUploadJob.COMPLETE
+        assert self.job.num_of_materials == 2
+        assert enrolled_student_user.notifications.count() == 1
+
+    def test_htmx_progress_polls_until_finished(self):
+        response = self.client.get(self.url, HTTP_HX_REQUEST="true")
+        assert 'hx-trigger="every 1s"' in response.content.decode()
+
+        upload_materials(
+            self.course.id, 1, self.temporary_files, str(self.job.id)
+        ).get()
+
+        response = self.client.get(self.url, HTTP_HX_REQUEST="true")
+        content = response.content.decode()
+        assert "every 1s" not in content
+        assert "2 materials uploaded successfully." in content
+        assert reverse("get_week_materials", args=[self.course.id, 1]) in content
+
+    def test_files_are_split_into_parallel_subtasks(self, settings):
+        settings.MATERIAL_UPLOAD_TASKS = {"FILES_PER_TASK": 1, "MAX_PARALLEL": 2}
+        files = self.temporary_files + [(str(self.tmp_path / "tmp-extra"), "extra.pdf")]
+        (self.tmp_path / "tmp-extra").write_bytes(b"%PDF-1.4 extra")
+
+        # 3 files over at most 2 subtasks
+        assert batch_temporary_files(files) == [files[:2], files[2:]]
+
+        result = upload_materials(self.course.id, 1, files, str(self.job.id))
+
+        assert result.get() == (3, [])
+        assert not any(os.path.exists(path) for path, _ in files)
+
+    def test_failed_file_is_retried_on_its_own(self, settings, monkeypatch):
+        settings.MATERIAL_UPLOAD_TASKS = {"MAX_RETRIES": 1, "FILES_PER_TASK": 2}
+        attempts = []
+
+        def flaky_acquire_blob(file, filename):
+            attempts.append(filename)
+            if len(attempts) == 1:
+                raise OSError("storage unavailable")
+            return acquire_blob(file, filename)
+
+        monkeypatch.setattr(tasks, "acquire_blob", flaky_acquire_blob)
+
+        result = upload_materials(
+            self.course.id, 1, self.temporary_files, str(self.job.id)
+        )
+
+        assert result.get() == (2, [])
+        assert attempts == ["notes.pdf", "slides.pdf", "notes.pdf"]
+        self.job.refresh_from_db()
+        assert self.job.processed_files == 2
@@ -16,6 +16,7 @@ from courses.models import (
     CourseMaterial,
     Enrolment,
     Feedback,
+    MaterialUploadJob,
 )
 from courses.tests.fixtures import (
     assignmentMaterial,
@@ -48,6 +49,7 @@ from rest_framework.test import APIClient
 from users.tests.fixtures import mock_photo, request_factory
 from django.contrib.messages.storage.fallback import FallbackStorage
 from django.contrib.messages import get_messages
+import os
 
 DEFAULT_PASSWORD = "ThisMustBeAn3xtremelyComplexed"
 
@@ -613,15 +615,9 @@ class TestSubmitFeedbackView:
 
         response = submit_feedback(request, 100)
 
-        assert response.status_code == 302
-
-        assert response.url == reverse("home")
-
-        # Check if error message is present
-        messages = list(get_messages(request))
-        assert len(messages) == 1
-        assert messages[0].tags == "error"
-        assert "Course doesn't exist." in str(messages[0])
+        # The student is not enrolled in a course that does not exist
+        assert response.status_code == 403
+        assert not Feedback.objects.filter(course_id=100).exists()
 
 
 @pytest.mark.django_db
@@ -1064,7 +1060,14 @@ class TestUploadMaterialView:
             },
         )
 
-    def test_upload_material_success(self, mock_photo):
+    def test_upload_material_success(self, mock_photo, monkeypatch, settings, tmp_path):
+        settings.BASE_DIR = tmp_path
+        queued = []
+
+        def record_upload(course_id, week_number, temporary_files, job_id=None):
+            queued.extend(temporary_files)
+
+        monkeypatch.setattr("courses.views.upload_materials", record_upload)
         form_data = {
             "course_id": self.official_course.id,
             "week_number": self.week_number,
@@ -1081,20 +1084,63 @@ class TestUploadMaterialView:
             request, course_id=self.official_course.id, week_number=self.week_number
         )
 
+        job = MaterialUploadJob.objects.get()
         assert response.status_code == 302
-        assert response.url == reverse(
-            "get_week_materials",
-            kwargs={
-                "course_id": self.official_course.id,
-                "week_number": self.week_number,
-            },
+        assert response.url == (
+            reverse(
+                "get_week_materials",
+                kwargs={
+                    "course_id": self.official_course.id,
+                    "week_number": self.week_number,
+                },
+            )
+            + f"?upload_job={job.id}"
         )
         print("official_course id: ", self.official_course.id)
-        # Assert success message is present
+        # Assert the upload is queued
         messages = list(get_messages(request))
         assert len(messages) == 1
-        assert messages[0].tags == "success"
-        assert messages[0].message == "1 materials uploaded successfully."
+        assert messages[0].tags == "info"
+        assert messages[0].message == "Uploading 1 materials..."
+
+        # The file is saved under a unique name, the material keeps the uploaded name
+        [(temp_path, material_name)] = queued
+        assert material_name == "test_photo.jpg"
+        assert os.path.dirname(temp_path) == str(tmp_path / "tmp")
+        assert os.path.basename(temp_path) != "test_photo.jpg"
+        assert os.path.exists(temp_path)
+
+    def test_upload_material_queue_failure(
+        self, mock_photo, monkeypatch, settings, tmp_path
+    ):
+        settings.BASE_DIR = tmp_path
+
+        def unavailable_broker(*args, **kwargs):
+            raise ConnectionError("broker unavailable")
+
+        monkeypatch.setattr("courses.views.upload_materials", unavailable_broker)
+        form_data = {
+            "course_id": self.official_course.id,
+            "week_number": self.week_number,
+            "material": mock_photo,
+        }
+        request = self.request_factory.post(self.uploadMaterialURL, data=form_data)
+        request.user = self.teacher_user
+        request.session = {}
+        setattr(request, "_messages", FallbackStorage(request))
+
+        response = upload_material(
+            request, course_id=self.official_course.id, week_number=self.week_number
+        )
+
+        job = MaterialUploadJob.objects.get()
+        assert response.status_code == 302
+        assert "upload_job" not in response.url
+        assert job.status == MaterialUploadJob.FAILED
+        assert job.failed_materials[0]["material_name"] == "test_photo.jpg"
+        assert os.listdir(tmp_path / "tmp") == []
+        messages = list(get_messages(request))
+        assert [message.tags for message in messages] == ["error"]
 
 
 @pytest.mark.django_db
@@ -0,0 +1,138 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from courses.models import CourseMaterial
+from courses.tests.factories import (
+    AssignmentFactory,
+    AssignmentSubmissionFactory,
+    CourseMaterialFactory,
+)
+from courses.tests.fixtures import (
+    enrol,
+    enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+from courses.week_content import (
+    get_week_content,
+    get_week_version,
+    week_content_key,
+)
+
+
+@pytest.mark.django_db
+class TestWeekContent:
+    @pytest.fixture(autouse=True)
+    def setup(self, client, enrol, enrolled_student_user, official_course):
+        self.client = client
+        self.student = enrolled_student_user
+        self.course = official_course
+        self.client.force_login(enrolled_student_user)
+        self.url = reverse(
+            "get_week_materials",
+            kwargs={"course_id": official_course.id, "week_number": 1},
+        )
+        self.material = CourseMaterialFactory(
+            course=official_course, week_number=1, material="week1/notes.pdf"
+        )
+        self.assignment = AssignmentFactory(
+            course=official_course, week_number=1, name="Essay", duration_days=7
+        )
+
+    def test_shared_content_is_read_once(self):
+        self.client.get(self.url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        assert response.status_code == 200
+        assert "notes.pdf" in response.content.decode()
+        tables = " ".join(query["sql"] for query in queries.captured_queries)
+        assert "courses_coursematerial" not in tables
+        assert 'courses_assignment"' not in tables.replace(
+            "courses_assignmentsubmission", ""
+        )
+
+    def test_material_changes_invalidate_the_week(self):
+        self.client.get(self.url)
+
+        CourseMaterialFactory(
+            course=self.course, week_number=1, material="week1/slides.pdf"
+        )
+        content = self.client.get(self.url).content.decode()
+        assert "slides.pdf" in content
+
+        CourseMaterial.objects.get(pk=self.material.pk).delete()
+        content = self.client.get(self.url).content.decode()
+        assert "notes.pdf" not in content
+
+    def test_assignment_creation_invalidates_only_its_week(self):
+        week_2 = get_week_content(self.course.id, 2)
+
+        AssignmentFactory(course=self.course, week_number=1, name="Quiz")
+
+        assert get_week_content(self.course.id, 2)["version"] == week_2["version"]
+        assert "Quiz" in self.client.get(self.url).content.decode()
+
+    def test_submissions_are_overlaid_per_student(self, client):
+        AssignmentSubmissionFactory(
+            assignment=self.assignment,
+            student=self.student,
+            assignment_file="submissions/mine.pdf",
+            grade=None,
+        )
+
+        assert "submissions/mine.pdf" in self.client.get(self.url).content.decode()
+
+        other_student = AssignmentSubmissionFactory(assignment=self.assignment).student
+        client.force_login(other_student)
+        content = client.get(self.url).content.decode()
+        assert "submissions/mine.pdf" not in content
+        assert "Previous Submission" in content
+
+    def test_unchanged_week_is_not_modified(self):
+        response = self.client.get(self.url)
+        etag = response.headers["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        AssignmentSubmissionFactory(assignment=self.assignment, student=self.student)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_content_changed_without_invalidation_is_modified(self):
+        response = self.client.get(self.url)
+        etag = response.headers["ETag"]
+
+        # bulk_create sends no post_save, the version of the week is unchanged
+        CourseMaterial.objects.bulk_create(
+            [CourseMaterial(course=self.course, week_number=1, material="week1/x.pdf")]
+        )
+        version = get_week_version(self.course.id, 1)
+        cache.delete(week_content_key(self.course.id, 1, version))
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert "x.pdf" in response.content.decode()
+        assert get_week_version(self.course.id, 1) == version
+
+    def test_teacher_sees_the_delete_buttons_of_a_cached_week(self, teacher_user):
+        self.client.get(self.url)
+
+        self.client.force_login(teacher_user)
+        content = self.client.get(self.url).content.decode()
+
+        assert reverse("delete_course_material", args=[self.material.id]) in content
+
+    def test_missing_course_is_not_found(self):
+        url = reverse(
+            "get_week_materials", kwargs={"course_id": 999999, "week_number": 1}
+        )
+
+        assert self.client.get(url).status_code == 404
@@ -0,0 +1,221 @@
+import hashlib
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.text import get_valid_filename
+
+from courses.blobs import adopt_blob, create_course_material
+from courses.models import CourseMaterial, MaterialUpload, material_upload_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MATERIAL_UPLOAD = {
+    "CHUNK_SIZE": 8 * 1024 * 1024,  # largest chunk accepted per request
+    "BLOCK_SIZE": 64 * 1024,  # bytes read from the request body at a time
+    "MAX_SIZE": 2 * 1024 * 1024 * 1024,  # largest file accepted
+}
+
+
+class ChunkOffsetError(ValueError):
+    """
+    Raised when a chunk does not start at the offset the upload expects, e.g. when a
+    client resumes with stale state. The client should resume from :attr:`offset`.
+    """
+
+    def __init__(self, offset):
+        super().__init__(f"Expected a chunk at offset {offset}")
+        self.offset = offset
+
+
+def get_upload_config():
+    """
+    Returns the chunked upload configuration merged over the defaults.
+
+    :return: The ``MATERIAL_UPLOAD`` setting merged over the defaults.
+    :rtype: dict
+    """
+    return {**DEFAULT_MATERIAL_UPLOAD, **getattr(settings, "MATERIAL_UPLOAD", {})}
+
+
+def hash_file(path, block_size):
+    """
+    Computes the SHA-256 hex digest of a file, one block at a time.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def start_upload(course, week_number, user, filename, size, sha256=""):
+    """
+    Starts a chunked upload of a course material.
+
+    The name of the material in the storage is reserved right away, so the chunks
+    can be written straight to their final location.
+
+    :param course: The course the material is uploaded to.
+    :type course: Course
+    :param week_number: The week the material is uploaded to.
+    :type week_number: int
+    :param user: The teacher uploading the material.
+    :type user: User
+    :param filename: The original name of the file.
+    :type filename: str
+    :param size: The total size of the file in bytes.
+    :type size: int
+    :param sha256: The optional SHA-256 hex digest of the whole file, verified once
+        the upload is complete.
+    :type sha256: str
+
+    :return: The pending upload.
+    :rtype: MaterialUpload
+
+    :raises ValueError: If the file name, size or digest is invalid.
+    """
+    config = get_upload_config()
+    filename = get_valid_filename(os.path.basename(filename or ""))
+    if not filename:
+        raise ValueError("A file name is required.")
+    if not 0 < size <= config["MAX_SIZE"]:
+        raise ValueError(f"The file size must be between 1 and {config['MAX_SIZE']}.")
+    if sha256 and len(sha256) != 64:
+        raise ValueError("The SHA-256 digest must be 64 hexadecimal characters.")
+
+    storage_name = default_storage.save(
+        material_upload_path(CourseMaterial(course=course), filename), ContentFile(b"")
+    )
+
+    return MaterialUpload.objects.create(
+        course=course,
+        week_number=week_number,
+        uploaded_by=user,
+        filename=filename,
+        storage_name=storage_name,
+        size=size,
+        sha256=sha256.lower(),
+    )
+
+
+def write_chunk(upload, stream, offset, length, sha256):
+    """
+    Streams one chunk of an upload to its file and verifies its digest.
+
+    The chunk is read from the stream in blocks of ``BLOCK_SIZE`` bytes and written
+    at its offset in the file, so memory stays bounded whatever the size of the
+    file. A chunk failing verification is truncated away and can be sent again.
+
+    :param upload: The pending upload.
+    :type upload: MaterialUpload
+    :param stream: The file-like object the chunk is read from, e.g. the request.
+    :param offset: The offset of the chunk in the file.
+    :type offset: int
+    :param length: The length of the chunk in bytes.
+    :type length: int
+    :param sha256: The SHA-256 hex digest of the chunk.
+    :type sha256: str
+
+    :return: The course material if the chunk completed the upload, None otherwise.
+    :rtype: CourseMaterial or None
+
+    :raises ChunkOffsetError: If the chunk does not start where the upload expects.
+    :raises ValueError: If the upload is not pending or the chunk is invalid.
+    """
+    config = get_upload_config()
+    if upload.status != MaterialUpload.PENDING:
+        raise ValueError(f"The upload is {upload.status}.")
+    if offset != upload.received_bytes:
+        raise ChunkOffsetError(upload.received_bytes)
+    if not 0 < length <= config["CHUNK_SIZE"] or offset + length > upload.size:
+        raise ValueError("Invalid chunk length.")
+
+    digest = hashlib.sha256()
+    remaining = length
+    with open(default_storage.path(upload.storage_name), "r+b") as f:
+        # drop whatever an interrupted attempt at this chunk left behind
+        f.seek(offset)
+        f.truncate()
+
+        while remaining:
+            block = stream.read(min(config["BLOCK_SIZE"], remaining))
+            if not block:
+                break
+            digest.update(block)
+            f.write(block)
+            remaining -= len(block)
+
+        if remaining or digest.hexdigest() != (sha256 or "").lower():
+            f.seek(offset)
+            f.truncate()
+            raise ValueError("The chunk does not match its SHA-256 digest.")
+
+    # only one request can move the offset forward
+    updated = MaterialUpload.objects.filter(
+        pk=upload.pk, status=MaterialUpload.PENDING, received_bytes=offset
+    ).update(received_bytes=offset + length)
+    if not updated:
+        upload.refresh_from_db()
+        raise ChunkOffsetError(upload.received_bytes)
+    upload.received_bytes = offset + length
+
+    if upload.received_bytes == upload.size:
+        return complete_upload(upload)
+    return None
+
+
+def complete_upload(upload):
+    """
+    Verifies a fully received upload and creates its course material.
+
+    The file already in the storage becomes the blob of the course material, or is
+    deleted if a blob already holds the same bytes. No byte is copied.
+
+    :param upload: The fully received upload.
+    :type upload: MaterialUpload
+
+    :return: The created course material.
+    :rtype: CourseMaterial
+
+    :raises ValueError: If the file does not match the digest of the upload, or
+        is already a material of the week.
+    """
+    sha256 = hash_file(
+        default_storage.path(upload.storage_name), get_upload_config()["BLOCK_SIZE"]
+    )
+    if upload.sha256 and sha256 != upload.sha256:
+        fail_upload(upload)
+        raise ValueError("The file does not match its SHA-256 digest.")
+
+    # the file is dropped if the same bytes were uploaded before
+    blob = adopt_blob(upload.storage_name, sha256, upload.size)
+    try:
+        material = create_course_material(
+            upload.course_id, upload.week_number, blob, upload.filename
+        )
+    except ValueError:
+        upload.status = MaterialUpload.FAILED
+        upload.save(update_fields=["status", "updated_at"])
+        raise
+
+    upload.material = material
+    upload.status = MaterialUpload.COMPLETE
+    upload.save(update_fields=["material", "status", "updated_at"])
+
+    logger.info("Material upload %s completed: %s", upload.id, upload.storage_name)
+    return material
+
+
+def fail_upload(upload):
+    """
+    Marks an upload as failed and deletes its partial file.
+
+    :param upload: The upload to abandon.
+    :type upload: MaterialUpload
+    """
+    default_storage.delete(upload.storage_name)
+    upload.status = MaterialUpload.FAILED
+    upload.save(update_fields=["status", "updated_at"])
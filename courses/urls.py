@@ -7,15 +7,20 @@ from courses.views import (
     OfficialCourseView,
     WeekView,
     course_details,
+    course_feedbacks,
     create_course,
     delete_course_material,
     enroll,
+    finish_material_uploads,
     get_week_materials,
+    material_upload_chunk,
     publish_course,
+    start_material_upload,
     student_ban_status_update,
     submit_feedback,
     upload_assignment_material,
     upload_material,
+    upload_job_progress,
     upload_student_submission,
 )
 
@@ -37,6 +42,26 @@ urlpatterns = [
         upload_material,
         name="upload_material",
     ),
+    path(
+        "upload-material/<int:course_id>/<int:week_number>/chunked/",
+        start_material_upload,
+        name="start_material_upload",
+    ),
+    path(
+        "upload-material/<int:course_id>/<int:week_number>/chunked/finish/",
+        finish_material_uploads,
+        name="finish_material_uploads",
+    ),
+    path(
+        "upload-material/jobs/<uuid:job_id>/",
+        upload_job_progress,
+        name="upload_job_progress",
+    ),
+    path(
+        "upload-material/chunks/<uuid:upload_id>/",
+        material_upload_chunk,
+        name="material_upload_chunk",
+    ),
     path(
         "upload-assignment/<int:course_id>/<int:week_number>/",
         upload_assignment_material,
@@ -62,6 +87,11 @@ urlpatterns = [
         submit_feedback,
         name="submit_feedback",
     ),
+    path(
+        "course-feedbacks/<int:course_id>/",
+        course_feedbacks,
+        name="course_feedbacks",
+    ),
     path("publish-course/<int:course_id>/", publish_course, name="publish_course"),
     path("enroll/<int:course_id>/", enroll, name="enroll"),
     path(
@@ -1,9 +1,8 @@
 from django.conf import settings
 from datetime import datetime
 import os
-from django.core.files.uploadedfile import InMemoryUploadedFile
-import time
-from django.db import IntegrityError
+import tempfile
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404, render, redirect
 from django.utils.decorators import method_decorator
 from django.contrib import messages
@@ -12,17 +11,24 @@ from django.contrib.auth.mixins import UserPassesTestMixin
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from notifications.signals import notify
-from courses.tasks import upload_materials
+from courses.tasks import (
+    notify_course_students,
+    notify_material_upload,
+    send_enrolment_email,
+    upload_materials,
+)
 from elearning_auth.decorators import custom_login_required
 from users.decorators import (
     student_required,
     teacher_required,
 )
+from courses.catalogue import InvalidCursor, search_catalogue
 from courses.decorators import check_student_banned
 from chat.models import ChatRoom
 from courses.forms import (
     AssignmentForm,
     AssignmentSubmissionForm,
+    CourseCatalogueForm,
     CourseForm,
     CreateCourseForm,
     FeedbackForm,
@@ -33,21 +39,38 @@ from courses.models import (
     AssignmentSubmission,
     Course,
     CourseMaterial,
+    CourseRatingSummary,
     Enrolment,
     Feedback,
+    MaterialUpload,
+    MaterialUploadJob,
     slugify,
 )
-from django.core.exceptions import ObjectDoesNotExist
+from courses.ratings import get_feedback_page
+from courses.uploads import (
+    ChunkOffsetError,
+    get_upload_config,
+    start_upload,
+    write_chunk,
+)
+from courses.week_content import (
+    get_student_submissions,
+    get_week_content,
+    get_week_content_timeout,
+    week_etag,
+)
+from django.core.exceptions import BadRequest, ObjectDoesNotExist, ValidationError
 from django.http import (
     Http404,
     HttpResponse,
     HttpResponseRedirect,
     JsonResponse,
 )
+from django.middleware.csrf import get_token
 from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views.decorators.csrf import csrf_exempt
-from django.core.mail import send_mail
 
 import logging
 
@@ -56,9 +79,11 @@ logger = logging.getLogger(__name__)
 
 class CoursesView(ListView):
     """
-    View for displaying a list of courses.
+    View for displaying the catalogue of courses.
 
-    This view retrieves and displays a list of courses with the status "official".
+    This view searches the courses with the status "official" by name, summary,
+    description and teacher name, filters them by duration, start date and rating
+    facets, and pages them by keyset. See :func:`courses.catalogue.search_catalogue`.
 
     :ivar model: The model used for retrieving the list of courses.
     :vartype model: Type[django.db.models.Model]
@@ -76,18 +101,62 @@ class CoursesView(ListView):
     @csrf_exempt
     def get_queryset(self):
         """
-        Retrieves the queryset of courses with the status "official".
-
-        This method filters the queryset of courses to include only those with the status
-        "official".
+        Retrieves the page of official courses matching the search query and facets.
 
         :param self: The view instance.
         :type self: CoursesView
 
-        :return: The queryset of courses with the status "official".
-        :rtype: QuerySet[Course]
+        :return: The courses of the page, with their teacher.
+        :rtype: list[Course]
+
+        :raises BadRequest: If the page cursor is invalid.
+        """
+        self.form = CourseCatalogueForm(self.request.GET)
+        filters = self.form.cleaned_data if self.form.is_valid() else {}
+
+        try:
+            self.catalogue = search_catalogue(
+                query=filters.get("q", ""),
+                duration=filters.get("duration") or None,
+                start=filters.get("start") or None,
+                rating=filters.get("rating") or None,
+                sort=filters.get("sort") or "newest",
+                cursor=filters.get("cursor") or None,
+            )
+        except InvalidCursor as e:
+            raise BadRequest(str(e)) from e
+        return self.catalogue["courses"]
+
+    def get_context_data(self, **kwargs):
         """
-        return Course.objects.filter(status="official")
+        Adds the search form, the facets and the link to the next page to the context.
+        """
+        context = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        params.pop("cursor", None)
+
+        for name, values in self.catalogue["facets"].items():
+            for facet in values:
+                facet_params = params.copy()
+                if facet["selected"]:
+                    facet_params.pop(name, None)
+                else:
+                    facet_params[name] = facet["value"]
+                facet["url"] = f"?{facet_params.urlencode()}"
+
+        next_url = None
+        if self.catalogue["next_cursor"]:
+            params["cursor"] = self.catalogue["next_cursor"]
+            next_url = f"?{params.urlencode()}"
+
+        context.update(
+            {
+                "catalogue_form": self.form,
+                "facets": self.catalogue["facets"],
+                "next_url": next_url,
+            }
+        )
+        return context
 
 
 @require_http_methods(["GET"])
@@ -158,8 +227,8 @@ def enroll(request, course_id):
     # Create a new enrollment for the user and course
     Enrolment.objects.create(student=user, course=course)
 
-    # Send enrollment email to the user
-    enrolmentEmail(user, course)
+    # Send enrollment email to the user in the background
+    transaction.on_commit(lambda: send_enrolment_email.delay(user.id, course.id))
 
     course_link = (
         f'<a href="{course.get_absolute_url()}" class="disabled-link">{course.name}</a>'
@@ -392,6 +461,7 @@ class OfficialCourseView(UserPassesTestMixin, TemplateView):
         # Fetch materials for the selected week (default to week 1)
         course_materials = CourseMaterial.objects.filter(course=course, week_number=1)
         context["course_materials"] = course_materials
+        context["enrolments"] = course.enrolment_set.select_related("student")
 
         context["form"] = CourseForm(instance=course)
 
@@ -403,7 +473,10 @@ class OfficialCourseView(UserPassesTestMixin, TemplateView):
             feedback_form = FeedbackForm(instance=feedback_instance)
             context["feedback_form"] = feedback_form
 
-        context["course_feedbacks"] = Feedback.objects.filter(course_id=course_id)
+        context["course_feedbacks"] = get_feedback_page(course_id)
+        context["rating_summary"] = CourseRatingSummary.objects.filter(
+            course_id=course_id
+        ).first()
         context["stars"] = [1, 2, 3, 4, 5]
 
         return context
@@ -544,6 +617,36 @@ def submit_feedback(request, course_id):
     return redirect("official", course_id=course_id)
 
 
+@custom_login_required
+@require_http_methods(["GET"])
+def course_feedbacks(request, course_id):
+    """
+    Renders a page of the feedbacks of a course, for the "load more" button of the
+    course feedback tab.
+
+    :param request: The HTTP request object.
+    :type request: django.http.HttpRequest
+    :param course_id: The ID of the course.
+    :type course_id: int
+
+    :return: The rendered feedbacks of the requested page.
+    :rtype: django.http.HttpResponse
+    """
+    course = get_object_or_404(Course, id=course_id)
+    if (
+        request.user != course.teacher
+        and not Enrolment.objects.filter(student=request.user, course=course).exists()
+    ):
+        return HttpResponse(status=403)
+
+    context = {
+        "course": course,
+        "course_feedbacks": get_feedback_page(course_id, request.GET.get("page")),
+        "stars": [1, 2, 3, 4, 5],
+    }
+    return render(request, "courses/partials/feedback_page.html", context)
+
+
 @custom_login_required
 @csrf_exempt
 @require_http_methods(["GET"])
@@ -555,6 +658,11 @@ def get_week_materials(request, course_id, week_number):
     for the specified week of the course. Renders the materials template
     with the retrieved data and upload forms.
 
+    The content of the week shared by every user is cached until its materials,
+    assignments or course change, only the submissions of a student are read per
+    request. The response has an ETag, so an unchanged week is answered with a
+    304 Not Modified.
+
     :param request: The HTTP request object.
     :type request: HttpRequest
     :param course_id: The ID of the course.
@@ -566,50 +674,73 @@ def get_week_materials(request, course_id, week_number):
     :rtype: HttpResponse
     """
     try:
-        course = get_object_or_404(Course, id=course_id)
-
         user = request.user
-        course_materials = CourseMaterial.objects.filter(
-            course=course, week_number=week_number
-        )
-
-        course_assignments = Assignment.objects.filter(
-            course=course, week_number=week_number
-        )
+        content = get_week_content(course_id, week_number)
+        course = content["course"]
 
-        if course_assignments.exists() and user.user_type == "student":
-            user_assignments = AssignmentSubmission.objects.filter(
-                assignment__in=course_assignments, student=user
-            )
+        if user.user_type == "student":
+            submissions = get_student_submissions(user, content["assignments"])
         else:
-            user_assignments = None
+            submissions = {}
 
         course_week_date_range = getCourseDateRange(course, week_number)
 
+        # the upload job queued by upload_material, whose progress is polled
+        upload_job = None
+        if request.GET.get("upload_job"):
+            try:
+                upload_job = MaterialUploadJob.objects.filter(
+                    id=request.GET["upload_job"], course=course, created_by=user
+                ).first()
+            except ValidationError:
+                pass
+
+    except Course.DoesNotExist:
+        raise Http404("Course not found.")
     except Exception as e:
         logger.error("Unexpected Error occured while getting week materials: %s", e)
         return JsonResponse({"error": "An error occurred"}, status=500)
 
+    # pending messages and upload progress are shown once, never revalidate them
+    etag = None
+    if upload_job is None and not len(getattr(request, "_messages", ())):
+        # the forms embed a token masking the CSRF secret, any mask is valid
+        get_token(request)
+        csrf_secret = request.META["CSRF_COOKIE"]
+        etag = week_etag(content, user.id, submissions, csrf_secret)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
     initial_data = {"course_id": course_id, "week_number": week_number}
     # Instantiate the MaterialUploadForm
     material_upload_form = MaterialUploadForm(initial=initial_data)
     assignment_upload_form = AssignmentForm(initial=initial_data)
     # Render the materials template with the materials data and the upload form
-    return render(
+    response = render(
         request,
         "courses/partials/materials.html",
         {
             "course_id": course_id,
             "week_number": week_number,
-            "course_materials": course_materials,
-            "course_assignments": course_assignments,
-            "user_assignments": user_assignments,
+            "course_materials": content["materials"],
+            "week_assignments": [
+                (assignment, submissions.get(assignment.id))
+                for assignment in content["assignments"]
+            ],
             "materialUploadForm": material_upload_form,
             "assignmentForm": assignment_upload_form,
-            "teacher": course.teacher == user,
+            "teacher": course.teacher_id == user.id,
             "course_week_date_range": course_week_date_range,
+            "upload_job": upload_job,
+            "week_fingerprint": content["fingerprint"],
+            "week_content_timeout": get_week_content_timeout(),
         },
     )
+    if etag:
+        response.headers["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 def getCourseDateRange(course, week_number):
@@ -661,22 +792,14 @@ def upload_assignment_material(request, course_id, week_number):
                 assignment.week_number,
             )
 
-            # Retrieve all enrollments for the specified course
-            enrollments = Enrolment.objects.filter(course=course)
-
-            # Retrieve the associated students from the enrollments
-            students_enrolled = [enrollment.student for enrollment in enrollments]
-
             course_link = f'<a href="{course.get_absolute_url()}?week={week_number}" disabled>{course.name}</a>'
             deadline = assignment.get_assignment_deadline()  # Format deadline as string
             verb = f"New assignment has been added to {course_link}. Please finish it by {deadline}."
 
-            try:
-                # Send notification to all students in the course
-                notify.send(sender=request.user, recipient=students_enrolled, verb=verb)
-            except Exception as e:
-                # Log the exception
-                logger.error(f"Error occurred while sending notification: {e}")
+            # Send notification to all students in the course in the background
+            transaction.on_commit(
+                lambda: notify_course_students.delay(course.id, request.user.id, verb)
+            )
 
         else:
             error_message = "Invalid form data."
@@ -772,7 +895,8 @@ def upload_student_submission(request, course_id, assignment_id):
 @require_http_methods(["DELETE"])
 def delete_course_material(request, course_material_id):
     """
-    Deletes a course material.
+    Deletes a course material. Its file is deleted with its blob once no other
+    course material uses it.
 
     :param request: The HTTP request object.
     :type request: HttpRequest
@@ -862,7 +986,8 @@ def upload_material(request, course_id, week_number):
     :param week_number: The week number for which materials are being uploaded.
     :type week_number: int
 
-    :return: An HTTP redirect response to the 'get_week_materials' view for the specified course and week.
+    :return: An HTTP redirect response to the 'get_week_materials' view for the specified course and week,
+        which polls the progress of the upload job.
     :rtype: HttpResponseRedirect
     """
     try:
@@ -874,87 +999,306 @@ def upload_material(request, course_id, week_number):
 
         if form.is_valid():
 
-            temporary_paths = []
+            # The directory is in the project dir, which is shared with the workers
+            upload_dir = os.path.join(settings.BASE_DIR, "tmp")
+            os.makedirs(upload_dir, exist_ok=True)
+
+            temporary_files = []
             for file in request.FILES.getlist("material"):
-                # Check if file is InMemoryUploadedFile
-                if isinstance(file, InMemoryUploadedFile):
-
-                    # Create a temporary file in the proj dir.
-                    temp_file_path = os.path.join(settings.BASE_DIR, "tmp", file.name)
-
-                    # Write the contents of the InMemoryUploadedFile to the temporary file
-                    with open(temp_file_path, "wb") as temp_file:
-                        temp_file.write(file.read())
-
-                    # Check if the temporary file exists
-                    if os.path.exists(temp_file_path):
-                        temporary_paths.append(temp_file_path)
-                    else:
-                        # log the case if the temporary file is not created
-                        logger.info(f"Failed to create temporary file for {file.name}")
-                else:
-                    # skip the case if the file is not an InMemoryUploadedFile
-                    pass
+                # A unique temporary file, so uploads of files of the same name never
+                # overwrite each other and the client's file name is never a path
+                fd, temp_file_path = tempfile.mkstemp(dir=upload_dir)
+
+                # Stream the upload to the temporary file chunk by chunk, large files
+                # are already on disk as TemporaryUploadedFile and never fully read
+                with os.fdopen(fd, "wb") as temp_file:
+                    for chunk in file.chunks():
+                        temp_file.write(chunk)
+
+                # The material is named after the uploaded file
+                temporary_files.append((temp_file_path, file.name))
+
+            logger.info("temp files: %s", temporary_files)
+
+            job = MaterialUploadJob.objects.create(
+                course=course,
+                week_number=week_number,
+                created_by=user,
+                total_files=len(temporary_files),
+            )
 
-            logger.info("temp paths: %s", temporary_paths)
+            # Queue the Celery tasks and return right away, the progress of the job
+            # is polled from the materials of the week
+            try:
+                upload_materials(
+                    course_id, week_number, temporary_files, job_id=str(job.id)
+                )
+            except Exception as e:
+                logger.error("Failed to queue the upload job %s: %s", job.id, e)
+                fail_upload_job(job, temporary_files)
+                messages.error(
+                    request, "The materials could not be uploaded, please try again."
+                )
+                return redirect(
+                    "get_week_materials", course_id=course_id, week_number=week_number
+                )
 
-            # Call the Celery task asynchronously
-            task = upload_materials.delay(course_id, week_number, temporary_paths)
+            messages.info(request, f"Uploading {len(temporary_files)} materials...")
 
-            # Poll the task result until it's ready
-            while not task.ready():
-                time.sleep(1)  # Sleep for 1 second before checking again
+            return HttpResponseRedirect(
+                reverse(
+                    "get_week_materials",
+                    kwargs={"course_id": course_id, "week_number": week_number},
+                )
+                + f"?upload_job={job.id}"
+            )
 
-            logger.info("Materials upload completed.")
+        else:
+            # Form validation failed
+            for field, errors in form.errors.items():
+                for error in errors:
+                    messages.error(request, f"{field}: {error}")
 
-            # Retrieve the result once the task is ready
-            result = task.result
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}")
 
-            # Extract num_of_materials and num_of_failed_uploads from the result
-            num_of_materials, num_of_failed_uploads = result
+    return redirect("get_week_materials", course_id=course_id, week_number=week_number)
 
-            # add any failed uploads to the error message
-            if num_of_failed_uploads:
-                error_message = (
-                    f"{len(num_of_failed_uploads)} materials failed to upload:\n"
-                )
 
-                for failed_material in num_of_failed_uploads:
-                    error_message += f"- {failed_material['material_name']}: {failed_material['error_message']}\n"
+@custom_login_required
+@teacher_required
+@require_http_methods(["GET"])
+def upload_job_progress(request, job_id):
+    """
+    Returns the progress of a material upload job.
 
-                messages.error(request, error_message)
+    htmx requests get the progress bar, which polls this view until the job is
+    finished and then reloads the materials of the week. Other requests get the
+    progress as JSON.
 
-            if num_of_materials > 0:
-                # Send success message for successful uploads
-                success_message = f"{num_of_materials} materials uploaded successfully."
-                messages.success(request, success_message)
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :param job_id: The ID of the upload job.
+    :type job_id: uuid.UUID
 
-                # Retrieve the associated students from the enrollments
-                enrollments = Enrolment.objects.filter(course=course)
-                students_enrolled = [enrollment.student for enrollment in enrollments]
+    :return: The rendered progress bar or a JSON response with the progress.
+    :rtype: HttpResponse or JsonResponse
+    """
+    job = get_object_or_404(MaterialUploadJob, id=job_id, created_by=request.user)
 
-                # Send email notification to all students in the course
-                materialsUpdateEmail(
-                    students_enrolled, course, week_number, num_of_materials
-                )
+    if request.htmx:
+        return render(
+            request,
+            "courses/partials/upload_progress.html",
+            {"upload_job": job, "refresh_materials": job.is_finished},
+        )
 
-                # Send django notification to all students in the course
-                course_link = f'<a href="{course.get_absolute_url()}?week={week_number}">{course.name}</a>'
-                verb = f"<span class='fw-bold'>{num_of_materials} materials</span> added to {course_link}"
+    return JsonResponse(
+        {
+            "job_id": str(job.id),
+            "status": job.status,
+            "total_files": job.total_files,
+            "processed_files": job.processed_files,
+            "progress": job.progress,
+            "num_of_materials": job.num_of_materials,
+            # the temporary paths of the failed files stay on the server
+            "failed_materials": [
+                {
+                    "material_name": failed["material_name"],
+                    "error_message": failed["error_message"],
+                }
+                for failed in job.failed_materials
+            ],
+        }
+    )
 
-                try:
-                    notify.send(sender=user, recipient=students_enrolled, verb=verb)
-                except Exception as e:
-                    logger.error(f"Error occurred while sending notification: {e}")
 
-        else:
-            # Form validation failed
-            for field, errors in form.errors.items():
-                for error in errors:
-                    messages.error(request, f"{field}: {error}")
+def material_upload_state(upload):
+    """
+    Returns the JSON state of a chunked material upload.
+    """
+    return {
+        "upload_id": str(upload.id),
+        "offset": upload.received_bytes,
+        "size": upload.size,
+        "status": upload.status,
+        "material_id": upload.material_id,
+        "chunk_size": get_upload_config()["CHUNK_SIZE"],
+        "upload_url": reverse("material_upload_chunk", args=[upload.id]),
+    }
 
-    except Exception as e:
-        logger.error(f"An unexpected error occurred: {e}")
+
+@custom_login_required
+@teacher_required
+@require_http_methods(["POST"])
+def start_material_upload(request, course_id, week_number):
+    """
+    Starts a chunked, resumable upload of a material file for a specific course and
+    week. The chunks are then sent to the returned ``upload_url``.
+
+    :param request: The HTTP request object, with the ``filename``, ``size`` and
+        optional ``sha256`` of the file.
+    :type request: HttpRequest
+    :param course_id: The ID of the course for which the material is uploaded.
+    :type course_id: int
+    :param week_number: The week number for which the material is uploaded.
+    :type week_number: int
+
+    :return: A JSON response with the state of the upload, or the error.
+    :rtype: JsonResponse
+    """
+    course = get_object_or_404(Course, id=course_id, teacher=request.user)
+
+    try:
+        upload = start_upload(
+            course,
+            week_number,
+            request.user,
+            filename=request.POST.get("filename"),
+            size=int(request.POST.get("size", 0)),
+            sha256=request.POST.get("sha256", ""),
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse(material_upload_state(upload), status=201)
+
+
+@custom_login_required
+@teacher_required
+@require_http_methods(["GET", "PUT"])
+def material_upload_chunk(request, upload_id):
+    """
+    Returns the state of a chunked material upload, or receives its next chunk.
+
+    A GET returns the offset to resume the upload from. A PUT sends the chunk
+    starting at the ``Upload-Offset`` header as the request body, with its SHA-256
+    hex digest in the ``Upload-Checksum`` header. The body is streamed to the file of
+    the material, it is never loaded in memory.
+
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :param upload_id: The ID of the upload.
+    :type upload_id: uuid.UUID
+
+    :return: A JSON response with the state of the upload. A chunk at the wrong
+        offset gets a 409 with the expected offset, an invalid chunk a 400.
+    :rtype: JsonResponse
+    """
+    upload = get_object_or_404(MaterialUpload, id=upload_id, uploaded_by=request.user)
+
+    if request.method == "PUT":
+        try:
+            write_chunk(
+                upload,
+                request,
+                offset=int(request.headers.get("Upload-Offset", -1)),
+                length=int(request.headers.get("Content-Length") or 0),
+                sha256=request.headers.get("Upload-Checksum", ""),
+            )
+        except ChunkOffsetError as e:
+            return JsonResponse({"error": str(e), "offset": e.offset}, status=409)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse(material_upload_state(upload))
+
+
+def fail_upload_job(job, temporary_files):
+    """
+    Marks an upload job which could not be queued as failed, and deletes its
+    temporary files, which no task will process.
+
+    :param job: The upload job.
+    :type job: MaterialUploadJob
+    :param temporary_files: The temporary file path and material name of each file
+        of the job.
+    :type temporary_files: list[tuple[str, str]]
+    """
+    MaterialUploadJob.objects.filter(pk=job.pk).update(
+        status=MaterialUploadJob.FAILED,
+        failed_materials=[
+            {
+                "material_name": material_name,
+                "error_message": "Upload could not be queued",
+            }
+            for _, material_name in temporary_files
+        ],
+    )
+    for path, _ in temporary_files:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@custom_login_required
+@teacher_required
+@require_http_methods(["POST"])
+def finish_material_uploads(request, course_id, week_number):
+    """
+    Reports the chunked uploads of a batch of materials and notifies the students of
+    the course once they are complete.
+
+    The complete uploads are attached to the job reporting them, so repeating the
+    request neither reports them again nor notifies the students twice.
+
+    :param request: The HTTP request object, with the ``upload_id`` of each file.
+    :type request: HttpRequest
+    :param course_id: The ID of the course for which materials were uploaded.
+    :type course_id: int
+    :param week_number: The week number for which materials were uploaded.
+    :type week_number: int
+
+    :return: An HTTP redirect response to the 'get_week_materials' view for the specified course and week.
+    :rtype: HttpResponseRedirect
+    """
+    course = get_object_or_404(Course, id=course_id, teacher=request.user)
+
+    with transaction.atomic():
+        uploads = MaterialUpload.objects.select_for_update().filter(
+            id__in=request.POST.getlist("upload_id"),
+            course=course,
+            week_number=week_number,
+            uploaded_by=request.user,
+            job__isnull=True,
+        )
+        completed_uploads = []
+        failed_uploads = []
+        for upload in uploads:
+            if upload.status == MaterialUpload.COMPLETE:
+                completed_uploads.append(upload.id)
+            else:
+                failed_uploads.append(upload.filename)
+        num_of_materials = len(completed_uploads)
+
+        job = None
+        if num_of_materials > 0:
+            job = MaterialUploadJob.objects.create(
+                course=course,
+                week_number=week_number,
+                created_by=request.user,
+                total_files=num_of_materials + len(failed_uploads),
+                processed_files=num_of_materials + len(failed_uploads),
+                num_of_materials=num_of_materials,
+                failed_materials=[
+                    {"material_name": filename, "error_message": "Upload incomplete"}
+                    for filename in failed_uploads
+                ],
+                status=MaterialUploadJob.COMPLETE,
+            )
+            MaterialUpload.objects.filter(id__in=completed_uploads).update(job=job)
+
+    if failed_uploads:
+        messages.error(
+            request,
+            f"{len(failed_uploads)} materials failed to upload: "
+            + ", ".join(failed_uploads),
+        )
+
+    if job is not None:
+        messages.success(request, f"{num_of_materials} materials uploaded successfully.")
+
+        # The students are notified in the background
+        transaction.on_commit(lambda: notify_material_upload.delay(str(job.id)))
 
     return redirect("get_week_materials", course_id=course_id, week_number=week_number)
 
@@ -1003,98 +1347,6 @@ def publish_course(request, course_id):
 # ===============================================
 
 
-def enrolmentEmail(user, course):
-    """
-    Sends an enrollment confirmation email to the user.
-
-    This function sends an email to the provided user to confirm their successful enrollment
-    in the specified course. The email contains details about the course such as its name,
-    start date, end date, duration, teacher's name and email.
-
-    :param user: The user who has been enrolled in the course.
-    :type user: django.contrib.auth.models.User
-    :param course: The course in which the user has been enrolled.
-    :type course: YourCourseModel
-    """
-    subject = f"Successful Enrolment to {course.name}"
-    message = (
-        f"Dear {user.get_full_name()},\n\n"
-        f"Congratulations! You have successfully enrolled in the course '{course.name}'.\n"
-        f"We're excited to have you on board and look forward to seeing you excel in the course.\n\n"
-        f"Course Details:\n"
-        f"Name: {course.name}\n"
-        f"Start Date: {course.start_date}\n"
-        f"End Date: {course.datetime_from_start_date(course.duration_weeks)}\n"
-        f"Duration: {course.duration_weeks} weeks\n"
-        f"Teacher: {course.teacher.get_full_name()} - {course.teacher.email}\n\n"
-        f"If you have any questions or need assistance, feel free to contact us.\n\n"
-        f"Best regards,\nThe Course Management Team"
-    )
-    from_email = "awdtest04@gmail.com"  # Update with your email
-    recipient_list = [user.email]
-
-    send_mail(subject, message, from_email, recipient_list)
-
-
-def materialsUpdateEmail(students, course, week, num_of_materials):
-    """
-    Sends an email update about new course materials to the specified students.
-
-    This function sends personalized email updates to each student in the provided list,
-    informing them about the addition of new course materials for a specific week in the course.
-    Each email contains information about the course, the week, the number of new materials added,
-    and instructions on accessing the materials.
-
-    :param students: The list of students to whom the email updates will be sent.
-    :type students: list of django.contrib.auth.models.User
-    :param course: The course for which the materials update is being sent.
-    :type course: YourCourseModel
-    :param week: The week number for which the materials update is being sent.
-    :type week: int
-    :param num_of_materials: The number of new materials added for the specified week.
-    :type num_of_materials: int
-    """
-    subject = f"Materials Update for {course.name}"
-
-    # for loop to send mass emails with personalization
-    for student in students:
-        greeting = f"Dear {student.get_full_name()},\n\n"
-
-        # Introduction
-        intro = (
-            "We hope this message finds you well. As part of our ongoing efforts to support your learning experience, "
-            "we are pleased to inform you about the latest updates in your course materials.\n\n"
-        )
-
-        # Instructions on accessing materials
-        instructions = (
-            f"{num_of_materials} new course materials {'have' if num_of_materials > 1 else 'has'} been added to week '{week}'.\n"
-            f"To access the materials, click on the link below:\n"
-            f"https://localhost/official/{course.id}?week={week}.\n\n"
-        )
-
-        # Call to action
-        call_to_action = (
-            "We encourage you to review the new materials at your earliest convenience to stay updated with the course "
-            "content.\n\n"
-        )
-
-        # Closing statement
-        closing = " Best regards,\nThe Course Management Team"
-
-        # Combine all parts of the message
-        message = greeting + intro + instructions + call_to_action + closing
-
-        # Sender email address (From address)
-        from_email = (
-            "awdtest04@gmail.com"  # Update with the desired sender email address
-        )
-
-        recipient_list = [student.email]
-
-        send_mail(subject, message, from_email, recipient_list)
-
-
 # @custom_login_required
 # @teacher_required
 # def banStudentEmail(student, course):
@@ -0,0 +1,254 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.http import quote_etag
+
+from courses.models import Assignment, AssignmentSubmission, Course, CourseMaterial
+
+DEFAULT_WEEK_CONTENT_TIMEOUT = 300  # seconds
+
+
+def course_version_key(course_id):
+    return f"courses:week_content:version:{course_id}"
+
+
+def week_version_key(course_id, week_number):
+    return f"courses:week_content:version:{course_id}:{week_number}"
+
+
+def week_content_key(course_id, week_number, version):
+    return f"courses:week_content:{version}:{course_id}:{week_number}"
+
+
+def get_week_content_timeout():
+    return getattr(
+        settings, "COURSE_WEEK_CONTENT_TIMEOUT", DEFAULT_WEEK_CONTENT_TIMEOUT
+    )
+
+
+def get_week_version(course_id, week_number):
+    """
+    Returns the current version of the cached content of a course week.
+
+    The version combines a version of the course, bumped when the course changes,
+    and one of the week, bumped when its materials or assignments change. Versions
+    are random tokens, so a version evicted from the cache can never be reissued
+    while content of the old version is still cached.
+
+    :param course_id: The ID of the course.
+    :type course_id: int
+    :param week_number: The week number.
+    :type week_number: int
+
+    :return: The version token of the week.
+    :rtype: str
+    """
+    keys = [course_version_key(course_id), week_version_key(course_id, week_number)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = cache.get_or_set(key, uuid.uuid4().hex, None)
+    return "-".join(versions[key] for key in keys)
+
+
+def week_fingerprint(course, materials, assignments):
+    """
+    Returns a digest of the content of a course week, which changes with it even
+    when a change bypassed the invalidation of the cache, e.g. a bulk update.
+
+    :param course: The course.
+    :type course: Course
+    :param materials: The materials of the week.
+    :type materials: list[CourseMaterial]
+    :param assignments: The assignments of the week.
+    :type assignments: list[Assignment]
+
+    :return: The hex digest of the content.
+    :rtype: str
+    """
+    state = [
+        (course.id, course.start_date.isoformat(), course.duration_weeks),
+        [
+            (material.id, material.material.name, material.name)
+            for material in materials
+        ],
+        [
+            (
+                assignment.id,
+                assignment.name,
+                assignment.instructions,
+                assignment.week_number,
+                assignment.duration_days,
+            )
+            for assignment in assignments
+        ],
+    ]
+    return hashlib.sha256(repr(state).encode()).hexdigest()
+
+
+def load_week_content(course_id, week_number):
+    """
+    Loads the content of a course week shared by every user.
+
+    :param course_id: The ID of the course.
+    :type course_id: int
+    :param week_number: The week number.
+    :type week_number: int
+
+    :return: The ``course``, the ``materials`` and ``assignments`` of the week,
+        with their course, and the ``fingerprint`` of this content, see
+        :func:`week_fingerprint`.
+    :rtype: dict
+
+    :raises Course.DoesNotExist: If the course does not exist.
+    """
+    course = Course.objects.get(pk=course_id)
+    materials = list(
+        CourseMaterial.objects.filter(course_id=course_id, week_number=week_number)
+    )
+    assignments = list(
+        Assignment.objects.filter(course_id=course_id, week_number=week_number)
+    )
+    # deadlines are computed from the course, keep it on every assignment
+    for assignment in assignments:
+        assignment.course = course
+
+    return {
+        "course": course,
+        "materials": materials,
+        "assignments": assignments,
+        "fingerprint": week_fingerprint(course, materials, assignments),
+    }
+
+
+def get_week_content(course_id, week_number):
+    """
+    Retrieves the content of a course week shared by every user, from the cache
+    when possible.
+
+    :param course_id: The ID of the course.
+    :type course_id: int
+    :param week_number: The week number.
+    :type week_number: int
+
+    :return: The content of the week, see :func:`load_week_content`, with its
+        ``version``.
+    :rtype: dict
+
+    :raises Course.DoesNotExist: If the course does not exist.
+    """
+    version = get_week_version(course_id, week_number)
+    key = week_content_key(course_id, week_number, version)
+    content = cache.get(key)
+
+    if content is None:
+        content = load_week_content(course_id, week_number)
+        cache.set(key, content, get_week_content_timeout())
+
+    return {**content, "version": version}
+
+
+def get_student_submissions(student, assignments):
+    """
+    Retrieves the latest submission of a student to each assignment, the part of a
+    course week that is not shared.
+
+    :param student: The student.
+    :type student: User
+    :param assignments: The assignments of the week.
+    :type assignments: list[Assignment]
+
+    :return: The submissions by assignment ID.
+    :rtype: dict[int, AssignmentSubmission]
+    """
+    if not assignments:
+        return {}
+
+    submissions = AssignmentSubmission.objects.filter(
+        student=student, assignment_id__in=[assignment.id for assignment in assignments]
+    ).order_by("submitted_at", "id")
+    return {submission.assignment_id: submission for submission in submissions}
+
+
+def week_etag(content, user_id, submissions, csrf_secret, now=None):
+    """
+    Returns the ETag of a course week as rendered for a user.
+
+    It changes with the version and the content of the week, the submissions of
+    the user, the assignments whose deadline has passed and the CSRF secret of the
+    forms.
+
+    :param content: The content of the week, from :func:`get_week_content`.
+    :type content: dict
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :param submissions: The submissions of the user by assignment ID.
+    :type submissions: dict[int, AssignmentSubmission]
+    :param csrf_secret: The unmasked CSRF secret of the request.
+    :type csrf_secret: str
+    :param now: The current time.
+    :type now: datetime or None
+
+    :return: The quoted ETag.
+    :rtype: str
+    """
+    now = now or timezone.now()
+    state = [
+        content["version"],
+        content["fingerprint"],
+        user_id,
+        csrf_secret,
+        [
+            assignment.id
+            for assignment in content["assignments"]
+            if assignment.get_assignment_deadline() <= now
+        ],
+        [
+            (
+                submission.id,
+                submission.assignment_file.name,
+                submission.submitted_at.isoformat(),
+                str(submission.grade),
+                submission.teacher_comments,
+            )
+            for _assignment_id, submission in sorted(submissions.items())
+        ],
+    ]
+    return quote_etag(hashlib.sha256(repr(state).encode()).hexdigest())
+
+
+def bump_version(key):
+    cache.set(key, uuid.uuid4().hex, None)
+
+
+def invalidate_week_content(course_id, week_number):
+    """
+    Invalidates the cached content of a course week.
+
+    The version is bumped again once the transaction commits, as a request reading
+    the week before the commit could cache its previous content.
+
+    :param course_id: The ID of the course.
+    :type course_id: int
+    :param week_number: The week number.
+    :type week_number: int
+    """
+    key = week_version_key(course_id, week_number)
+    bump_version(key)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def invalidate_course_content(course_id):
+    """
+    Invalidates the cached content of every week of a course.
+
+    :param course_id: The ID of the course.
+    :type course_id: int
+    """
+    key = course_version_key(course_id)
+    bump_version(key)
+    transaction.on_commit(lambda: bump_version(key))
@@ -0,0 +1,19 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend running the ``pragmas`` of its ``OPTIONS`` on every new
+    connection, see :func:`eLearningApp.database.sqlite_profile`.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop("pragmas", None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict["OPTIONS"].get("pragmas", {}).items():
+            connection.execute(f"PRAGMA {name} = {value}")
+        return connection
@@ -0,0 +1,22 @@
+from django.template.backends import django
+
+from eLearningApp.metrics import measure_template
+
+
+class Template(django.Template):
+    def render(self, context=None, request=None):
+        with measure_template():
+            return super().render(context, request)
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    """
+    Django template backend adding the time templates take to render to the
+    current measurement, see :func:`eLearningApp.metrics.measure_template`.
+    """
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
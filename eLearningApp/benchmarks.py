@@ -0,0 +1,717 @@
+"""
+Benchmarks of the HTTP views and of the chat WebSocket consumer.
+
+Seeds a throwaway test database with the factories of the apps, measures the
+latency and queries of the main views and the throughput of ChatConsumer over
+the in-memory channel layer, and writes a JSON report that can be compared with
+the report of another commit::
+
+    python -m eLearningApp.benchmarks --output main.json
+    python -m eLearningApp.benchmarks --users 1000 --messages 50000 --compare main.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import timedelta
+
+DEFAULT_BENCHMARK = {
+    "USERS": 10_000,
+    "COURSES": 500,
+    "MESSAGES": 1_000_000,
+    "WEEKS": 12,  # weeks of every course
+    "MATERIALS_PER_WEEK": 3,
+    "ASSIGNMENTS_PER_COURSE": 6,
+    "ENROLMENTS_PER_STUDENT": 5,
+    "STATUS_UPDATES_PER_USER": 2,
+    "TEACHER_RATIO": 0.025,  # share of the users who are teachers
+    "REQUESTS": 200,  # measured requests of each view
+    "WARMUP": 20,  # requests of each view before the measured ones
+    "SAMPLE_USERS": 20,  # users whose requests are measured, in turn
+    "CHAT_CONNECTIONS": 50,  # connections to the measured chat room
+    "CHAT_MESSAGES": 500,  # messages sent by each chat phase
+    "SEED": 42,
+}
+
+# Rows written per INSERT while seeding
+BATCH_SIZE = 5000
+
+# Seconds a chat connection waits for a frame before the benchmark fails
+CHAT_TIMEOUT = 10
+
+# Relative slowdown over which a compared latency or throughput is a regression
+DEFAULT_THRESHOLD = 0.2
+
+REPORT_VERSION = 1
+
+
+def percentile(values, percent):
+    """
+    Returns the nearest-rank percentile of some values.
+
+    :param values: The measured values.
+    :type values: list[float]
+    :param percent: The percentile, between 0 and 100.
+    :type percent: float
+
+    :rtype: float
+    """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values, scale=1):
+    """
+    Returns the percentiles, mean and maximum of some values.
+
+    :param values: The measured values.
+    :type values: list[float]
+    :param scale: The factor applied to the values, e.g. 1000 for milliseconds.
+    :type scale: float
+
+    :rtype: dict[str, float]
+    """
+    return {
+        "p50": round(percentile(values, 50) * scale, 3),
+        "p90": round(percentile(values, 90) * scale, 3),
+        "p99": round(percentile(values, 99) * scale, 3),
+        "mean": round(sum(values) / len(values) * scale, 3),
+        "max": round(max(values) * scale, 3),
+    }
+
+
+def bulk_create(model, objects):
+    return model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+
+def seed(config):
+    """
+    Seeds the database with users, official courses with their weeks, enrolments,
+    chat rooms and messages, built by the factories of the apps and inserted in
+    bulk. The indexes maintained by signals are rebuilt afterwards.
+
+    :param config: The benchmark configuration, see :data:`DEFAULT_BENCHMARK`.
+    :type config: dict
+
+    :return: The seeded ``students``, ``teachers``, ``courses``, ``chat_rooms`` and
+        ``enrolments`` by course ID.
+    :rtype: dict
+    """
+    import faker
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import Group
+    from django.utils import timezone
+    from django.utils.text import slugify
+    from factory.random import reseed_random
+
+    from chat.models import ChatMembership, ChatRoom, Message
+    from chat.tests.factories import (
+        ChatMembershipFactory,
+        ChatRoomFactory,
+        MessageFactory,
+    )
+    from courses.catalogue import rebuild_catalogue_index
+    from courses.dashboard import rebuild_student_deadlines
+    from courses.models import Assignment, Course, CourseMaterial, Enrolment
+    from courses.tests.factories import (
+        AssignmentFactory,
+        CourseFactory,
+        CourseMaterialFactory,
+        EnrolmentFactory,
+    )
+    from users.models import StatusUpdate, User
+    from users.search import rebuild_search_index
+    from users.tests.factories import StatusUpdateFactory, UserFactory
+
+    reseed_random(config["SEED"])
+    rng = random.Random(config["SEED"])
+    fake = faker.Faker()
+    fake.seed_instance(config["SEED"])
+    now = timezone.now()
+
+    # The first user of each type creates its group and permissions
+    teachers = [UserFactory(user_type=User.TEACHER)]
+    students = [UserFactory(user_type=User.STUDENT)]
+    teacher_count = max(1, round(config["USERS"] * config["TEACHER_RATIO"]))
+    password = make_password(None)
+    users = [
+        UserFactory.build(
+            user_type=User.TEACHER if i < teacher_count - 1 else User.STUDENT,
+            password=password,
+        )
+        for i in range(max(0, config["USERS"] - 2))
+    ]
+    bulk_create(User, users)
+    teachers += [user for user in users if user.user_type == User.TEACHER]
+    students += [user for user in users if user.user_type == User.STUDENT]
+
+    groups = dict(Group.objects.values_list("name", "id"))
+    bulk_create(
+        User.groups.through,
+        [
+            User.groups.through(user_id=user.id, group_id=groups[user.user_type])
+            for user in users
+        ],
+    )
+    bulk_create(
+        StatusUpdate,
+        [
+            StatusUpdateFactory.build(user=user)
+            for user in teachers + students
+            for _ in range(config["STATUS_UPDATES_PER_USER"])
+        ],
+    )
+
+    courses = bulk_create(
+        Course,
+        [
+            CourseFactory.build(
+                teacher=rng.choice(teachers),
+                status=Course.OFFICIAL,
+                duration_weeks=config["WEEKS"],
+                last_modified=now,
+            )
+            for _ in range(config["COURSES"])
+        ],
+    )
+    bulk_create(
+        CourseMaterial,
+        [
+            # materials are unique by file name in a week
+            CourseMaterialFactory.build(
+                course=course, week_number=week, material=f"{i}-{fake.file_name()}"
+            )
+            for course in courses
+            for week in range(1, config["WEEKS"] + 1)
+            for i in range(config["MATERIALS_PER_WEEK"])
+        ],
+    )
+    bulk_create(
+        Assignment,
+        [
+            AssignmentFactory.build(
+                course=course, week_number=rng.randint(1, config["WEEKS"])
+            )
+            for course in courses
+            for _ in range(config["ASSIGNMENTS_PER_COURSE"])
+        ],
+    )
+
+    enrolments = {course.id: [] for course in courses}
+    per_student = min(config["ENROLMENTS_PER_STUDENT"], len(courses))
+    for student in students:
+        for course in rng.sample(courses, per_student):
+            enrolments[course.id].append(student)
+    bulk_create(
+        Enrolment,
+        [
+            EnrolmentFactory.build(student=student, course_id=course_id)
+            for course_id, course_students in enrolments.items()
+            for student in course_students
+        ],
+    )
+
+    chat_rooms = bulk_create(
+        ChatRoom,
+        [
+            ChatRoomFactory.build(
+                course=course, chat_name=f"{slugify(course.name)[:40]}-{course.id}"
+            )
+            for course in courses
+        ],
+    )
+    bulk_create(
+        ChatMembership,
+        [
+            ChatMembershipFactory.build(
+                user=student,
+                chat_room=room,
+                last_viewed_message=None,
+                last_active_timestamp=now,
+            )
+            for room in chat_rooms
+            for student in enrolments[room.course_id]
+        ],
+    )
+
+    # Messages of the last 90 days, oldest first, from the members of each room
+    senders = {
+        room.id: enrolments[room.course_id] or [room.course.teacher]
+        for room in chat_rooms
+    }
+    started_at = now - timedelta(days=90)
+    step = timedelta(days=90) / max(1, config["MESSAGES"])
+    for offset in range(0, config["MESSAGES"], BATCH_SIZE):
+        batch = []
+        for i in range(offset, min(offset + BATCH_SIZE, config["MESSAGES"])):
+            room = rng.choice(chat_rooms)
+            batch.append(
+                MessageFactory.build(
+                    chat_room=room,
+                    user=rng.choice(senders[room.id]),
+                    content=fake.sentence(),
+                    timestamp=started_at + step * i,
+                )
+            )
+        Message.objects.bulk_create(batch)
+
+    rebuild_search_index()
+    rebuild_catalogue_index()
+    rebuild_student_deadlines()
+
+    return {
+        "students": students,
+        "teachers": teachers,
+        "courses": courses,
+        "chat_rooms": chat_rooms,
+        "enrolments": enrolments,
+    }
+
+
+def measure_view(clients, urls, config):
+    """
+    Requests a view in turn as each sample user, and measures the requests after
+    the warmup ones.
+
+    :param clients: The logged in test clients of the sample users.
+    :type clients: list[Client]
+    :param urls: The URL requested by each client.
+    :type urls: list[str]
+    :param config: The benchmark configuration, see :data:`DEFAULT_BENCHMARK`.
+    :type config: dict
+
+    :return: The ``latency_ms``, ``db_ms`` and ``template_ms`` summaries, the
+        ``queries`` percentiles and the count of non-200 ``errors``.
+    :rtype: dict
+    """
+    from django.core.cache import cache
+
+    cache.clear()
+    latencies, queries, db_seconds, template_seconds = [], [], [], []
+    errors = 0
+
+    for i in range(config["WARMUP"] + config["REQUESTS"]):
+        client, url = clients[i % len(clients)], urls[i % len(urls)]
+        started_at = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - started_at
+
+        if i < config["WARMUP"]:
+            continue
+        if response.status_code != 200:
+            errors += 1
+        latencies.append(elapsed)
+        queries.append(response.metrics.queries)
+        db_seconds.append(response.metrics.db_seconds)
+        template_seconds.append(response.metrics.template_seconds)
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "latency_ms": summarize(latencies, 1000),
+        "queries": {
+            "p50": percentile(queries, 50),
+            "p99": percentile(queries, 99),
+            "max": max(queries),
+        },
+        "db_ms": summarize(db_seconds, 1000),
+        "template_ms": summarize(template_seconds, 1000),
+    }
+
+
+def benchmark_views(data, config):
+    """
+    Measures the home page, course page, week materials, chat room and user search
+    views, see :func:`measure_view`.
+
+    :param data: The seeded data, see :func:`seed`.
+    :type data: dict
+    :param config: The benchmark configuration, see :data:`DEFAULT_BENCHMARK`.
+    :type config: dict
+
+    :return: The measures of each view by URL name.
+    :rtype: dict[str, dict]
+    """
+    from django.test import Client
+    from django.urls import reverse
+
+    rng = random.Random(config["SEED"])
+    rooms = {room.course_id: room for room in data["chat_rooms"]}
+    enrolled = [
+        (student, course_id)
+        for course_id, students in data["enrolments"].items()
+        for student in students
+    ]
+    samples = rng.sample(enrolled, min(config["SAMPLE_USERS"], len(enrolled)))
+    teachers = rng.sample(
+        data["teachers"], min(config["SAMPLE_USERS"], len(data["teachers"]))
+    )
+
+    def login(user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    students = [login(student) for student, _ in samples]
+    searchers = [login(teacher) for teacher in teachers]
+    course_ids = [course_id for _, course_id in samples]
+
+    return {
+        "home": measure_view(students, [reverse("home")], config),
+        "official": measure_view(
+            students,
+            [reverse("official", kwargs={"course_id": id}) for id in course_ids],
+            config,
+        ),
+        "get_week_materials": measure_view(
+            students,
+            [
+                reverse(
+                    "get_week_materials", kwargs={"course_id": id, "week_number": 1}
+                )
+                for id in course_ids
+            ],
+            config,
+        ),
+        "room": measure_view(
+            students,
+            [
+                reverse("room", kwargs={"room_name": rooms[id].chat_name})
+                for id in course_ids
+            ],
+            config,
+        ),
+        "search": measure_view(
+            searchers,
+            [
+                f"{reverse('search')}?q={student.last_name[:3]}"
+                for student, _ in samples
+            ],
+            config,
+        ),
+    }
+
+
+async def receive_chat_messages(communicator, count):
+    """
+    Receives ``count`` chat.message frames, skipping the other frames.
+
+    :return: The times the frames were received, in order.
+    :rtype: list[float]
+    """
+    received = []
+    while len(received) < count:
+        frame = await communicator.receive_json_from(timeout=CHAT_TIMEOUT)
+        if frame.get("type") == "chat.message":
+            received.append(time.perf_counter())
+    return received
+
+
+async def run_chat_benchmark(room, users, messages):
+    """
+    Connects the users to a chat room, then measures the fan-out latency of
+    messages sent one at a time and the throughput of messages sent back to back.
+
+    :param room: The chat room.
+    :type room: ChatRoom
+    :param users: The users to connect, the first one sends the messages.
+    :type users: list[User]
+    :param messages: The messages sent by each phase.
+    :type messages: int
+
+    :return: The ``fanout_latency_ms`` summary, from sending a message until every
+        connection received it, and the ``messages_per_second`` and
+        ``deliveries_per_second`` of the back to back phase.
+    :rtype: dict
+    """
+    from channels.testing import WebsocketCommunicator
+
+    from chat.consumers import ChatConsumer
+
+    communicators = []
+    for user in users:
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chat/{room.chat_name}/"
+        )
+        communicator.scope["user"] = user
+        communicator.scope["url_route"] = {"kwargs": {"room_name": room.chat_name}}
+        connected, _ = await communicator.connect(timeout=CHAT_TIMEOUT)
+        if not connected:
+            raise RuntimeError(f"{user.username} could not connect to {room}.")
+        communicators.append(communicator)
+
+    sender = communicators[0]
+
+    async def send(i):
+        await sender.send_json_to(
+            {"message": {"chat_room": room.id, "content": f"benchmark message {i}"}}
+        )
+
+    try:
+        fanout = []
+        for i in range(messages):
+            sent_at = time.perf_counter()
+            await send(i)
+            received = await asyncio.gather(
+                *(receive_chat_messages(c, 1) for c in communicators)
+            )
+            fanout.append(max(times[0] for times in received) - sent_at)
+
+        started_at = time.perf_counter()
+        for i in range(messages):
+            await send(i)
+        await asyncio.gather(
+            *(receive_chat_messages(c, messages) for c in communicators)
+        )
+        elapsed = time.perf_counter() - started_at
+    finally:
+        for communicator in communicators:
+            await communicator.disconnect()
+
+    return {
+        "connections": len(communicators),
+        "messages": messages,
+        "fanout_latency_ms": summarize(fanout, 1000),
+        "messages_per_second": round(messages / elapsed, 1),
+        "deliveries_per_second": round(messages * len(communicators) / elapsed, 1),
+    }
+
+
+def benchmark_chat(data, config):
+    """
+    Measures ChatConsumer over the in-memory channel layer, with the rate limits
+    disabled, in the room of the course with the most students.
+
+    :param data: The seeded data, see :func:`seed`.
+    :type data: dict
+    :param config: The benchmark configuration, see :data:`DEFAULT_BENCHMARK`.
+    :type config: dict
+
+    :return: See :func:`run_chat_benchmark`.
+    :rtype: dict
+    """
+    from asgiref.sync import async_to_sync
+    from django.test.utils import override_settings
+
+    room = max(data["chat_rooms"], key=lambda r: len(data["enrolments"][r.course_id]))
+    users = data["enrolments"][room.course_id][: config["CHAT_CONNECTIONS"]]
+    channel_layers = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+            "CONFIG": {"capacity": max(100, config["CHAT_MESSAGES"] * 2)},
+        }
+    }
+
+    with override_settings(
+        CHANNEL_LAYERS=channel_layers, CHAT_RATE_LIMIT={"ENABLED": False}
+    ):
+        return async_to_sync(run_chat_benchmark)(room, users, config["CHAT_MESSAGES"])
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(config=None):
+    """
+    Seeds the current database and runs every benchmark.
+
+    :param config: The configuration merged over :data:`DEFAULT_BENCHMARK`.
+    :type config: dict or None
+
+    :return: The report, with the ``commit``, ``environment``, ``config``,
+        ``seed_seconds``, the measures of the ``views`` and of the ``chat``.
+    :rtype: dict
+    """
+    import django
+    from django.db import connection
+    from django.utils import timezone
+
+    config = {**DEFAULT_BENCHMARK, **(config or {})}
+
+    started_at = time.perf_counter()
+    data = seed(config)
+    seed_seconds = time.perf_counter() - started_at
+
+    return {
+        "version": REPORT_VERSION,
+        "created_at": timezone.now().isoformat(),
+        "commit": get_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+        },
+        "config": config,
+        "seed_seconds": round(seed_seconds, 1),
+        "views": benchmark_views(data, config),
+        "chat": benchmark_chat(data, config),
+    }
+
+
+def compare_reports(baseline, report, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares a report with the report of a baseline, e.g. of the main branch.
+
+    Latencies slower and throughputs lower by more than ``threshold``, and any
+    additional query, are regressions.
+
+    :param baseline: The report of the baseline.
+    :type baseline: dict
+    :param report: The report to compare.
+    :type report: dict
+    :param threshold: The tolerated relative slowdown.
+    :type threshold: float
+
+    :return: Rows of the metric, its baseline and current values, the relative
+        change and whether it regressed.
+    :rtype: list[tuple[str, float, float, float or None, bool]]
+    """
+    rows = []
+
+    def compare(metric, before, after, higher_is_better=False, tolerance=threshold):
+        change = (after - before) / before if before else None
+        worse = -change if higher_is_better and change is not None else change
+        regressed = worse is not None and worse > tolerance
+        rows.append((metric, before, after, change, regressed))
+
+    for name, measures in report["views"].items():
+        before = baseline["views"].get(name)
+        if before is None:
+            continue
+        for stat in ("p50", "p99"):
+            compare(
+                f"views.{name}.latency_ms.{stat}",
+                before["latency_ms"][stat],
+                measures["latency_ms"][stat],
+            )
+        compare(
+            f"views.{name}.queries.max",
+            before["queries"]["max"],
+            measures["queries"]["max"],
+            tolerance=0,
+        )
+
+    if "chat" in baseline:
+        for stat in ("p50", "p99"):
+            compare(
+                f"chat.fanout_latency_ms.{stat}",
+                baseline["chat"]["fanout_latency_ms"][stat],
+                report["chat"]["fanout_latency_ms"][stat],
+            )
+        compare(
+            "chat.messages_per_second",
+            baseline["chat"]["messages_per_second"],
+            report["chat"]["messages_per_second"],
+            higher_is_better=True,
+        )
+
+    return rows
+
+
+def format_comparison(rows):
+    lines = []
+    for metric, before, after, change, regressed in rows:
+        change = "n/a" if change is None else f"{change:+.1%}"
+        flag = "  REGRESSION" if regressed else ""
+        lines.append(f"{metric:<45} {before:>12} {after:>12} {change:>9}{flag}")
+    return "\n".join(lines)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m eLearningApp.benchmarks",
+        description="Benchmarks the views and the chat consumer on a seeded test "
+        "database, and writes a JSON report.",
+    )
+    for name, default in DEFAULT_BENCHMARK.items():
+        parser.add_argument(
+            f"--{name.lower().replace('_', '-')}",
+            dest=name,
+            type=type(default),
+            default=default,
+            help=f"default: {default}",
+        )
+    parser.add_argument("--output", help="Write the report to this file.")
+    parser.add_argument(
+        "--compare",
+        metavar="BASELINE",
+        help="Compare the report with this report, and fail on regressions.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Relative slowdown tolerated by --compare (default: %(default)s).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs the benchmarks on a test database created for the run.
+
+    :return: The exit status, 1 if the comparison found regressions.
+    :rtype: int
+    """
+    args = parse_args(argv)
+    config = {name: getattr(args, name) for name in DEFAULT_BENCHMARK}
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "eLearningApp.settings")
+    import django
+
+    django.setup()
+
+    from django.test.utils import override_settings, setup_databases, teardown_databases
+
+    # Unlike setup_test_environment, keeps the templates uninstrumented so the
+    # render times are those of production. The cache is local so the entries of
+    # the seeded rows neither need a Redis server nor leak into a shared cache.
+    test_settings = override_settings(
+        ALLOWED_HOSTS=["testserver"],
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        },
+        EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    )
+    databases = setup_databases(verbosity=0, interactive=False)
+    try:
+        with test_settings:
+            report = run_benchmarks(config)
+    finally:
+        teardown_databases(databases, verbosity=0)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as file:
+            rows = compare_reports(json.load(file), report, args.threshold)
+        print(format_comparison(rows), file=sys.stderr)
+        if any(regressed for *_, regressed in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
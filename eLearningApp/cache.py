@@ -0,0 +1,37 @@
+from urllib.parse import urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+# Schemes of the Redis URLs accepted by django.core.cache.backends.redis.RedisCache
+REDIS_SCHEMES = ("redis", "rediss", "unix")
+
+
+def cache_config(env):
+    """
+    Returns the settings of the default cache of the ``CACHE_URL`` environment
+    variable.
+
+    A Redis URL, e.g. ``redis://redis:6379/1``, selects a Redis cache shared by the
+    web, ASGI and Celery processes, so an entry invalidated by one of them is
+    invalidated for all of them. Without it every process has its own local memory
+    cache, which is enough for a single process, e.g. the development server or the
+    tests.
+
+    :param env: The environment variables.
+    :type env: Mapping[str, str]
+
+    :return: The settings of the default cache.
+    :rtype: dict
+
+    :raises ImproperlyConfigured: If the URL is not a Redis URL.
+    """
+    url = env.get("CACHE_URL")
+    if not url:
+        return {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+
+    scheme = urlsplit(url).scheme
+    if scheme not in REDIS_SCHEMES:
+        raise ImproperlyConfigured(
+            f"CACHE_URL must be a Redis URL, not a {scheme or 'relative'} URL."
+        )
+    return {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": url}
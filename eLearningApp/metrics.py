@@ -0,0 +1,404 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS = {
+    "ENABLED": True,
+    "ALLOWED_IPS": ("127.0.0.1", "::1"),  # clients allowed to scrape the endpoint
+    "QUERY_BUDGETS": {},  # most queries a request of a URL name may run
+}
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Label naming the series of each kind of measurement
+KIND_LABELS = {"http": "view", "websocket": "event"}
+
+# Name of the requests whose URL did not resolve to a view
+UNRESOLVED = "<unresolved>"
+
+_current = ContextVar("metrics_measurement", default=None)
+
+
+def get_metrics_config():
+    """
+    Returns the metrics configuration merged over the defaults.
+
+    :return: The ``METRICS`` setting merged over :data:`DEFAULT_METRICS`.
+    :rtype: dict
+    """
+    return {**DEFAULT_METRICS, **getattr(settings, "METRICS", {})}
+
+
+def get_query_budget(name):
+    """
+    Returns the query budget of a URL name.
+
+    :param name: The URL name of the view, with its namespace.
+    :type name: str
+
+    :return: The most queries a request may run, or None without a budget.
+    :rtype: int or None
+    """
+    return get_metrics_config()["QUERY_BUDGETS"].get(name)
+
+
+class Measurement:
+    """
+    Queries, database time and template render time of a request or a WebSocket
+    event, accumulated while it is handled.
+    """
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.rendering = False
+        self.started_at = time.perf_counter()
+        self.seconds = None
+
+    def stop(self):
+        self.seconds = time.perf_counter() - self.started_at
+
+
+class Series:
+    """
+    Totals of the measurements of a URL name or WebSocket event type.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, measurement):
+        self.count += 1
+        self.queries += measurement.queries
+        self.db_seconds += measurement.db_seconds
+        self.template_seconds += measurement.template_seconds
+        self.seconds += measurement.seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if measurement.seconds <= bound:
+                self.buckets[i] += 1
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "queries": self.queries,
+            "db_seconds": self.db_seconds,
+            "template_seconds": self.template_seconds,
+            "seconds": self.seconds,
+            "buckets": list(self.buckets),
+        }
+
+
+class MetricsRegistry:
+    """
+    Process-wide totals of the measured requests and WebSocket events.
+    """
+
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def record(self, measurement):
+        with self._lock:
+            key = (measurement.kind, measurement.name)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = Series()
+            series.add(measurement)
+
+    def snapshot(self):
+        """
+        Returns the totals of every series.
+
+        :return: The ``count``, ``queries``, ``db_seconds``, ``template_seconds``,
+            ``seconds`` and cumulative latency ``buckets`` of each series, keyed by
+            its kind and name.
+        :rtype: dict[tuple[str, str], dict]
+        """
+        with self._lock:
+            return {key: series.as_dict() for key, series in self._series.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+registry = MetricsRegistry()
+
+
+def get_current_measurement():
+    """
+    Returns the measurement of the request or WebSocket event being handled.
+
+    :rtype: Measurement or None
+    """
+    return _current.get()
+
+
+@contextmanager
+def measure(kind, name):
+    """
+    Measures the block as a request or WebSocket event, recording it in the
+    registry when it exits. The name may be changed on the yielded measurement
+    until then, e.g. once the URL of a request is resolved.
+
+    Database queries run in ``sync_to_async`` threads are counted too, as those
+    threads copy the context of their caller.
+
+    :param kind: The kind of the measurement, one of :data:`KIND_LABELS`.
+    :type kind: str
+    :param name: The URL name or WebSocket event type.
+    :type name: str
+
+    :return: The measurement.
+    :rtype: Iterator[Measurement]
+    """
+    measurement = Measurement(kind, name)
+    token = _current.set(measurement)
+    try:
+        yield measurement
+    finally:
+        _current.reset(token)
+        measurement.stop()
+        registry.record(measurement)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting and timing the queries of the current
+    measurement.
+    """
+    measurement = _current.get()
+    if measurement is None:
+        return execute(sql, params, many, context)
+
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        measurement.queries += 1
+        measurement.db_seconds += time.perf_counter() - started_at
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+def instrument_open_connections():
+    """
+    Installs the query recorder on the connections this thread opened before this
+    module was imported. Later connections install it when they are created.
+    """
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(connection)
+
+
+@contextmanager
+def measure_template():
+    """
+    Adds the time spent in the block to the template render time of the current
+    measurement. Templates rendered while another one renders are not counted twice.
+    """
+    measurement = _current.get()
+    if measurement is None or measurement.rendering:
+        yield
+        return
+
+    measurement.rendering = True
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        measurement.template_seconds += time.perf_counter() - started_at
+        measurement.rendering = False
+
+
+def get_view_name(request):
+    """
+    Returns the URL name of the view of a request, with its namespace.
+
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+
+    :rtype: str
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None or not match.url_name:
+        return UNRESOLVED
+    return match.view_name
+
+
+class MetricsMiddleware:
+    """
+    Measures every request by the URL name of its view, and logs the requests
+    running more queries than the budget of their view.
+
+    The measurement is attached to the response as ``response.metrics``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = get_metrics_config()["ENABLED"]
+        instrument_open_connections()
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        with measure("http", UNRESOLVED) as measurement:
+            response = self.get_response(request)
+            measurement.name = get_view_name(request)
+
+        response.metrics = measurement
+        budget = get_query_budget(measurement.name)
+        if budget is not None and measurement.queries > budget:
+            logger.warning(
+                "%s ran %d queries, over its budget of %d",
+                measurement.name,
+                measurement.queries,
+                budget,
+            )
+        return response
+
+
+class InstrumentedConsumerMixin:
+    """
+    Measures every message handled by a consumer by its type, e.g.
+    ``websocket.receive`` or ``chat.message``.
+    """
+
+    async def dispatch(self, message):
+        with measure("websocket", message["type"]):
+            await super().dispatch(message)
+
+
+def escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics(snapshot, rate_limit_stats=None):
+    """
+    Renders the totals of the registry in the Prometheus text exposition format.
+
+    :param snapshot: The totals, see :meth:`MetricsRegistry.snapshot`.
+    :type snapshot: dict
+    :param rate_limit_stats: The counters of the chat rate limiters, see
+        :func:`chat.ratelimit.get_rate_limit_stats`.
+    :type rate_limit_stats: dict[str, int] or None
+
+    :return: The metrics text.
+    :rtype: str
+    """
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    for kind, label in KIND_LABELS.items():
+        series = sorted(
+            (name, totals) for (k, name), totals in snapshot.items() if k == kind
+        )
+        prefix = f"elearning_{kind}"
+        subject = "requests" if kind == "http" else "WebSocket events"
+
+        family(f"{prefix}_duration_seconds", "histogram", f"Latency of {subject}.")
+        for name, totals in series:
+            labels = f'{label}="{escape_label(name)}"'
+            for bound, count in zip(LATENCY_BUCKETS, totals["buckets"]):
+                lines.append(
+                    f'{prefix}_duration_seconds_bucket{{{labels},le="{bound}"}} {count}'
+                )
+            lines.append(
+                f'{prefix}_duration_seconds_bucket{{{labels},le="+Inf"}} '
+                f"{totals['count']}"
+            )
+            lines.append(
+                f"{prefix}_duration_seconds_sum{{{labels}}} {totals['seconds']}"
+            )
+            lines.append(
+                f"{prefix}_duration_seconds_count{{{labels}}} {totals['count']}"
+            )
+
+        for metric, key, help_text in (
+            ("db_queries_total", "queries", f"Database queries run by {subject}."),
+            (
+                "db_duration_seconds_total",
+                "db_seconds",
+                f"Time {subject} spent in database queries.",
+            ),
+            (
+                "template_duration_seconds_total",
+                "template_seconds",
+                f"Time {subject} spent rendering templates.",
+            ),
+        ):
+            family(f"{prefix}_{metric}", "counter", help_text)
+            for name, totals in series:
+                labels = f'{label}="{escape_label(name)}"'
+                lines.append(f"{prefix}_{metric}{{{labels}}} {totals[key]}")
+
+    if rate_limit_stats is not None:
+        family(
+            "elearning_chat_rate_limit_frames_total",
+            "counter",
+            "Chat frames handled by the rate limiters, by result.",
+        )
+        for result, count in sorted(rate_limit_stats.items()):
+            lines.append(
+                f'elearning_chat_rate_limit_frames_total{{result="{result}"}} {count}'
+            )
+
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """
+    Exports the metrics of this process to Prometheus, for the clients of the
+    ``ALLOWED_IPS`` only.
+
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+
+    :return: The metrics text.
+    :rtype: HttpResponse
+
+    :raises Http404: If the metrics are disabled or the client is not allowed.
+    """
+    from chat.ratelimit import get_rate_limit_stats
+
+    config = get_metrics_config()
+    if (
+        not config["ENABLED"]
+        or request.META.get("REMOTE_ADDR") not in config["ALLOWED_IPS"]
+    ):
+        raise Http404
+
+    return HttpResponse(
+        render_metrics(registry.snapshot(), get_rate_limit_stats()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -10,8 +10,14 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from celery.schedules import crontab
+
+from eLearningApp.cache import cache_config
+from eLearningApp.database import database_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 print(BASE_DIR)
@@ -72,6 +78,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "eLearningApp.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -86,7 +93,7 @@ ROOT_URLCONF = "eLearningApp.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "eLearningApp.backends.templates.DjangoTemplates",
         "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -105,12 +112,11 @@ WSGI_APPLICATION = "eLearningApp.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
-}
+# The DATABASE_PROFILE environment variable picks the backend, see
+# eLearningApp.database: "sqlite" (default) for a single node, in WAL mode,
+# "postgres" with persistent connections, or "pgbouncer" for PostgreSQL behind a
+# transaction pooler.
+DATABASES = {"default": database_config(os.environ, BASE_DIR)}
 
 
 # Password validation
@@ -157,6 +163,67 @@ STATIC_ROOT = BASE_DIR / "static"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Chunked, resumable material uploads are streamed straight to MEDIA_ROOT, so peak
+# memory is bounded by BLOCK_SIZE whatever the size of the file.
+MATERIAL_UPLOAD = {
+    "CHUNK_SIZE": 8 * 1024 * 1024,  # largest chunk accepted per request
+    "BLOCK_SIZE": 64 * 1024,  # bytes read from the request body at a time
+    "MAX_SIZE": 2 * 1024 * 1024 * 1024,  # largest material accepted
+}
+
+# Uploaded materials are processed by a Celery chord of subtasks, one per batch of
+# files, whose results are aggregated once they are all done.
+MATERIAL_UPLOAD_TASKS = {
+    "FILES_PER_TASK": 1,  # smallest number of files handled by one subtask
+    "MAX_PARALLEL": 8,  # most subtasks queued for one upload
+    "MAX_RETRIES": 3,  # attempts of a failed file after the first one
+    "RETRY_DELAY": 5,  # seconds before a failed file is retried
+    "QUEUE": None,  # e.g. a queue served by a worker with limited concurrency
+}
+
+# Ranked user search, see users.search
+USER_SEARCH = {
+    "AUTOCOMPLETE_LIMIT": 10,  # most suggestions returned per keystroke
+    "MIN_QUERY_LENGTH": 3,  # shorter autocomplete queries return no suggestion
+}
+
+# Seconds the groups and enrolments of a user checked by the access decorators stay
+# cached, see users.access. Entries are invalidated when the groups, enrolments or
+# ban flags of the user change.
+USER_ACCESS_TIMEOUT = 300
+
+# Query count, database time, template render time and latency of every request by
+# URL name, and of every chat WebSocket event by type, see eLearningApp.metrics. They
+# are exported to Prometheus at /metrics/ for the ALLOWED_IPS only, and requests over
+# the query budget of their URL name are logged.
+METRICS = {
+    "ALLOWED_IPS": ("127.0.0.1", "::1"),
+    "QUERY_BUDGETS": {
+        "chat": 4,
+        "courses": 7,
+        "get_week_materials": 6,
+        "home": 7,
+        "official": 12,
+        "room": 9,
+        "user_home": 6,
+    },
+}
+
+# Course catalogue search, see courses.catalogue
+COURSE_CATALOGUE = {
+    "PAGE_SIZE": 12,  # courses per catalogue page
+}
+
+# Notifications and emails sent to every student of a course
+COURSE_FANOUT = {
+    "BATCH_SIZE": 500,  # recipients loaded, emailed and notified at a time
+    "FROM_EMAIL": "awdtest04@gmail.com",
+}
+
+# Seconds the shared content of a course week stays cached, see courses.week_content.
+# It is invalidated when the materials, assignments or course of the week change.
+COURSE_WEEK_CONTENT_TIMEOUT = 300
+
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 # CKEditor configuration
@@ -241,3 +308,70 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# The CACHE_URL environment variable picks the cache, see eLearningApp.cache: a
+# Redis URL for a cache shared by the web, ASGI and Celery processes, e.g.
+# redis://redis:6379/1 with docker, otherwise a local memory cache per process.
+CACHES = {"default": cache_config(os.environ)}
+
+# Chat
+CHAT_HISTORY_PAGE_SIZE = 50  # messages rendered per page of the chat room history
+
+# Persist chat messages in batches from a per-process buffer instead of one INSERT
+# per message. Messages are broadcast immediately with a provisional id.
+CHAT_WRITE_BEHIND = {
+    "ENABLED": False,
+    "BATCH_SIZE": 100,  # flush as soon as this many messages are pending
+    "FLUSH_INTERVAL": 0.5,  # seconds between flushes
+}
+
+# Also encode broadcast frames as msgpack for clients negotiating the chat.msgpack
+# WebSocket subprotocol. Every frame is still encoded as JSON for the other clients,
+# so this doubles the encoding work of each broadcast: only enable it for clients
+# that use the subprotocol.
+CHAT_MSGPACK_FRAMES = False
+
+# Online users of each chat room, shared by every ASGI worker. The registry is
+# stored alongside the default channel layer unless a BACKEND is given.
+CHAT_PRESENCE = {
+    "TTL": 60,  # seconds a connection stays online without a heartbeat
+    "HEARTBEAT_INTERVAL": 20,  # seconds between heartbeats of a connection
+}
+
+# Token buckets limiting the frames of each chat connection, and of all connections
+# to a room in one worker. Over-limit messages are rejected with a chat.error frame.
+CHAT_RATE_LIMIT = {
+    "CONNECTION_RATE": 5,  # frames per second
+    "CONNECTION_BURST": 10,
+    "ROOM_RATE": 50,  # frames per second
+    "ROOM_BURST": 100,
+}
+
+# Seconds the access of a user to a chat room stays cached. Entries are invalidated
+# when enrolments, chat rooms or courses change, which only reaches every ASGI worker
+# if they share the default cache (e.g. django.core.cache.backends.redis.RedisCache).
+CHAT_ROOM_ACCESS_TIMEOUT = 300
+
+# Seconds the member list of a chat room stays cached. It is invalidated when
+# enrolments, chat memberships or the course of the room change.
+CHAT_ROSTER_TIMEOUT = 300
+
+# Messages fetched per database round trip when streaming a chat transcript export
+CHAT_TRANSCRIPT_CHUNK_SIZE = 2000
+
+# Move old chat messages out of the database into gzipped JSON Lines segments under
+# ARCHIVE_ROOT. The threshold of each course is its chat RetentionPolicy, courses
+# without one use ARCHIVE_AFTER_DAYS (None keeps their messages in the database).
+CHAT_RETENTION = {
+    "ARCHIVE_AFTER_DAYS": None,
+    "SEGMENT_SIZE": 5000,  # messages per archive segment
+    "ARCHIVE_ROOT": BASE_DIR / "archive" / "chat",
+}
+
+# Celery beat
+CELERY_BEAT_SCHEDULE = {
+    "archive-chat-messages": {
+        "task": "chat.tasks.archive_chat_messages",
+        "schedule": crontab(hour=3, minute=0),  # daily, outside of class hours
+    },
+}
@@ -0,0 +1,31 @@
+import pytest
+
+from eLearningApp.metrics import get_query_budget, registry
+
+
+@pytest.fixture
+def metrics_registry():
+    """
+    Yields the metrics registry, emptied before and after the test.
+    """
+    registry.reset()
+    yield registry
+    registry.reset()
+
+
+def assert_query_budget(response):
+    """
+    Asserts that the request of a test client response ran at most the query budget
+    of its URL name, see the ``QUERY_BUDGETS`` of the ``METRICS`` setting.
+
+    :param response: The response of the test client.
+    :type response: HttpResponse
+    """
+    measurement = response.metrics
+    budget = get_query_budget(measurement.name)
+
+    assert budget is not None, f"{measurement.name} has no query budget"
+    assert measurement.queries <= budget, (
+        f"{measurement.name} ran {measurement.queries} queries, "
+        f"over its budget of {budget}"
+    )
@@ -0,0 +1,131 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from django.conf import settings
+
+from eLearningApp.benchmarks import compare_reports, percentile, run_benchmarks
+
+SMALL_BENCHMARK = {
+    "USERS": 40,
+    "COURSES": 4,
+    "MESSAGES": 200,
+    "WEEKS": 2,
+    "MATERIALS_PER_WEEK": 2,
+    "ASSIGNMENTS_PER_COURSE": 2,
+    "ENROLMENTS_PER_STUDENT": 2,
+    "STATUS_UPDATES_PER_USER": 1,
+    "TEACHER_RATIO": 0.1,
+    "REQUESTS": 4,
+    "WARMUP": 1,
+    "SAMPLE_USERS": 2,
+    "CHAT_CONNECTIONS": 3,
+    "CHAT_MESSAGES": 5,
+}
+
+
+def report(latency, queries, messages_per_second):
+    return {
+        "views": {
+            "home": {
+                "latency_ms": {"p50": latency, "p99": latency * 2},
+                "queries": {"max": queries},
+            }
+        },
+        "chat": {
+            "fanout_latency_ms": {"p50": 1.0, "p99": 2.0},
+            "messages_per_second": messages_per_second,
+        },
+    }
+
+
+def regressions(rows):
+    return [metric for metric, *_, regressed in rows if regressed]
+
+
+class TestBenchmarkReports:
+    def test_percentile_is_nearest_rank(self):
+        values = [5, 1, 4, 2, 3]
+
+        assert percentile(values, 50) == 3
+        assert percentile(values, 99) == 5
+        assert percentile(values, 0) == 1
+
+    def test_comparison_tolerates_the_threshold(self):
+        rows = compare_reports(report(10.0, 6, 100.0), report(11.0, 6, 90.0))
+
+        assert len(rows) == 6
+        assert regressions(rows) == []
+
+    def test_comparison_flags_slowdowns_and_extra_queries(self):
+        rows = compare_reports(report(10.0, 6, 100.0), report(15.0, 7, 50.0))
+
+        assert regressions(rows) == [
+            "views.home.latency_ms.p50",
+            "views.home.latency_ms.p99",
+            "views.home.queries.max",
+            "chat.messages_per_second",
+        ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_benchmarks_run_on_small_volumes():
+    result = run_benchmarks(SMALL_BENCHMARK)
+
+    assert result["config"]["USERS"] == 40
+    assert set(result["views"]) == {
+        "home",
+        "official",
+        "get_week_materials",
+        "room",
+        "search",
+    }
+    for name, measures in result["views"].items():
+        assert measures["requests"] == 4, name
+        assert measures["errors"] == 0, name
+        assert measures["queries"]["max"] > 0, name
+        assert measures["latency_ms"]["p50"] <= measures["latency_ms"]["p99"]
+
+    assert result["chat"]["connections"] == 3
+    assert result["chat"]["messages_per_second"] > 0
+    assert result["chat"]["deliveries_per_second"] == pytest.approx(
+        result["chat"]["messages_per_second"] * 3, rel=0.01
+    )
+
+
+def test_main_runs_with_the_default_settings(tmp_path):
+    # main() creates its own test database, so it runs in a process of its own
+    options = [
+        f"--{name.lower().replace('_', '-')}={value}"
+        for name, value in SMALL_BENCHMARK.items()
+    ]
+    output = tmp_path / "report.json"
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "eLearningApp.settings",
+        # Unreachable, so the run fails if the benchmarks use the configured cache
+        "CACHE_URL": "redis://unreachable.invalid:6379/1",
+    }
+
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "eLearningApp.benchmarks",
+            *options,
+            "--output",
+            str(output),
+        ],
+        cwd=settings.BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+
+    assert process.returncode == 0, process.stderr
+    report = json.loads(output.read_text())
+    assert report["config"]["USERS"] == 40
+    assert all(measures["errors"] == 0 for measures in report["views"].values())
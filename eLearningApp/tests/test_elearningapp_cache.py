@@ -0,0 +1,25 @@
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+
+from eLearningApp.cache import cache_config
+
+
+class TestCacheConfig:
+    def test_local_memory_is_the_default(self):
+        assert cache_config({}) == {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+        }
+
+    def test_redis_url_selects_a_shared_cache(self):
+        config = cache_config({"CACHE_URL": "redis://redis:6379/1"})
+
+        assert config == {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": "redis://redis:6379/1",
+        }
+
+    @pytest.mark.parametrize("url", ["memcached://cache:11211", "cache:6379"])
+    def test_other_urls_are_rejected(self, url):
+        with pytest.raises(ImproperlyConfigured):
+            cache_config({"CACHE_URL": url})
+
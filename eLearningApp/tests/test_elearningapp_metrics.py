@@ -0,0 +1,195 @@
+import logging
+
+import pytest
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+
+from chat.consumers import ChatConsumer
+from chat.tests.factories import ChatRoomFactory
+from chat.tests.fixtures import chatRoom, in_memory_channel_layer
+from courses.tests.factories import (
+    AssignmentFactory,
+    CourseMaterialFactory,
+    EnrolmentFactory,
+)
+from courses.tests.fixtures import (
+    enrol,
+    enrolled_student_user,
+    official_course,
+    teacher_user,
+)
+from eLearningApp.metrics import UNRESOLVED, render_metrics
+from eLearningApp.tests.fixtures import assert_query_budget, metrics_registry
+from users.tests.factories import StatusUpdateFactory
+
+
+@pytest.mark.django_db
+class TestMetricsMiddleware:
+    @pytest.fixture(autouse=True)
+    def setup(self, enrol, enrolled_student_user, official_course, metrics_registry):
+        self.client = Client()
+        self.client.force_login(enrolled_student_user)
+        self.official_course = official_course
+        self.registry = metrics_registry
+
+    def test_requests_are_measured_by_url_name(self):
+        url = reverse("official", kwargs={"course_id": self.official_course.id})
+        response = self.client.get(url)
+        self.client.get(url)
+
+        assert response.metrics.name == "official"
+        assert response.metrics.queries > 0
+        assert response.metrics.template_seconds > 0
+
+        totals = self.registry.snapshot()[("http", "official")]
+        assert totals["count"] == 2
+        assert totals["queries"] >= 2 * response.metrics.queries - 2
+        assert totals["buckets"][-1] <= totals["count"]
+        assert totals["seconds"] >= totals["db_seconds"]
+
+    def test_unresolved_urls_share_a_series(self):
+        response = self.client.get("/no-such-page/")
+
+        assert response.status_code == 404
+        assert response.metrics.name == UNRESOLVED
+
+    def test_requests_over_budget_are_logged(self, settings, caplog):
+        settings.METRICS = {"QUERY_BUDGETS": {"courses": 0}}
+
+        with caplog.at_level(logging.WARNING, logger="eLearningApp.metrics"):
+            self.client.get(reverse("courses"))
+
+        assert "courses ran" in caplog.text
+        assert "over its budget of 0" in caplog.text
+
+
+@pytest.mark.django_db
+class TestMetricsEndpoint:
+    def test_metrics_are_exported_to_local_clients(self, metrics_registry):
+        client = Client()
+        client.get("/no-such-page/")
+
+        response = client.get(reverse("metrics"))
+
+        assert response.status_code == 200
+        assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+        text = response.content.decode()
+        assert 'elearning_http_duration_seconds_count{view="<unresolved>"} 1' in text
+        assert "# TYPE elearning_http_db_queries_total counter" in text
+        assert 'elearning_chat_rate_limit_frames_total{result="allowed"}' in text
+
+    def test_metrics_are_hidden_from_other_clients(self):
+        response = Client(REMOTE_ADDR="203.0.113.7").get(reverse("metrics"))
+
+        assert response.status_code == 404
+
+    def test_label_values_are_escaped(self):
+        totals = {
+            "count": 1,
+            "queries": 2,
+            "db_seconds": 0.5,
+            "template_seconds": 0.0,
+            "seconds": 1.0,
+            "buckets": [0] * 11,
+        }
+
+        text = render_metrics({("websocket", 'chat."frame"'): totals})
+
+        assert (
+            'elearning_websocket_db_queries_total{event="chat.\\"frame\\""} 2' in text
+        )
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+class TestInstrumentedConsumer:
+    @pytest.fixture(autouse=True)
+    def setup(
+        self,
+        enrol,
+        enrolled_student_user,
+        chatRoom,
+        in_memory_channel_layer,
+        metrics_registry,
+    ):
+        cache.clear()
+        self.chatRoom = chatRoom
+        self.user = enrolled_student_user
+        self.registry = metrics_registry
+
+    async def test_events_are_measured_by_type(self):
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chat/{self.chatRoom.chat_name}/"
+        )
+        communicator.scope["user"] = self.user
+        communicator.scope["url_route"] = {
+            "kwargs": {"room_name": self.chatRoom.chat_name}
+        }
+        connected, _ = await communicator.connect()
+        assert connected
+
+        await communicator.send_json_to(
+            {"action": "get_user_data", "chat_room_id": self.chatRoom.id}
+        )
+        await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        snapshot = self.registry.snapshot()
+        assert snapshot[("websocket", "websocket.connect")]["count"] == 1
+        assert snapshot[("websocket", "websocket.connect")]["queries"] > 0
+        assert snapshot[("websocket", "websocket.receive")]["count"] == 1
+        assert snapshot[("websocket", "websocket.disconnect")]["count"] == 1
+
+
+@pytest.mark.django_db
+class TestQueryBudgets:
+    """
+    Requests of the budgeted views, with enough rows to expose queries run per row.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self, enrol, enrolled_student_user, teacher_user, official_course):
+        EnrolmentFactory.create_batch(5, course=official_course)
+        CourseMaterialFactory.create_batch(5, course=official_course, week_number=1)
+        AssignmentFactory.create_batch(5, course=official_course, week_number=1)
+        StatusUpdateFactory.create_batch(5, user=enrolled_student_user)
+        ChatRoomFactory(course=official_course, chat_name="budget-room")
+
+        self.student = enrolled_student_user
+        self.teacher = teacher_user
+        self.course = official_course
+
+    def get(self, user, url):
+        client = Client()
+        client.force_login(user)
+        # e.g. the unread notification count is cached for a few seconds, measure
+        # every view without the entries cached by the previous requests
+        cache.clear()
+        response = client.get(url)
+        assert response.status_code == 200
+        return response
+
+    def course_urls(self):
+        return [
+            reverse("official", kwargs={"course_id": self.course.id}),
+            reverse(
+                "get_week_materials",
+                kwargs={"course_id": self.course.id, "week_number": 1},
+            ),
+            reverse("room", kwargs={"room_name": "budget-room"}),
+        ]
+
+    def test_student_views_are_within_budget(self):
+        urls = [reverse("home"), reverse("courses"), reverse("chat")]
+        for url in urls + self.course_urls():
+            assert_query_budget(self.get(self.student, url))
+
+    def test_teacher_views_are_within_budget(self):
+        urls = [
+            reverse("home"),
+            reverse("user_home", kwargs={"username": self.student.username}),
+        ]
+        for url in urls + self.course_urls():
+            assert_query_budget(self.get(self.teacher, url))
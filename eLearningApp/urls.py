@@ -22,6 +22,7 @@ from django.conf.urls.static import static
 from ckeditor_uploader.views import upload
 from django.views.generic import RedirectView
 from elearning_auth.decorators import custom_login_required
+from eLearningApp.metrics import metrics_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -33,6 +34,7 @@ urlpatterns = [
     ),  # Include the chat app's URLs under the 'chat/' path
     path("ckeditor/upload/", custom_login_required(upload), name="ckeditor_upload"),
     path("ckeditor/", include("ckeditor_uploader.urls")),
+    path("metrics/", metrics_view, name="metrics"),
     path("docs/", RedirectView.as_view(url="/docs/index.html", permanent=False)),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
@@ -0,0 +1,195 @@
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+
+DEFAULT_USER_ACCESS_TIMEOUT = 300  # seconds
+
+# Access of anonymous users, who are never cached
+ANONYMOUS_ACCESS = {"groups": frozenset()}
+
+# Cached enrolment status of a student who is not enrolled in a course
+NOT_ENROLLED = "not_enrolled"
+
+
+def user_access_version_key(user_id):
+    return f"users:access:version:{user_id}"
+
+
+def user_access_key(user_id, version):
+    return f"users:access:{version}:{user_id}"
+
+
+def user_enrolment_key(user_id, course_id, version):
+    return f"users:access:{version}:{user_id}:enrolment:{course_id}"
+
+
+def get_user_access_timeout():
+    return getattr(settings, "USER_ACCESS_TIMEOUT", DEFAULT_USER_ACCESS_TIMEOUT)
+
+
+def get_user_access_version(user_id):
+    """
+    Returns the current version of the cached access of a user.
+
+    Versions are random tokens, so a version evicted from the cache can never be
+    reissued while the access of the old version is still cached.
+
+    :param user_id: The ID of the user.
+    :type user_id: int
+
+    :return: The version token of the user.
+    :rtype: str
+    """
+    return cache.get_or_set(user_access_version_key(user_id), uuid.uuid4().hex, None)
+
+
+def load_user_access(user_id):
+    """
+    Loads the groups of a user.
+
+    :param user_id: The ID of the user.
+    :type user_id: int
+
+    :return: The ``groups`` names of the user.
+    :rtype: dict
+    """
+    groups = Group.objects.filter(user__id=user_id).values_list("name", flat=True)
+    return {"groups": frozenset(groups)}
+
+
+def resolve_user_access(user_id):
+    """
+    Resolves the groups of a user, using the cache when possible.
+
+    :param user_id: The ID of the user.
+    :type user_id: int
+
+    :return: The access of the user, see :func:`load_user_access`.
+    :rtype: dict
+    """
+    key = user_access_key(user_id, get_user_access_version(user_id))
+    access = cache.get(key)
+
+    if access is None:
+        access = load_user_access(user_id)
+        cache.set(key, access, get_user_access_timeout())
+
+    return access
+
+
+def get_request_access(request):
+    """
+    Returns the groups of the user of a request, resolved once per request however
+    many decorators check them.
+
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+
+    :return: The access of the user, see :func:`load_user_access`.
+    :rtype: dict
+    """
+    access = getattr(request, "_user_access", None)
+    if access is None:
+        if request.user.is_authenticated:
+            access = resolve_user_access(request.user.id)
+        else:
+            access = ANONYMOUS_ACCESS
+        request._user_access = access
+    return access
+
+
+def in_group(request, name):
+    """
+    Returns whether the user of a request is in a group.
+
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :param name: The name of the group, e.g. "teacher" or "student".
+    :type name: str
+
+    :rtype: bool
+    """
+    return name in get_request_access(request)["groups"]
+
+
+def load_enrolment_status(user_id, course_id):
+    """
+    Loads the enrolment status of a student in a course with a single probe of the
+    ``enrolment_access_idx`` index, which covers it.
+
+    :param user_id: The ID of the student.
+    :type user_id: int
+    :param course_id: The ID of the course.
+    :type course_id: int
+
+    :return: Whether the enrolment is banned, or None if the student is not
+        enrolled in the course.
+    :rtype: bool or None
+    """
+    from courses.models import Enrolment
+
+    is_banned = Enrolment.objects.filter(
+        student_id=user_id, course_id=course_id
+    ).values_list("is_banned", flat=True)[:1]
+    return next(iter(is_banned), None)
+
+
+def resolve_enrolment_status(user_id, course_id):
+    """
+    Resolves the enrolment status of a student in a course, using the cache when
+    possible. Entries share the version of the access of the student.
+
+    :param user_id: The ID of the student.
+    :type user_id: int
+    :param course_id: The ID of the course.
+    :type course_id: int
+
+    :return: The enrolment status, see :func:`load_enrolment_status`.
+    :rtype: bool or None
+    """
+    key = user_enrolment_key(user_id, course_id, get_user_access_version(user_id))
+    status = cache.get(key)
+
+    if status is None:
+        is_banned = load_enrolment_status(user_id, course_id)
+        status = NOT_ENROLLED if is_banned is None else is_banned
+        cache.set(key, status, get_user_access_timeout())
+
+    return None if status == NOT_ENROLLED else status
+
+
+def get_request_enrolment(request, course_id):
+    """
+    Returns the enrolment status of the user of a request in a course, resolved
+    once per request and course.
+
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :param course_id: The ID of the course.
+    :type course_id: int
+
+    :return: The enrolment status, see :func:`load_enrolment_status`, None without
+        a course.
+    :rtype: bool or None
+    """
+    if course_id is None or not request.user.is_authenticated:
+        return None
+
+    enrolments = getattr(request, "_user_enrolments", None)
+    if enrolments is None:
+        enrolments = request._user_enrolments = {}
+    if course_id not in enrolments:
+        enrolments[course_id] = resolve_enrolment_status(request.user.id, course_id)
+    return enrolments[course_id]
+
+
+def invalidate_user_access(user_id):
+    """
+    Invalidates the cached access of a user.
+
+    :param user_id: The ID of the user.
+    :type user_id: int
+    """
+    cache.set(user_access_version_key(user_id), uuid.uuid4().hex, None)
@@ -1,11 +1,16 @@
 from django.http import HttpResponseForbidden
 from functools import wraps
 
+from users.access import in_group
+
 
 def teacher_required(view_func):
     """
     Decorator to restrict access to views/methods only for users in the teacher group.
 
+    The groups of the user are resolved once per request, see
+    :func:`users.access.get_request_access`.
+
     :param view_func: The view function to decorate.
     :type view_func: function
     :return: Decorated function.
@@ -14,7 +19,7 @@ def teacher_required(view_func):
 
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if request.user.groups.filter(name="teacher").exists():
+        if in_group(request, "teacher"):
             return view_func(request, *args, **kwargs)
         else:
             return HttpResponseForbidden("You are not authorized to access this page.")
@@ -26,6 +31,9 @@ def student_required(view_func):
     """
     Decorator to restrict access to views/methods only for users in the student group.
 
+    The groups of the user are resolved once per request, see
+    :func:`users.access.get_request_access`.
+
     :param view_func: The view function to decorate.
     :type view_func: function
     :return: Decorated function.
@@ -34,7 +42,7 @@ def student_required(view_func):
 
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if request.user.groups.filter(name="student").exists():
+        if in_group(request, "student"):
             return view_func(request, *args, **kwargs)
         else:
             return HttpResponseForbidden(
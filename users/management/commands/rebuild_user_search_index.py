@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from users.search import has_search_index, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index of the users."
+
+    def handle(self, *args, **options):
+        if not has_search_index():
+            self.stdout.write("The database has no user search index.")
+            return
+
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} users."))
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+SEARCH_TABLE = "users_user_search"
+
+
+def create_search_index(apps, schema_editor):
+    # The full-text index is a SQLite FTS5 table, other databases fall back to
+    # substring lookups
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        "username, full_name, email, user_type UNINDEXED, "
+        "tokenize = 'unicode61', prefix = '2 3')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, username, full_name, email, user_type) "
+        "SELECT id, username, first_name || ' ' || last_name, email, user_type "
+        "FROM users_user"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# The search vectors of users.search, PostgreSQL only: SQLite has the FTS5 table of
+# 0002_user_search_index
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(username, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(first_name, '') || ' ' || "
+    "coalesce(last_name, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(email, '')), 'C')"
+)
+NAME_VECTOR = (
+    "to_tsvector('simple', coalesce(first_name, '') || ' ' || "
+    "coalesce(last_name, ''))"
+)
+
+
+def create_vector_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS users_user_search_vector_idx "
+        f"ON users_user USING gin (({SEARCH_VECTOR}))"
+    )
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS users_user_name_vector_idx "
+        f"ON users_user USING gin (({NAME_VECTOR}))"
+    )
+
+
+def drop_vector_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute("DROP INDEX IF EXISTS users_user_search_vector_idx")
+    schema_editor.execute("DROP INDEX IF EXISTS users_user_name_vector_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_user_search_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_vector_indexes, drop_vector_indexes),
+    ]
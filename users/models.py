@@ -3,8 +3,14 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.validators import EmailValidator
 from django.utils.translation import gettext_lazy as _
-from users.signals import assign_user_to_group
-from django.db.models.signals import post_save
+from users.signals import (
+    assign_user_to_group,
+    index_user,
+    invalidate_access,
+    invalidate_group_access,
+    unindex_user,
+)
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
 
 def profile_picture_upload_path(instance, filename):
@@ -100,6 +106,10 @@ class User(AbstractUser):
 
 
 post_save.connect(assign_user_to_group, sender=User)
+post_save.connect(index_user, sender=User)
+post_delete.connect(unindex_user, sender=User)
+post_save.connect(invalidate_access, sender=User)
+m2m_changed.connect(invalidate_group_access, sender=User.groups.through)
 
 
 class StatusUpdate(models.Model):
@@ -0,0 +1,299 @@
+import functools
+import logging
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Concat
+
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_SEARCH = {
+    "AUTOCOMPLETE_LIMIT": 10,  # most suggestions returned per keystroke
+    "MIN_QUERY_LENGTH": 3,  # shorter autocomplete queries return no suggestion
+}
+
+# FTS5 table holding the searchable fields of every user, keyed by the user ID
+SEARCH_TABLE = "users_user_search"
+
+# bm25 weights of the username, full_name and email columns
+RANK = f"bm25({SEARCH_TABLE}, 10.0, 5.0, 1.0)"
+
+# PostgreSQL text search vector of the username, full name and email of a user,
+# weighted like the bm25 ranking and indexed by users_user_search_vector_idx
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(users_user.username, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(users_user.first_name, '') || ' ' || "
+    "coalesce(users_user.last_name, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(users_user.email, '')), 'C')"
+)
+
+# PostgreSQL text search vector of the full name of a user, indexed by
+# users_user_name_vector_idx
+NAME_VECTOR = (
+    "to_tsvector('simple', coalesce(users_user.first_name, '') || ' ' || "
+    "coalesce(users_user.last_name, ''))"
+)
+
+INDEXED_FIELDS = {"username", "first_name", "last_name", "email", "user_type"}
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def get_search_config():
+    """
+    Returns the user search configuration merged over the defaults.
+
+    :return: The ``USER_SEARCH`` setting merged over the defaults.
+    :rtype: dict
+    """
+    return {**DEFAULT_USER_SEARCH, **getattr(settings, "USER_SEARCH", {})}
+
+
+def has_search_index():
+    """
+    Returns whether the database has the FTS5 full-text index, i.e. is SQLite.
+    """
+    return connection.vendor == "sqlite"
+
+
+def has_vector_index():
+    """
+    Returns whether the database has the GIN indexes of the text search vectors,
+    i.e. is PostgreSQL.
+    """
+    return connection.vendor == "postgresql"
+
+
+@functools.cache
+def warn_unindexed_search(search, vendor):
+    """
+    Logs, once per process, that a search runs substring lookups over every row as
+    the database has no full-text index.
+
+    :param search: What is searched, e.g. ``"User search"``.
+    :type search: str
+    :param vendor: The database vendor.
+    :type vendor: str
+    """
+    logger.warning("%s falls back to unindexed substring lookups on %s", search, vendor)
+
+
+def match_expression(query):
+    """
+    Turns a search query into an FTS5 query matching every word as a prefix.
+
+    :param query: The search query entered by the user.
+    :type query: str
+
+    :return: The FTS5 query, or an empty string if the query has no word.
+    :rtype: str
+    """
+    return " ".join(f'"{token}"*' for token in TOKEN_RE.findall(query.lower()))
+
+
+def tsquery_expression(query):
+    """
+    Turns a search query into a PostgreSQL tsquery matching every word as a prefix.
+
+    :param query: The search query entered by the user.
+    :type query: str
+
+    :return: The tsquery, or an empty string if the query has no word.
+    :rtype: str
+    """
+    return " & ".join(f"{token}:*" for token in TOKEN_RE.findall(query.lower()))
+
+
+def vector_match(vector, expression):
+    """
+    Returns the condition of the rows whose text search vector matches a tsquery.
+
+    :param vector: The SQL of the text search vector, e.g. :data:`SEARCH_VECTOR`.
+    :type vector: str
+    :param expression: The tsquery, see :func:`tsquery_expression`.
+    :type expression: str
+
+    :rtype: RawSQL
+    """
+    return RawSQL(
+        f"({vector}) @@ to_tsquery('simple', %s)",
+        [expression],
+        output_field=BooleanField(),
+    )
+
+
+def index_user(user):
+    """
+    Adds a user to the search index, or refreshes their indexed fields.
+
+    :param user: The saved user.
+    :type user: User
+    """
+    if not has_search_index():
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [user.pk])
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} "
+            "(rowid, username, full_name, email, user_type) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            [
+                user.pk,
+                user.username,
+                user.get_full_name(),
+                user.email,
+                user.user_type,
+            ],
+        )
+
+
+def unindex_user(user_id):
+    """
+    Removes a user from the search index.
+
+    :param user_id: The ID of the deleted user.
+    :type user_id: int
+    """
+    if not has_search_index():
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [user_id])
+
+
+def rebuild_search_index():
+    """
+    Rebuilds the search index from the users table, e.g. after a bulk import that
+    bypassed the signals.
+
+    :return: The number of indexed users.
+    :rtype: int
+    """
+    if not has_search_index():
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} "
+            "(rowid, username, full_name, email, user_type) "
+            "SELECT id, username, first_name || ' ' || last_name, email, user_type "
+            f"FROM {User._meta.db_table}"
+        )
+        count = cursor.rowcount
+
+    logger.info("Indexed %d users for search", count)
+    return count
+
+
+def match_sql(user_type, expression):
+    """
+    Returns the SQL selecting the IDs of the users matching an FTS5 query, only
+    students for students, and its parameters.
+
+    :rtype: tuple[str, list]
+    """
+    sql = f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s"
+    if user_type == User.STUDENT:
+        return f"{sql} AND user_type = %s", [expression, User.STUDENT]
+    return sql, [expression]
+
+
+def search_queryset(user_type, query):
+    """
+    Returns the users a user of the given type can find with a search query.
+
+    Students only find students, teachers find every user. The query matches the
+    words of the username, full name and email by prefix, through the FTS5 index on
+    SQLite and the GIN index of :data:`SEARCH_VECTOR` on PostgreSQL. Other databases
+    fall back to substring lookups.
+
+    :param user_type: The type of the user performing the search.
+    :type user_type: str
+    :param query: The search query entered by the user.
+    :type query: str
+
+    :return: The matching users.
+    :rtype: QuerySet
+    """
+    users = User.objects.all()
+    if user_type == User.STUDENT:
+        users = users.filter(user_type=User.STUDENT)
+    elif user_type != User.TEACHER:
+        return users.none()
+
+    if has_vector_index():
+        expression = tsquery_expression(query)
+        if not expression:
+            return users.none()
+        return users.filter(vector_match(SEARCH_VECTOR, expression))
+
+    if not has_search_index():
+        warn_unindexed_search("User search", connection.vendor)
+        return users.annotate(
+            full_name=Concat("first_name", Value(" "), "last_name")
+        ).filter(
+            Q(username__icontains=query)
+            | Q(email__icontains=query)
+            | Q(full_name__icontains=query)
+        )
+
+    expression = match_expression(query)
+    if not expression:
+        return users.none()
+
+    return users.filter(id__in=RawSQL(*match_sql(user_type, expression)))
+
+
+def autocomplete_users(user_type, query, limit=None):
+    """
+    Returns the best matches of a search query, for autocomplete suggestions.
+
+    The matches are ranked with bm25 on SQLite and ts_rank on PostgreSQL, username
+    matches first, and only the top ``limit`` users are loaded.
+
+    :param user_type: The type of the user performing the search.
+    :type user_type: str
+    :param query: The search query entered by the user.
+    :type query: str
+    :param limit: The maximum number of users, defaults to ``AUTOCOMPLETE_LIMIT``.
+    :type limit: int or None
+
+    :return: The matching users, best match first.
+    :rtype: list[User]
+    """
+    config = get_search_config()
+    limit = limit or config["AUTOCOMPLETE_LIMIT"]
+    if len(query.strip()) < config["MIN_QUERY_LENGTH"]:
+        return []
+
+    if has_vector_index():
+        users = search_queryset(user_type, query).annotate(
+            rank=RawSQL(
+                f"ts_rank({SEARCH_VECTOR}, to_tsquery('simple', %s))",
+                [tsquery_expression(query)],
+                output_field=FloatField(),
+            )
+        )
+        return list(users.order_by("-rank", "username")[:limit])
+
+    if not has_search_index():
+        return list(search_queryset(user_type, query).order_by("username")[:limit])
+
+    expression = match_expression(query)
+    if not expression or user_type not in (User.STUDENT, User.TEACHER):
+        return []
+
+    sql, params = match_sql(user_type, expression)
+    with connection.cursor() as cursor:
+        cursor.execute(f"{sql} ORDER BY {RANK} LIMIT %s", params + [limit])
+        user_ids = [row[0] for row in cursor.fetchall()]
+
+    users = User.objects.in_bulk(user_ids)
+    return [users[user_id] for user_id in user_ids if user_id in users]
@@ -83,3 +83,54 @@ def get_or_create_permissions(permissions, content_type):
         )[0]
         for codename, name in permissions
     ]
+
+
+def index_user(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Refreshes the search index of a saved user, unless only unindexed fields such
+    as ``last_login`` were saved.
+    """
+    from users.search import INDEXED_FIELDS, index_user
+
+    if raw or (update_fields and not INDEXED_FIELDS & set(update_fields)):
+        return
+    index_user(instance)
+
+
+def unindex_user(sender, instance, **kwargs):
+    """
+    Removes a deleted user from the search index.
+    """
+    from users.search import unindex_user
+
+    unindex_user(instance.pk)
+
+
+def invalidate_access(sender, instance, **kwargs):
+    """
+    Invalidates the cached access of a saved user, whose type may have changed.
+    """
+    from users.access import invalidate_user_access
+
+    invalidate_user_access(instance.pk)
+
+
+def invalidate_group_access(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalidates the cached access of the users added to or removed from a group,
+    e.g. by :func:`assign_user_to_group`, from either side of the relation.
+    """
+    from users.access import invalidate_user_access
+
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if not reverse:
+        user_ids = [instance.pk]
+    elif action == "pre_clear":
+        # the users of a cleared group are only known before it is cleared
+        user_ids = instance.user_set.values_list("id", flat=True)
+    else:
+        user_ids = pk_set
+    for user_id in user_ids:
+        invalidate_user_access(user_id)
@@ -5,6 +5,7 @@ from factory import LazyAttribute
 from factory.faker import Faker
 from django.utils.text import slugify
 from django.test import RequestFactory
+from django.db.utils import ConnectionHandler
 from chat.tests.factories import ChatMembershipFactory, ChatRoomFactory, MessageFactory
 from courses.models import Course
 from courses.tests.factories import (
@@ -103,3 +104,21 @@ def chat_membership(request, chat_room, student_user, teacher_user):
 @pytest.fixture
 def request_factory():
     return RequestFactory()
+
+
+@pytest.fixture
+def postgres_connection(monkeypatch):
+    """
+    A PostgreSQL connection, never opened, picked by the search functions so their
+    queries can be compiled for PostgreSQL.
+    """
+    connection = ConnectionHandler(
+        {
+            "default": {
+                "ENGINE": "django.db.backends.postgresql",
+                "NAME": "elearningapp",
+            }
+        }
+    )["default"]
+    monkeypatch.setattr("users.search.connection", connection)
+    return connection
@@ -0,0 +1,105 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser, Group
+from django.db import connection
+from django.http import HttpResponse
+
+from courses.decorators import check_student_banned
+from courses.models import Enrolment
+from courses.tests.factories import CourseFactory, EnrolmentFactory
+from users.access import get_request_enrolment, in_group
+from users.decorators import student_required, teacher_required
+from users.tests.fixtures import request_factory, student_user, teacher_user
+
+
+def view(request, course_id=None):
+    return HttpResponse()
+
+
+@pytest.mark.django_db
+class TestUserAccess:
+    @pytest.fixture(autouse=True)
+    def setup(self, request_factory, student_user, teacher_user):
+        self.request_factory = request_factory
+        self.student_user = student_user
+        self.teacher_user = teacher_user
+
+    def request(self, user):
+        request = self.request_factory.get("/")
+        request.user = user
+        return request
+
+    def test_access_is_resolved_once_per_request_then_cached(
+        self, django_assert_num_queries
+    ):
+        course_id = EnrolmentFactory(student=self.student_user).course_id
+        request = self.request(self.student_user)
+
+        # the groups of the student and their enrolment in the course
+        with django_assert_num_queries(2):
+            assert student_required(view)(request).status_code == 200
+            decorated = check_student_banned(view)
+            assert decorated(request, course_id=course_id).status_code == 200
+            assert decorated(request, course_id=course_id).status_code == 200
+            assert teacher_required(view)(request).status_code == 403
+
+        with django_assert_num_queries(0):
+            request = self.request(self.student_user)
+            assert student_required(view)(request).status_code == 200
+            assert decorated(request, course_id=course_id).status_code == 200
+
+    @pytest.mark.skipif(
+        connection.vendor != "sqlite", reason="reads the SQLite query plan"
+    )
+    def test_enrolment_is_one_covering_index_probe(self):
+        query = (
+            Enrolment.objects.filter(student_id=1, course_id=1)
+            .values_list("is_banned", flat=True)[:1]
+            .query
+        )
+        sql, params = query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+
+        assert "COVERING INDEX enrolment_access_idx" in plan
+
+    def test_group_changes_invalidate_the_access(self):
+        assert not in_group(self.request(self.student_user), "teacher")
+
+        teacher_group = Group.objects.get(name="teacher")
+        self.student_user.groups.add(teacher_group)
+        assert in_group(self.request(self.student_user), "teacher")
+
+        teacher_group.user_set.clear()
+        assert not in_group(self.request(self.student_user), "teacher")
+        assert not in_group(self.request(self.teacher_user), "teacher")
+
+    def test_enrolment_changes_invalidate_the_access(self):
+        course = CourseFactory()
+        decorated = check_student_banned(view)
+
+        def status_code():
+            request = self.request(self.student_user)
+            return decorated(request, course_id=course.id).status_code
+
+        assert status_code() == 403
+
+        enrolment = EnrolmentFactory(student=self.student_user, course=course)
+        assert status_code() == 200
+
+        enrolment.is_banned = True
+        enrolment.save()
+        assert status_code() == 403
+
+        enrolment.delete()
+        request = self.request(self.student_user)
+        assert get_request_enrolment(request, course.id) is None
+
+    def test_anonymous_users_are_denied_without_queries(
+        self, django_assert_num_queries
+    ):
+        with django_assert_num_queries(0):
+            response = teacher_required(view)(self.request(AnonymousUser()))
+
+        assert response.status_code == 403
@@ -0,0 +1,108 @@
+import importlib
+import logging
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from users.models import User
+from users.search import (
+    SEARCH_VECTOR,
+    autocomplete_users,
+    rebuild_search_index,
+    search_queryset,
+    warn_unindexed_search,
+)
+from users.tests.factories import UserFactory
+from users.tests.fixtures import postgres_connection, student_user, teacher_user
+
+
+@pytest.mark.django_db
+class TestUserSearchIndex:
+    @pytest.fixture(autouse=True)
+    def setup(self, student_user, teacher_user):
+        self.student_user = student_user
+        self.teacher_user = teacher_user
+
+    def test_words_match_by_prefix(self):
+        user = UserFactory(
+            username="ada_lovelace", first_name="Augusta", last_name="King"
+        )
+
+        assert user in search_queryset(User.TEACHER, "lov")
+        assert user in search_queryset(User.TEACHER, "augusta ki")
+        assert user not in search_queryset(User.TEACHER, "augusta babbage")
+
+    def test_saved_and_deleted_users_are_reindexed(self):
+        self.student_user.first_name = "Grace"
+        self.student_user.last_name = "Hopper"
+        self.student_user.save()
+
+        assert list(search_queryset(User.TEACHER, "grace hop")) == [self.student_user]
+
+        self.student_user.delete()
+        assert not search_queryset(User.TEACHER, "grace hop").exists()
+
+    def test_autocomplete_ranks_username_matches_first(self):
+        by_email = UserFactory(username="someone", email="turing@example.com")
+        by_username = UserFactory(username="turing", email="alan@example.com")
+
+        assert autocomplete_users(User.TEACHER, "turing") == [by_username, by_email]
+
+    def test_autocomplete_is_limited(self):
+        UserFactory.create_batch(5, first_name="Linus")
+
+        assert len(autocomplete_users(User.TEACHER, "linus", limit=3)) == 3
+
+    def test_students_only_suggest_students(self):
+        assert autocomplete_users(User.STUDENT, self.teacher_user.username) == []
+        assert autocomplete_users(User.STUDENT, self.student_user.username) == [
+            self.student_user
+        ]
+
+    def test_short_queries_suggest_nothing(self, settings):
+        settings.USER_SEARCH = {"MIN_QUERY_LENGTH": 4}
+
+        assert autocomplete_users(User.TEACHER, self.student_user.username[:3]) == []
+
+    def test_rebuild_indexes_users_created_without_signals(self):
+        User.objects.bulk_create(
+            [User(username="bulk", email="bulk@example.com", first_name="Bulk")]
+        )
+        assert not search_queryset(User.TEACHER, "bulk").exists()
+
+        assert rebuild_search_index() == User.objects.count()
+        assert search_queryset(User.TEACHER, "bulk").exists()
+
+        call_command("rebuild_user_search_index")
+        assert search_queryset(User.TEACHER, "bulk").count() == 1
+
+    def test_autocomplete_view_returns_ranked_options(self, client):
+        client.force_login(self.teacher_user)
+
+        response = client.get(
+            reverse("autocomplete"), {"q": self.student_user.username}
+        )
+
+        assert response.status_code == 200
+        assert f'value="{self.student_user.username}"' in response.content.decode()
+
+    def test_postgres_matches_words_through_the_vector_index(self, postgres_connection):
+        users = search_queryset(User.STUDENT, "Ada lov")
+        sql, params = users.query.get_compiler(connection=postgres_connection).as_sql()
+
+        assert f"({SEARCH_VECTOR}) @@ to_tsquery('simple', %s)" in sql
+        assert params == (User.STUDENT, "ada:* & lov:*")
+        # the query must use the expression of the index to use the index
+        migration = importlib.import_module("users.migrations.0003_user_search_vector")
+        assert SEARCH_VECTOR.replace("users_user.", "") == migration.SEARCH_VECTOR
+
+    def test_other_databases_log_the_substring_fallback(self, monkeypatch, caplog):
+        monkeypatch.setattr("users.search.has_search_index", lambda: False)
+        warn_unindexed_search.cache_clear()
+        user = UserFactory(username="fallback_user")
+
+        with caplog.at_level(logging.WARNING, logger="users.search"):
+            assert user in search_queryset(User.TEACHER, "k_us")
+
+        assert "User search falls back to unindexed substring lookups" in caplog.text
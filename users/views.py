@@ -14,16 +14,16 @@ from django.http import (
 )
 from django.template.loader import render_to_string
 from elearning_auth.decorators import custom_login_required
-from django.db.models import Q, Value
-from django.db.models.functions import Concat
 from django.views.decorators.csrf import csrf_exempt
 
 import logging
 from courses.forms import CreateCourseForm
 
-from courses.models import Assignment, AssignmentSubmission, Course, Enrolment, User
+from courses.dashboard import get_student_dashboard
+from courses.models import Course, Enrolment, User
 from users.forms import StatusUpdateForm, ProfilePictureForm
 from users.models import StatusUpdate
+from users.search import autocomplete_users, search_queryset
 from users.serializers import UserUpdateSerializer
 
 logger = logging.getLogger(__name__)
@@ -91,33 +91,8 @@ class HomeView(View):
             # Query ChatRoom objects for registered courses
             course_chats = ChatRoom.objects.filter(course__in=registered_courses)
 
-            # Prefetch AssignmentSubmission objects related to Assignment objects
-            deadlines = (
-                Assignment.objects.filter(course__in=registered_courses)
-                .select_related("course")
-                .prefetch_related("submissions")
-                .order_by("course")
-            )
-
-            # Group assignments by course
-            grouped_deadlines = {}
-
-            for assignment in deadlines:
-                course = assignment.course
-                for submission in assignment.submissions.all():
-                    grouped_deadlines.setdefault(course, []).append(
-                        {
-                            "assignment": assignment,
-                            "submitted_at": submission.submitted_at,
-                        }
-                    )
-                if not assignment.submissions.exists():
-                    grouped_deadlines.setdefault(course, []).append(
-                        {
-                            "assignment": assignment,
-                            "submitted_at": None,
-                        }
-                    )
+            # Deadlines and submission status come from the dashboard read model
+            grouped_deadlines = get_student_dashboard(user)
 
             context = {
                 "user": user,
@@ -179,8 +154,9 @@ def userSearchFilter(user_type, query):
     """
     Function to filter users based on the search query and user type.
 
-    :param user_id: The ID of the user performing the search.
-    :type user_id: int
+    The query is matched through the full-text search index of the users, see
+    :func:`users.search.search_queryset`.
+
     :param user_type: The type of the user performing the search (student or teacher).
     :type user_type: str
     :param query: The search query entered by the user.
@@ -189,25 +165,7 @@ def userSearchFilter(user_type, query):
     :return: The filtered queryset of users.
     :rtype: QuerySet
     """
-
-    if user_type == "student":
-        # Fetch only students if the current user is a student
-        return User.objects.annotate(
-            full_name=Concat("first_name", Value(" "), "last_name")
-        ).filter(
-            Q(username__icontains=query, user_type=User.STUDENT)
-            | Q(email__icontains=query, user_type=User.STUDENT)
-            | Q(full_name__icontains=query, user_type=User.STUDENT)
-        )
-    elif user_type == "teacher":
-        # Fetch both students and teachers if the current user is a teacher
-        return User.objects.annotate(
-            full_name=Concat("first_name", Value(" "), "last_name")
-        ).filter(
-            Q(username__icontains=query)
-            | Q(email__icontains=query)
-            | Q(full_name__icontains=query)
-        )
+    return search_queryset(user_type, query)
 
 
 class AutocompleteView(View):
@@ -251,17 +209,12 @@ class AutocompleteView(View):
 
         user = request.user
 
-        user_type = user.user_type
-        user_id = user.id
-
-        users = userSearchFilter(user_type, query)
-
-        print("Users:", users)  # Debugging: Print the queryset
+        # Only the best few matches are suggested
+        users = autocomplete_users(user.user_type, query)
 
         options_html = render_to_string(
             "users/partials/autocomplete_options.html", {"users": users}
         )
-        print(options_html)
         return HttpResponse(options_html)
 
 
@@ -316,7 +269,9 @@ class UserHomePage(View):
 
         if searched_user.user_type == User.STUDENT:
             # Retrieve all enrollments for the student
-            enrollments = Enrolment.objects.filter(student=searched_user)
+            enrollments = Enrolment.objects.filter(
+                student=searched_user
+            ).select_related("course")
             # Extract the courses from enrollments
             registered_courses = [enrollment.course for enrollment in enrollments]
 
@@ -408,7 +363,7 @@ class SearchUsersView(ListView):
         user_type = user.user_type
         user_id = user.id
 
-        users = userSearchFilter(user_type, query)
+        users = userSearchFilter(user_type, query).order_by("username")
 
         return users
 